@@ -6,6 +6,7 @@
 #define _CURVE_GEN_DENSITY_CALCULATOR_H_
 
 #include <array>
+#include <cstddef>
 #include <utility>
 
 /**
@@ -0,0 +1,104 @@
+"""Integrates many rockets at once, one NumPy operation per step for all
+
+Equivalent to SteppingVerletIntegrator with AccelerationCalculatorDrag and no
+previously recorded data, but every rocket of the batch advances together, so
+the cost of a step barely depends on how many rockets there are.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+import instrumentation
+import verlet_integrator
+from calculate import density_calculator
+
+GRAVITY = 9.80665
+
+
+def simulate(thrust_values: List[Tuple[float, float]],
+             mass_values: List[Tuple[float, float]],
+             time_step: float,
+             num_steps: int,
+             base_mass: np.ndarray,
+             drag_coefficient: np.ndarray,
+             diameter: np.ndarray,
+             initial_value: np.ndarray = 0.0,
+             initial_velocity: np.ndarray = 0.0,
+             acceleration_bias: np.ndarray = 0.0,
+             start_height: np.ndarray = 1220.0,
+             thrust_scale: np.ndarray = 1.0) -> np.ndarray:
+    """Integrates the altitude of a batch of rockets with the same engine
+
+    Args:
+        thrust_values: (SECONDS, NEWTONS) tuples of the thrust curve
+        mass_values: (SECONDS, KILOGRAMS) tuples of the fuel mass
+        time_step: (SECONDS) time between two steps
+        num_steps: Number of steps to simulate
+        base_mass: (KILOGRAMS) mass of each empty rocket
+        drag_coefficient: Dimensionless drag constant of each rocket
+        diameter: (METERS) diameter of each rocket
+        initial_value: (METERS) initial altitude of each rocket
+        initial_velocity: (METERS / SECONDS) initial velocity of each rocket
+        acceleration_bias: (METERS / SECONDS ^ 2) constant error added to the
+            acceleration of each rocket
+        start_height: (METERS) altitude of the launch pad of each rocket
+        thrust_scale: Factor the thrust of each rocket's engine is scaled by
+
+    Returns:
+        (num_steps, rockets) array of altitudes (METERS)
+    """
+    (base_mass, drag_coefficient, diameter, acceleration_bias, initial_value,
+     initial_velocity, start_height, thrust_scale) = [
+         np.asarray(values, dtype=float) for values in np.broadcast_arrays(
+             base_mass, drag_coefficient, diameter, acceleration_bias,
+             initial_value, initial_velocity, start_height, thrust_scale)
+     ]
+    count = base_mass.shape[0] if base_mass.ndim else 1
+    base_mass = base_mass.reshape(count)
+    drag_coefficient = drag_coefficient.reshape(count)
+    diameter = diameter.reshape(count)
+    acceleration_bias = acceleration_bias.reshape(count)
+    initial_value = initial_value.reshape(count)
+    initial_velocity = initial_velocity.reshape(count)
+    start_height = start_height.reshape(count)
+    thrust_scale = thrust_scale.reshape(count)
+
+    # The engine is the same for every rocket, so evaluate it up front
+    times = np.arange(num_steps) * time_step
+    thrust = np.interp(times, [x[0] for x in thrust_values],
+                       [x[1] for x in thrust_values]).tolist()
+    fuel_mass = np.interp(times, [x[0] for x in mass_values],
+                          [x[1] for x in mass_values]).tolist()
+
+    # The pad is added per rocket instead
+    density = density_calculator.DensityCalculator(start_height=0.0)
+    area = (diameter * 0.5)**2 * np.pi
+    past_n_steps = verlet_integrator.moving_average_steps(time_step)
+
+    with instrumentation.stage('integration'):
+        altitude = np.empty((num_steps, count))
+        altitude[0] = initial_value
+        if num_steps > 1:
+            altitude[1] = time_step * initial_velocity + initial_value
+
+        for index in range(2, num_steps):
+            # The moving average of the differences telescopes
+            number_iterations = min(past_n_steps, index - 1)
+            velocity = (altitude[index - 1] -
+                        altitude[index - 1 - number_iterations]) / (
+                            time_step * number_iterations)
+
+            height = altitude[index - 1] + velocity * time_step
+            mass = base_mass + fuel_mass[index - 1]
+            # As in ConstantAreaDragCalculator, but with an area per rocket
+            drag = (0.5 * density(height + start_height) * velocity *
+                    velocity * drag_coefficient * area)
+            force = thrust[index - 1] * thrust_scale - mass * GRAVITY - drag
+
+            altitude[index] = (2 * altitude[index - 1] - altitude[index - 2] +
+                               (force / mass + acceleration_bias) * time_step *
+                               time_step)
+
+    instrumentation.count('batch_rockets', count)
+    return altitude
@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+"""Benchmarks for the interpolation, physics, integration, I/O and rendering
+
+Run from the directory containing main.py:
+
+    $ python -m benchmark.suite
+
+Every benchmark is timed several times and the fastest run is kept, which is
+the least noisy estimate of what the code itself costs. The results are
+compared against benchmark/baseline.json and the process exits with a non-zero
+status if any benchmark got slower than the allowed tolerance. Timings only
+compare on the machine they were recorded on, so a baseline from another
+machine is ignored with a warning. Record one with --save-baseline, which is
+also how to refresh it after an intentional change in performance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+# Rendering must never try to open a window
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+import data_loader
+import main
+import native
+import test_fixtures
+from calculate import constant_area_drag_calculator
+from calculate import density_calculator
+from calculate import unary_linear_interpolator
+from graph import graph_altitude
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+MAIN = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'main.py')
+
+# Each benchmark takes a scratch directory and returns the function to time
+Benchmark = Callable[[str], Callable[[], None]]
+
+BENCHMARKS: List[Tuple[str, Benchmark]] = []
+# Benchmarks of the C backend, which only run when asked for since the shared
+# library may have to be compiled first
+NATIVE_BENCHMARKS: Set[str] = set()
+
+
+def benchmark(name: str,
+              requires_native: bool = False
+              ) -> Callable[[Benchmark], Benchmark]:
+    """Registers the decorated setup function as a benchmark
+
+    Args:
+        name: Unique name of the benchmark, used as the key in the baseline
+        requires_native: Whether the benchmark uses the C backend, see
+            NATIVE_BENCHMARKS
+    """
+
+    def register(setup: Benchmark) -> Benchmark:
+        BENCHMARKS.append((name, setup))
+        if requires_native:
+            NATIVE_BENCHMARKS.add(name)
+        return setup
+
+    return register
+
+
+def _engine_values(directory: str) -> Dict[str, List[Tuple[float, float]]]:
+    """Writes a synthetic engine file and returns its thrust and mass curves"""
+    filename = os.path.join(directory, 'engine.rse')
+    test_fixtures.write_engine_file(filename)
+    data = data_loader.read_rock_sim(filename)
+    return {
+        'thrust_values': [(x['t'], x['f']) for x in data],
+        'mass_values': [(x['t'], x['m']) for x in data]
+    }
+
+
+def _grapher(directory: str, num_steps: int,
+             backend: str = 'python') -> graph_altitude.AltitudeGrapher:
+    """Builds a grapher for a typical flight with the synthetic engine"""
+    return graph_altitude.AltitudeGrapher(
+        total_time=20.0,
+        num_steps=num_steps,
+        diameter=0.1,
+        drag_coefficient=0.5,
+        base_mass=1.5,
+        backend=backend,
+        **_engine_values(directory))
+
+
+@benchmark('interpolator_scalar_10000')
+def interpolator_scalar(directory: str) -> Callable[[], None]:
+    """Interpolates the pressure table one height at a time"""
+    pressure = density_calculator.pressure_table
+    interpolator = unary_linear_interpolator.UnaryLinearInterpolator(
+        [x[0] for x in pressure], [x[1] for x in pressure])
+    heights = np.linspace(0.0, 9144.0, num=10000).tolist()
+
+    def run():
+        for height in heights:
+            interpolator(height)
+
+    return run
+
+
+@benchmark('interpolator_vector_1000000')
+def interpolator_vector(directory: str) -> Callable[[], None]:
+    """Interpolates the pressure table over an array of heights"""
+    pressure = density_calculator.pressure_table
+    interpolator = unary_linear_interpolator.UnaryLinearInterpolator(
+        [x[0] for x in pressure], [x[1] for x in pressure])
+    heights = np.linspace(0.0, 9144.0, num=1000000)
+    return lambda: interpolator(heights)
+
+
+@benchmark('density_calculator_10000')
+def density(directory: str) -> Callable[[], None]:
+    """Evaluates the air density one height at a time"""
+    calculator = density_calculator.DensityCalculator()
+    heights = np.linspace(0.0, 3000.0, num=10000).tolist()
+
+    def run():
+        for height in heights:
+            calculator(height)
+
+    return run
+
+
+@benchmark('drag_calculator_10000')
+def drag(directory: str) -> Callable[[], None]:
+    """Evaluates the drag one sample at a time"""
+    calculator = constant_area_drag_calculator.ConstantAreaDragCalculator(
+        diameter=0.1,
+        drag_coefficient=0.5,
+        density=density_calculator.DensityCalculator())
+    samples = list(
+        zip(
+            np.linspace(0.0, 250.0, num=10000).tolist(),
+            np.linspace(0.0, 3000.0, num=10000).tolist()))
+
+    def run():
+        for velocity, height in samples:
+            calculator(velocity, height)
+
+    return run
+
+
+def _integrator(num_steps: int, backend: str = 'python') -> Benchmark:
+    """Creates a benchmark for a full integration with num_steps steps"""
+
+    def setup(directory: str) -> Callable[[], None]:
+        """Integrates a whole flight without the result cache"""
+        grapher = _grapher(directory, num_steps, backend)
+        time_step = grapher.total_time / (num_steps - 1)
+        return lambda: grapher.simulate(
+            time_step,
+            num_steps=num_steps,
+            base_mass=grapher.base_mass,
+            drag_constant=grapher.drag_coefficient,
+            diameter=grapher.diameter,
+            use_cache=False)
+
+    return setup
+
+
+for _num_steps in (500, 2000, 8000):
+    benchmark('verlet_integrator_{}'.format(_num_steps))(
+        _integrator(_num_steps))
+
+benchmark('native_integrator_8000', requires_native=True)(
+    _integrator(8000, backend='c'))
+
+
+@benchmark('read_rock_sim_1000')
+def read_rock_sim(directory: str) -> Callable[[], None]:
+    """Parses an engine file with a thousand samples"""
+    filename = os.path.join(directory, 'large_engine.rse')
+    test_fixtures.write_engine_file(filename, num_points=1000)
+    return lambda: data_loader.read_rock_sim(filename)
+
+
+@benchmark('save_2000')
+def save(directory: str) -> Callable[[], None]:
+    """Simulates a flight and writes every column to a csv file"""
+    grapher = _grapher(directory, 2000)
+    filename = os.path.join(directory, 'save.csv')
+    flags = (graph_altitude.GRAPH.ALTITUDE | graph_altitude.GRAPH.ACCELERATION
+             | graph_altitude.GRAPH.VELOCITY)
+    return lambda: grapher.save(filename, flags=flags, use_cache=False)
+
+
+@benchmark('generate_flight_per_frame')
+def generate_flight(directory: str) -> Callable[[], None]:
+    """Renders the frames of generate_flight for a short telemetry file"""
+    engine_file = os.path.join(directory, 'engine.rse')
+    test_fixtures.write_engine_file(engine_file)
+    data_file = os.path.join(directory, 'telemetry.csv')
+    num_rows = 10
+    test_fixtures.write_telemetry_file(data_file, num_rows)
+    result_directory = os.path.join(directory, 'frames')
+    os.makedirs(result_directory, exist_ok=True)
+
+    action = {
+        'action': 'generate_flight',
+        'engine_file': engine_file,
+        'diameter': 0.1,
+        'total_time': 20.0,
+        'num_steps': 500,
+        'data_file': data_file,
+        'random_scale': 0.5,
+        'result_directory': result_directory
+    }
+
+    # One frame before any telemetry plus one per row
+    def run():
+        main.parse_action(dict(action))
+
+    run.frames = num_rows + 1
+    return run
+
+
+@benchmark('startup_import_main')
+def startup_import(directory: str) -> Callable[[], None]:
+    """Starts a fresh interpreter that only imports main.py"""
+    command = [sys.executable, '-c', 'import main']
+    cwd = os.path.dirname(MAIN)
+    return lambda: subprocess.run(command, cwd=cwd, check=True)
+
+
+@benchmark('startup_save_rocket')
+def startup_save_rocket(directory: str) -> Callable[[], None]:
+    """Runs main.py on a tiny save_rocket action in a fresh interpreter"""
+    engine_file = os.path.join(directory, 'engine.rse')
+    test_fixtures.write_engine_file(engine_file)
+    action_file = os.path.join(directory, 'actions.json')
+    with open(action_file, 'w') as file:
+        json.dump([{
+            'action': 'save_rocket',
+            'engine_file': engine_file,
+            'diameter': 0.1,
+            'total_time': 20.0,
+            'num_steps': 10,
+            'filename': os.path.join(directory, 'startup.csv')
+        }], file)
+
+    command = [sys.executable, MAIN, '-f', action_file, '--no-cache']
+    return lambda: subprocess.run(command, check=True)
+
+
+def measure(setup: Benchmark, repeat: int) -> float:
+    """Times a single benchmark
+
+    Args:
+        setup: Function registered with @benchmark
+        repeat: Number of times to run the benchmark
+
+    Returns:
+        fastest time in seconds, divided by the number of frames for
+            per-frame benchmarks
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        function = setup(directory)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    return min(times) / getattr(function, 'frames', 1)
+
+
+def run_benchmarks(names: List[str] = None,
+                   repeat: int = 5,
+                   include_native: bool = False) -> Dict[str, float]:
+    """Runs the selected benchmarks
+
+    Args:
+        names: Names of the benchmarks to run, or None for all of them
+        repeat: Number of times to run each benchmark
+        include_native: Whether to run the NATIVE_BENCHMARKS when no names
+            are given. This builds the C backend if it isn't built yet
+
+    Returns:
+        dictionary of the name of each benchmark to its time in seconds
+    """
+    results = {}
+    native_available = None
+    for name, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        if name in NATIVE_BENCHMARKS:
+            if not names and not include_native:
+                continue
+            if native_available is None:
+                native_available = native.is_available()
+            if not native_available:
+                print('{:<32} {:>14}'.format(name, 'unavailable'), flush=True)
+                continue
+        results[name] = measure(setup, repeat)
+        print('{:<32} {:>12.6f} s'.format(name, results[name]), flush=True)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float],
+            tolerance: float) -> List[str]:
+    """Finds the benchmarks that regressed relative to the baseline
+
+    Args:
+        results: Output of run_benchmarks
+        baseline: Previously saved output of run_benchmarks
+        tolerance: Allowed ratio of the new time to the baseline time
+
+    Returns:
+        a description of each regression
+    """
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name]
+        if ratio > tolerance:
+            regressions.append('{}: {:.6f} s vs {:.6f} s baseline ({:.2f}x)'.
+                               format(name, seconds, baseline[name], ratio))
+    return regressions
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    """Defines the argument parser for the benchmark suite
+
+    Returns:
+        the argparser object
+    """
+    parser = argparse.ArgumentParser(description='Runs the benchmark suite')
+    parser.add_argument(
+        'names',
+        nargs='*',
+        help='benchmarks to run, all of them if omitted')
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default=BASELINE,
+        help='JSON file with the baseline timings')
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='overwrite the baseline with the new timings')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=1.5,
+        help='allowed slowdown relative to the baseline, as a ratio')
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=5,
+        help='number of times to run each benchmark')
+    parser.add_argument(
+        '--native',
+        action='store_true',
+        help='also run the benchmarks of the C backend, building it if needed')
+    parser.add_argument(
+        '--list', action='store_true', help='list the benchmarks and exit')
+    return parser
+
+
+def run(argv: List[str] = None) -> int:
+    """Entry point of the benchmark suite
+
+    Args:
+        argv: Command line arguments, defaults to sys.argv
+
+    Returns:
+        exit status, non-zero if any benchmark regressed
+    """
+    args = create_argparser().parse_args(argv)
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        return 0
+
+    results = run_benchmarks(args.names, args.repeat, args.native)
+
+    baseline = {}
+    machine = platform.platform()
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as file:
+            saved = json.load(file)
+        # Timings from another machine say nothing about this one, so they
+        # are only replaced, never compared against
+        if saved.get('machine') == machine:
+            baseline = saved['benchmarks']
+        elif not args.save_baseline:
+            print('\nThe baseline was recorded on {}, not on this machine '
+                  '({}). Record one with --save-baseline to compare against.'.
+                  format(saved.get('machine'), machine),
+                  file=sys.stderr)
+            return 0
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump({
+                'machine': machine,
+                'python': platform.python_version(),
+                'benchmarks': dict(sorted(baseline.items()))
+            },
+                      file,
+                      indent=2)
+            file.write('\n')
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('\nREGRESSIONS (tolerance {:.2f}x):'.format(args.tolerance),
+              file=sys.stderr)
+        for regression in regressions:
+            print('  ' + regression, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -1,9 +1,11 @@
 """Calculates acceleration from the given data"""
 
 from typing import Iterable, Dict, Callable, Tuple
+import functools
 import numpy as np
 import operator
 
+import instrumentation
 from calculate import unary_linear_interpolator
 from calculate import density_calculator
 from calculate import constant_area_drag_calculator
@@ -14,6 +16,30 @@ ConstantAreaDragCalculator = constant_area_drag_calculator.ConstantAreaDragCalcu
 GRAVITY = -9.80665
 
 
+# Every entry holds a few arrays the length of the grid, so only the grids of
+# the last few flights are kept
+@functools.lru_cache(maxsize=8)
+def _forcing_on_grid(thrust: Tuple[Tuple[float, float], ...],
+                     mass: Tuple[Tuple[float, float], ...], times: bytes,
+                     dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Interpolates an engine over a grid of times, see precompute
+
+    Args:
+        thrust: (SECONDS, NEWTONS) tuples of the thrust curve
+        mass: (SECONDS, KILOGRAMS) tuples of the fuel mass
+        times: Raw bytes of the array of times (SECONDS)
+        dtype: Type of the times
+
+    Returns:
+        the thrust (NEWTONS) and the fuel mass (KILOGRAMS) at each time
+    """
+    grid = np.frombuffer(times, dtype=dtype)
+    thrust_values = np.interp(grid, [x[0] for x in thrust],
+                              [x[1] for x in thrust])
+    mass_values = np.interp(grid, [x[0] for x in mass], [x[1] for x in mass])
+    return thrust_values, mass_values
+
+
 class AccelerationCalculator(object):
     """Calculates acceleration for an object (rocket) with thrust and drag.
 
@@ -31,6 +57,7 @@ class AccelerationCalculator(object):
                  drag_constant: float = 0.0,
                  collected_data: Iterable[Dict[str, float]] = [],
                  time_cumulation: float = 100,
+                 dtype: np.dtype = None,
                  **kwargs):
         """Constructs the acceleration calculator from the given parameters
 
@@ -47,17 +74,34 @@ class AccelerationCalculator(object):
                 in METERS / SECONDS ^ 2.
             time_cumulation: Amount of time to "smooth" over velocity in
                 seconds
+            dtype: Optional floating point type to calculate in, such as
+                np.float32 to match the flight computer. Defaults to Python
+                floats
         """
 
         self.get_thrust = UnaryLinearInterpolator(
             list(map(operator.itemgetter(0), thrust)),
-            list(map(operator.itemgetter(1), thrust)))
+            list(map(operator.itemgetter(1), thrust)),
+            dtype=dtype)
         self._mass_values = UnaryLinearInterpolator(
             list(map(operator.itemgetter(0), mass)),
-            list(map(operator.itemgetter(1), mass)))
-
-        self._drag_constant = drag_constant
-        self._base_mass = base_mass
+            list(map(operator.itemgetter(1), mass)),
+            dtype=dtype)
+
+        self._thrust = tuple(map(tuple, thrust))
+        self._mass = tuple(map(tuple, mass))
+        self._dtype = dtype
+        # Constants are cast up front, so that arithmetic with them stays in
+        # the dtype whatever NumPy's promotion rules are
+        cast = dtype if dtype is not None else (lambda value: value)
+        self._cast = cast
+        self._weight_per_mass = cast(-GRAVITY)
+        self._grid = []
+        self._grid_start = 0.0
+        self._grid_scale = 0.0
+
+        self._drag_constant = cast(drag_constant)
+        self._base_mass = cast(base_mass)
 
         self._collected_data = collected_data
         self._max_collected_data_time: float = max(
@@ -65,7 +109,65 @@ class AccelerationCalculator(object):
 
         self._feedback = UnaryLinearInterpolator(
             list(map(operator.itemgetter('time'), collected_data)),
-            list(map(operator.itemgetter('acceleration'), collected_data)))
+            list(map(operator.itemgetter('acceleration'), collected_data)),
+            dtype=dtype)
+
+    def precompute(self, times: np.ndarray) -> None:
+        """Evaluates thrust, mass and weight over a grid of times
+
+        Integration evaluates the acceleration on a known grid of times, so
+        the engine is interpolated over the whole grid at once instead of at
+        every step. Times on the grid are then looked up, anything else is
+        still interpolated. The interpolated engine is cached per engine and
+        grid, so calculators for the same motor share it.
+
+        Args:
+            times: (SECONDS) evenly spaced array of the times the acceleration
+                will be evaluated at, of the type the integrator computes them
+                in. Unevenly spaced times are interpolated as if off the grid
+        """
+        times = np.ascontiguousarray(times)
+        thrust, fuel_mass = _forcing_on_grid(
+            self._thrust, self._mass, times.tobytes(), times.dtype.str)
+        if self._dtype is not None:
+            thrust = thrust.astype(self._dtype)
+            fuel_mass = fuel_mass.astype(self._dtype)
+        mass = self._base_mass + fuel_mass
+        weight = mass * self._weight_per_mass
+
+        # Python floats are faster to do scalar math on, but would lose the
+        # precision of other types
+        to_list = np.ndarray.tolist if self._dtype is None else list
+        # The grid is evenly spaced, so the index of a time is computed
+        # instead of looked up in a dictionary as large as the grid
+        self._grid = times.tolist()
+        self._grid_start = self._grid[0] if self._grid else 0.0
+        span = self._grid[-1] - self._grid_start if self._grid else 0.0
+        self._grid_scale = (len(self._grid) - 1) / span if span > 0 else 0.0
+        self._grid_thrust = to_list(thrust)
+        self._grid_mass = to_list(mass)
+        self._grid_weight = to_list(weight)
+
+    def find_forcing(self, time: float) -> Tuple[float, float, float]:
+        """Returns the thrust, mass and weight at the given time
+
+        Args:
+            time: (SECONDS)
+
+        Returns:
+            the thrust (NEWTONS), mass (KILOGRAMS) and weight (NEWTONS)
+        """
+        index = None
+        if self._grid and not isinstance(time, np.ndarray):
+            index = int(round((time - self._grid_start) * self._grid_scale))
+            if not (0 <= index < len(self._grid)
+                    and self._grid[index] == time):
+                index = None
+        if index is None:
+            mass = self.find_mass(time)
+            return self.get_thrust(time), mass, mass * self._weight_per_mass
+        return (self._grid_thrust[index], self._grid_mass[index],
+                self._grid_weight[index])
 
     @property
     def mass_values(self) -> UnaryLinearInterpolator:
@@ -135,17 +237,16 @@ class AccelerationCalculator(object):
         Returns:
             list of evaluated points or a single evaluated point
         """
+        instrumentation.count('acceleration_evaluations')
 
         acceleration = 0.0
 
         if time < self.max_collected_data_time:
             acceleration = self.find_feeback(time)
         else:
-            mass = self.find_mass(time)
-            thrust = self.get_thrust(time)
-            weight = mass * GRAVITY
+            thrust, mass, weight = self.find_forcing(time)
 
-            acceleration = (thrust + weight) / mass
+            acceleration = (thrust - weight) / mass
 
         if isinstance(acceleration, np.ndarray):
             return np.array([
@@ -198,18 +299,19 @@ class AccelerationCalculatorDrag(AccelerationCalculator):
         Returns:
             calculated acceleration at the given time in meters / seconds ^ 2
         """
+        instrumentation.count('acceleration_evaluations')
 
         if time < self.max_collected_data_time:
             acceleration = self.find_feeback(time)
             return acceleration
         else:
-            mass = self.find_mass(time)
-            thrust = self.get_thrust(time)
+            thrust, mass, weight = self.find_forcing(time)
             # Drag is measured in Newtons, or (KILOGRAMS * METERS) / SECONDS ^ 2
             drag = self._drag(
-                velocity, height, drag_coefficient=self.drag_constant)
+                self._cast(velocity),
+                self._cast(height),
+                drag_coefficient=self.drag_constant)
 
-            weight = mass * 9.80665
             force = thrust - weight - drag
 
             return force / mass
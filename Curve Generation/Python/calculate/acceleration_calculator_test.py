@@ -31,6 +31,24 @@ class AccelerationCalculatorUnitTest(unittest.TestCase):
         result = acceleration(np.array([0.5]))
         self.assertEqual(result[0], 55.98282368421052)
 
+    def test_precompute(self):
+        """Tests that a precomputed grid gives the interpolated values."""
+        acceleration = acceleration_calculator.AccelerationCalculatorDrag(
+            thrust=[(0.0, 0.0), (0.3, 100.0), (1.0, 0.0)],
+            mass=[(0.0, 0.5), (1.0, 0.0)],
+            base_mass=1.0,
+            drag_constant=0.5,
+            diameter=0.1)
+        times = np.arange(50) * 0.03
+        expected = [acceleration(time, 10.0, 100.0) for time in times]
+        off_grid = acceleration(0.5, 10.0, 100.0)
+
+        acceleration.precompute(times)
+        self.assertEqual([acceleration(time, 10.0, 100.0) for time in times],
+                         expected)
+        # Times off the grid are still interpolated
+        self.assertEqual(acceleration(0.5, 10.0, 100.0), off_grid)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -17,6 +17,7 @@ class ConstantAreaDragCalculator(object):
                  radius: float = None,
                  drag_coefficient: float = None,
                  density: Callable[[float], float] = None,
+                 dtype: np.dtype = None,
                  **kwargs):
         """Initializes the DragCalculator object
 
@@ -29,6 +30,8 @@ class ConstantAreaDragCalculator(object):
                 rocket body tube. Equivalent to area=radius * radius * PI
             density: Function used to evaluate density as a function of height
             drag_coefficient: constant value used in the calculation of drag
+            dtype: Optional floating point type to calculate in, such as
+                np.float32. The constants are cast to it
 
         Raises:
             TypeError: Raised if improper input
@@ -49,6 +52,9 @@ class ConstantAreaDragCalculator(object):
         else:
             self.density = density
 
+        self._cast = dtype if dtype is not None else (lambda value: value)
+        self._area = self._cast(self._area)
+        self._half = self._cast(0.5)
         self._drag_coefficient = drag_coefficient
 
     @property
@@ -66,7 +72,8 @@ class ConstantAreaDragCalculator(object):
             Measured drag force in Newtons.
         """
         density = self.density(height)
-        drag_coefficient = drag_coefficient or self._drag_coefficient
+        drag_coefficient = self._cast(drag_coefficient
+                                      or self._drag_coefficient)
 
         return self.calculate_drag(velocity, drag_coefficient, density)
 
@@ -87,5 +94,5 @@ class ConstantAreaDragCalculator(object):
             float: (KILOGRAMS * METERS / SECONDS ^ 2) (NEWTONS) the drag at the
                 specified point
         """
-        return (0.5 * density * velocity * velocity * drag_coefficient *
+        return (self._half * density * velocity * velocity * drag_coefficient *
                 self._area)
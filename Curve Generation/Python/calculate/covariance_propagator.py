@@ -0,0 +1,147 @@
+"""Propagates the uncertainty of the state along a simulated trajectory"""
+
+from typing import Tuple
+
+import numpy as np
+
+import instrumentation
+from calculate import acceleration_calculator
+
+# Order of the propagated state: altitude, velocity, accelerometer bias, drag
+# coefficient and base mass. The last three are constant over the flight, so
+# their uncertainty carries over into the altitude through the dynamics
+ALTITUDE, VELOCITY, BIAS, DRAG_COEFFICIENT, BASE_MASS = range(5)
+
+# (METERS) step used to differentiate the density by height
+DENSITY_STEP = 1.0
+
+
+class CovariancePropagator(object):
+    """Linearized (first order) propagation of the state covariance
+
+    Rather than integrating extra trajectories with the acceleration offset
+    by its error, the covariance of the state is carried along the nominal
+    trajectory with the Jacobian of each integration step. A single pass gives
+    the standard deviation of the altitude at every step, including the
+    effect of uncertain rocket parameters. As it's linearized, it's only
+    accurate while the errors stay small compared to the state.
+
+    Attributes:
+        acceleration: Calculator the nominal trajectory was integrated with
+        acceleration_error: (METERS / SECONDS ^ 2) standard deviation of a
+            constant accelerometer bias
+        drag_coefficient_error: Standard deviation of the drag coefficient
+        base_mass_error: (KILOGRAMS) standard deviation of the base mass
+    """
+
+    def __init__(self,
+                 acceleration: acceleration_calculator.AccelerationCalculatorDrag,
+                 acceleration_error: float = 0.0,
+                 drag_coefficient_error: float = 0.0,
+                 base_mass_error: float = 0.0):
+        """Initializes the propagator
+
+        Args:
+            acceleration: Calculator the nominal trajectory was integrated with
+            acceleration_error: (METERS / SECONDS ^ 2) standard deviation of a
+                constant accelerometer bias
+            drag_coefficient_error: Standard deviation of the drag coefficient
+            base_mass_error: (KILOGRAMS) standard deviation of the base mass
+        """
+        self.acceleration = acceleration
+        self.acceleration_error = acceleration_error
+        self.drag_coefficient_error = drag_coefficient_error
+        self.base_mass_error = base_mass_error
+
+    def jacobian(self, times: np.ndarray, altitude: np.ndarray,
+                 velocity: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Differentiates the acceleration along the trajectory
+
+        Args:
+            times: (SECONDS) time of each step
+            altitude: (METERS) altitude at each step
+            velocity: (METERS / SECONDS) velocity at each step
+
+        Returns:
+            derivatives of the acceleration by altitude, velocity, drag
+                coefficient and base mass at each step
+        """
+        thrust, mass, _ = self.acceleration.find_forcing(times)
+        thrust = np.broadcast_to(thrust, times.shape)
+        mass = np.broadcast_to(mass, times.shape)
+
+        drag_calculator = self.acceleration.drag
+        drag_coefficient = self.acceleration.drag_constant
+        density = drag_calculator.density(altitude)
+        density_slope = (drag_calculator.density(altitude + DENSITY_STEP) -
+                         drag_calculator.density(altitude - DENSITY_STEP)) / (
+                             2 * DENSITY_STEP)
+
+        # Drag in the same form as ConstantAreaDragCalculator
+        pressure = 0.5 * velocity * velocity * drag_calculator.area
+        drag = pressure * density * drag_coefficient
+
+        by_altitude = -pressure * drag_coefficient * density_slope / mass
+        by_velocity = (-velocity * drag_calculator.area * density *
+                       drag_coefficient / mass)
+        by_drag_coefficient = -pressure * density / mass
+        # Weight scales with the mass too, so only thrust and drag remain
+        by_base_mass = -(thrust - drag) / (mass * mass)
+        return by_altitude, by_velocity, by_drag_coefficient, by_base_mass
+
+    def __call__(self,
+                 times: np.ndarray,
+                 altitude: np.ndarray,
+                 initial_covariance: np.ndarray = None) -> np.ndarray:
+        """Propagates the covariance along a trajectory
+
+        Args:
+            times: (SECONDS) evenly spaced time of each step
+            altitude: (METERS) nominal altitude at each step
+            initial_covariance: Optional (2, 2) covariance of the altitude and
+                velocity at the first step, such as from a
+                state_estimator.StateEstimator. Defaults to a known state
+
+        Returns:
+            standard deviation (METERS) of the altitude at each step
+        """
+        times = np.asarray(times, dtype=float)
+        altitude = np.asarray(altitude, dtype=float)
+        if len(altitude) < 2:
+            return np.zeros(len(altitude))
+        time_step = times[1] - times[0]
+        velocity = np.gradient(altitude, time_step)
+
+        with instrumentation.stage('covariance_propagation'):
+            derivatives = self.jacobian(times, altitude, velocity)
+
+            covariance = np.diag([
+                0.0, 0.0, self.acceleration_error**2,
+                self.drag_coefficient_error**2, self.base_mass_error**2
+            ])
+            if initial_covariance is not None:
+                covariance[:2, :2] = initial_covariance
+
+            # Each step advances the altitude by v dt + a dt^2 / 2 and the
+            # velocity by a dt, where a depends on the state through slopes
+            slopes = np.zeros((len(altitude), 5))
+            slopes[:, BIAS] = 1.0
+            for column, derivative in zip(
+                (ALTITUDE, VELOCITY, DRAG_COEFFICIENT, BASE_MASS),
+                    derivatives):
+                slopes[:, column] = derivative
+            altitude_row = np.eye(5)[ALTITUDE] + np.eye(5)[VELOCITY] * time_step
+            velocity_row = np.eye(5)[VELOCITY]
+            transition = np.eye(5)
+
+            variance = np.empty(len(altitude))
+            variance[0] = covariance[ALTITUDE, ALTITUDE]
+            for index in range(1, len(altitude)):
+                slope = slopes[index - 1]
+                transition[ALTITUDE] = (
+                    altitude_row + 0.5 * time_step * time_step * slope)
+                transition[VELOCITY] = velocity_row + time_step * slope
+                covariance = transition @ covariance @ transition.T
+                variance[index] = covariance[ALTITUDE, ALTITUDE]
+
+        return np.sqrt(np.maximum(variance, 0.0))
@@ -0,0 +1,94 @@
+"""Unit test script for the CovariancePropagator"""
+
+import unittest
+import numpy as np
+
+import batch_integrator
+import test_fixtures
+from calculate import acceleration_calculator
+from calculate import covariance_propagator
+from graph import graph_altitude
+
+
+class CovariancePropagatorTest(unittest.TestCase):
+    """Unittest case for CovariancePropagator"""
+
+    def setUp(self):
+        curve = test_fixtures.engine_curve()
+        self.thrust = [(time, thrust) for time, thrust, _ in curve]
+        # The engine file is in grams, the calculators work in kilograms
+        self.mass = [(time, mass * 0.001) for time, _, mass in curve]
+
+    def _calculator(self, drag_constant):
+        return acceleration_calculator.AccelerationCalculatorDrag(
+            thrust=self.thrust,
+            mass=self.mass,
+            base_mass=1.0,
+            drag_constant=drag_constant,
+            diameter=0.1)
+
+    def test_bias_without_drag(self):
+        """Tests that a constant bias grows the altitude error with t^2 / 2."""
+        propagate = covariance_propagator.CovariancePropagator(
+            self._calculator(0.0), acceleration_error=2.0)
+        times = np.arange(1001) * 0.01
+        deviation = propagate(times, 50.0 * times)
+
+        self.assertEqual(deviation[0], 0.0)
+        np.testing.assert_allclose(
+            deviation[1:], 0.5 * 2.0 * times[1:]**2, rtol=1e-9)
+
+    def test_matches_sampling(self):
+        """Tests the deviation against sampled drag coefficients and masses."""
+        time_step, num_steps = 0.01, 1001
+        nominal = batch_integrator.simulate(self.thrust, self.mass, time_step,
+                                            num_steps, 1.0, 0.05, 0.1)[:, 0]
+        propagate = covariance_propagator.CovariancePropagator(
+            self._calculator(0.05),
+            drag_coefficient_error=0.005,
+            base_mass_error=0.05)
+        deviation = propagate(np.arange(num_steps) * time_step, nominal)
+
+        random = np.random.default_rng(0)
+        samples = batch_integrator.simulate(
+            self.thrust, self.mass, time_step, num_steps,
+            random.normal(1.0, 0.05, 2000), random.normal(0.05, 0.005, 2000),
+            0.1)
+        np.testing.assert_allclose(
+            deviation[100::100], samples[100::100].std(axis=1), rtol=0.05)
+
+    def test_grapher_error_lines(self):
+        """Tests that the grapher draws the error lines one deviation apart."""
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=self.thrust,
+            mass_values=self.mass,
+            total_time=10.0,
+            num_steps=1001,
+            diameter=0.1,
+            uncertainty='covariance',
+            drag_coefficient_error=0.005)
+        trajectory = grapher.simulate(
+            0.01,
+            1001,
+            base_mass=1.0,
+            drag_constant=0.05,
+            diameter=0.1,
+            acceleration_error_constant=1.0,
+            errors=True)
+
+        upper = trajectory['upper_error'] - trajectory['altitude']
+        lower = trajectory['altitude'] - trajectory['lower_error']
+        np.testing.assert_allclose(upper, lower)
+        self.assertEqual(upper[0], 0.0)
+
+        propagate = covariance_propagator.CovariancePropagator(
+            self._calculator(0.05),
+            acceleration_error=1.0,
+            drag_coefficient_error=0.005)
+        np.testing.assert_allclose(
+            upper,
+            propagate(np.arange(1001) * 0.01, trajectory['altitude']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -31,6 +31,27 @@ pressure_table = [
     (9144, 30.1)
 ] # yapf: disable
 
+# Split once at import, every calculator shares the same interpolation tables
+_altitudes = list(map(operator.itemgetter(0), pressure_table))
+_pressures = list(map(operator.itemgetter(1), pressure_table))
+
+
+def use_pressure_table(altitudes: typing.Sequence[float],
+                       pressures: typing.Sequence[float]) -> None:
+    """Replaces the table used by calculators created from now on
+
+    Lets worker processes use a table in shared memory instead of their own
+    copy, see shared_tables.
+
+    Args:
+        altitudes: (METERS) ascending altitudes of the table
+        pressures: (KILOPASCALS) pressure at each altitude
+    """
+    global _altitudes, _pressures
+    _altitudes = altitudes
+    _pressures = pressures
+
+
 class DensityCalculator(object):
     """Calculates the density of air
     
@@ -51,17 +72,29 @@ class DensityCalculator(object):
     T_0: float = 288.15  # Kelvin
     P_0: float = 101.325
 
-    def __init__(self, start_height: float = 1220.0, **kwargs):
+    def __init__(self,
+                 start_height: float = 1220.0,
+                 dtype: np.dtype = None,
+                 **kwargs):
         """Initializes the DensityCalculator
 
         Args:
             start_height: (METERS) Starting height, because we wouldn't launch
                 at sea level
+            dtype: Optional floating point type to calculate in. Heights of
+                that type then give densities of that type
         """
-        self._start_height = start_height
+        # Constants are cast up front, so that arithmetic with them stays in
+        # the dtype whatever NumPy's promotion rules are
+        cast = dtype if dtype is not None else (lambda value: value)
+        self._start_height = cast(start_height)
+        self._T_0 = cast(DensityCalculator.T_0)
+        self._L = cast(DensityCalculator.L)
+        self._M = cast(DensityCalculator.M)
+        self._R = cast(DensityCalculator.R)
+        self._kilo = cast(1000)
         self.pressure = unary_linear_interpolator.UnaryLinearInterpolator(
-            list(map(operator.itemgetter(0), pressure_table)),
-            list(map(operator.itemgetter(1), pressure_table)))
+            _altitudes, _pressures, dtype=dtype)
 
     def __call__(self, height: float = None, **kwargs) -> float:
         """Calculates the density at a specific point
@@ -89,17 +122,17 @@ class DensityCalculator(object):
         Returns:
             float: (KILOGRAMS / METER ^ 3)
         """
-        if height != None:
-            height += self._start_height
-            temperature = DensityCalculator.T_0 - DensityCalculator.L * height
+        if height is not None:
+            # Not in place, so arrays of heights are left untouched
+            height = height + self._start_height
+            temperature = self._T_0 - self._L * height
 
             # Pressure is in KILOPASCALS, or (KILOJOULES / METER ^ 3)
             pressure = self.pressure(height)
 
             # Converting from KILOPASCALS to PASCALS (JOULES / METER ^ 3)
-            pressure *= 1000
+            pressure *= self._kilo
 
-            return (pressure * DensityCalculator.M) / (
-                DensityCalculator.R * temperature)
+            return (pressure * self._M) / (self._R * temperature)
         else:
             raise KeyError('invalid arguments')
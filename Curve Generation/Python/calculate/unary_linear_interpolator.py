@@ -1,6 +1,8 @@
 import typing
 import numpy as np
 
+import instrumentation
+
 
 class UnaryLinearInterpolator(object):
     """Interpolates single values linearly with the given data."""
@@ -10,17 +12,21 @@ class UnaryLinearInterpolator(object):
             x_values: typing.Iterable[float],
             # y_values could be complex numbers, but not currently
             # supported
-            y_values: typing.Iterable[float]):
+            y_values: typing.Iterable[float],
+            dtype: np.dtype = None):
         """Constructs the interpolator.
 
         Args:
             x_values: the 'x' values at which the data has been given. Assumes
                 they are in sorted order.
             y_values: the data points themselves.
+            dtype: Optional type to cast the results to. np.interp always
+                computes in double precision
         """
 
         self._x_values = x_values
         self._y_values = y_values
+        self._dtype = dtype
 
     def __call__(self, value: typing.Union[np.array, float]
                  ) -> typing.Union[np.array, float]:
@@ -32,4 +38,8 @@ class UnaryLinearInterpolator(object):
         Returns:
             data at the given value
         """
-        return np.interp(value, self._x_values, self._y_values)
+        instrumentation.count('interpolator_calls')
+        result = np.interp(value, self._x_values, self._y_values)
+        if self._dtype is not None:
+            return result.astype(self._dtype)
+        return result
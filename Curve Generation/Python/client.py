@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Client for the simulation server, see server.py for the protocol"""
+
+import argparse
+import json
+import socket
+from typing import Any, Dict, List
+
+
+class ServerError(Exception):
+    """Raised when the server responds with an error"""
+
+
+class SimulationClient(object):
+    """Sends actions to a running simulation server
+
+    Example:
+        with SimulationClient(path='/tmp/simulation.sock') as client:
+            results = client.run_actions(actions)
+    """
+
+    def __init__(self,
+                 path: str = None,
+                 host: str = '127.0.0.1',
+                 port: int = None,
+                 timeout: float = None):
+        """Connects to the server
+
+        Args:
+            path: Location of the server's Unix socket. If None, connects over
+                TCP instead
+            host: Host of the server for TCP
+            port: Port of the server for TCP
+            timeout: Optional timeout in seconds for each request
+
+        Raises:
+            OSError: the server cannot be reached
+        """
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host, port),
+                                                    timeout=timeout)
+        self._file = self._socket.makefile('rwb')
+
+    def __enter__(self) -> 'SimulationClient':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the connection"""
+        self._file.close()
+        self._socket.close()
+
+    def request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Sends a raw request and waits for the response
+
+        Args:
+            request: Request as described in server.py
+
+        Returns:
+            the decoded response
+
+        Raises:
+            ServerError: the server responded with an error
+            ConnectionError: the server closed the connection
+        """
+        self._file.write(json.dumps(request).encode('utf-8') + b'\n')
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('server closed the connection')
+        response = json.loads(line)
+        if response.get('status') != 'ok':
+            raise ServerError(response.get('error'))
+        return response
+
+    def run_actions(self,
+                    actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Runs the actions on the server
+
+        Args:
+            actions: List of dictionaries that represent actions
+
+        Returns:
+            the result of each action, see main.parse_action
+        """
+        return self.request({'actions': actions})['results']
+
+    def ping(self) -> None:
+        """Checks that the server is responsive"""
+        self.request({'command': 'ping'})
+
+    def shutdown(self) -> None:
+        """Stops the server"""
+        self.request({'command': 'shutdown'})
+
+
+def run() -> None:
+    """Sends an action file to the server and prints the results"""
+    parser = argparse.ArgumentParser(
+        description='Runs actions on a simulation server')
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument(
+        '--socket', type=str, help='path of the server\'s Unix socket')
+    address.add_argument(
+        '--port', type=int, help='localhost TCP port of the server')
+    parser.add_argument(
+        '-f',
+        type=argparse.FileType(),
+        help='a JSON file of a list of actions')
+    parser.add_argument(
+        '--shutdown',
+        action='store_true',
+        help='stop the server once the actions are done')
+    args = parser.parse_args()
+
+    with SimulationClient(path=args.socket, port=args.port) as client:
+        if args.f is not None:
+            actions = json.load(args.f)
+            args.f.close()
+            print(json.dumps(client.run_actions(actions), indent=2))
+        if args.shutdown:
+            client.shutdown()
+
+
+if __name__ == '__main__':
+    run()
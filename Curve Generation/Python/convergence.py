@@ -0,0 +1,176 @@
+"""Picks the number of steps of a simulation by a convergence study
+
+The rocket is integrated on successively finer grids, doubling the number of
+intervals each time. The change in apogee and maximum velocity between two
+grids, together with the order of convergence observed over three grids,
+gives a Richardson estimate of the error of the finer grid. The study stops
+at the first grid whose estimated error is within the tolerance.
+
+In single precision, rounding errors eventually outgrow the discretization
+error, and finer grids only get worse. The study gives up once the estimate
+grows on three successive grids, and settles for the best grid so far.
+
+https://en.wikipedia.org/wiki/Richardson_extrapolation
+"""
+
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import instrumentation
+import result_cache
+from graph import graph_altitude
+
+# Number of intervals of the coarsest grid
+INITIAL_INTERVALS = 50
+# Largest number of intervals the study refines to
+MAX_INTERVALS = 50 * 2**14
+
+# Relative error of the apogee and maximum velocity
+DEFAULT_TOLERANCE = 1e-3
+
+# Observed orders outside of these bounds mean the grids aren't fine enough
+# for the error to shrink steadily yet, so the estimate isn't trusted
+MIN_ORDER = 0.5
+MAX_ORDER = 4.0
+
+# Quantities whose error is estimated
+QUANTITIES = ('apogee', 'max_velocity')
+
+# Number of successive grids whose estimate may grow before giving up
+MAX_WORSENING = 3
+
+
+def richardson_error(coarse: float, middle: float, fine: float) -> float:
+    """Estimates the error of the finest of three successively doubled grids
+
+    Args:
+        coarse: Value on the coarsest grid
+        middle: Value on the grid with twice as many intervals
+        fine: Value on the grid with four times as many intervals
+
+    Returns:
+        the estimated absolute error of fine, or infinity if the values don't
+            converge steadily
+    """
+    change = abs(fine - middle)
+    previous = abs(middle - coarse)
+    if change == 0.0:
+        return 0.0
+    if previous == 0.0 or (fine - middle) * (middle - coarse) < 0:
+        return math.inf
+    order = math.log2(previous / change)
+    if not MIN_ORDER <= order <= MAX_ORDER:
+        return math.inf
+    return change / (2**order - 1)
+
+
+def select_num_steps(grapher: graph_altitude.AltitudeGrapher,
+                     tolerance: float = DEFAULT_TOLERANCE,
+                     initial_intervals: int = INITIAL_INTERVALS,
+                     max_intervals: int = MAX_INTERVALS,
+                     use_cache: bool = True) -> Dict[str, Any]:
+    """Runs the convergence study
+
+    Args:
+        grapher: Grapher with the engine, rocket and total_time to study. Its
+            own num_steps is ignored
+        tolerance: Largest relative error of the apogee and maximum velocity
+        initial_intervals: Number of intervals of the coarsest grid
+        max_intervals: Number of intervals after which to stop regardless
+        use_cache: Set to False to bypass the result cache
+
+    Returns:
+        dictionary with the chosen 'num_steps', whether the study
+            'converged', the estimated relative 'error' of each of QUANTITIES
+            on the chosen grid, and the 'grids' that were integrated, as
+            [num_steps, apogee (METERS), max_velocity (METERS / SECONDS)].
+            If the study didn't converge, the chosen grid is the one with the
+            smallest estimated error
+    """
+    grids = []
+    errors = {quantity: math.inf for quantity in QUANTITIES}
+    # (largest error, num_steps, errors) of the best grid with an estimate
+    best = None
+    worsening = 0
+    intervals = initial_intervals
+    converged = False
+    while intervals <= max_intervals:
+        num_steps = intervals + 1
+        with instrumentation.stage('convergence_study'):
+            trajectory = grapher.simulate(
+                grapher.total_time / intervals,
+                num_steps=num_steps,
+                base_mass=grapher.base_mass,
+                drag_constant=grapher.drag_coefficient,
+                diameter=grapher.diameter,
+                use_cache=use_cache)
+        grids.append([
+            num_steps,
+            float(np.max(trajectory['altitude'])),
+            float(np.max(trajectory['velocity']))
+        ])
+
+        if len(grids) >= 3:
+            errors = {
+                quantity: richardson_error(*(grid[column]
+                                             for grid in grids[-3:])) /
+                abs(grids[-1][column])
+                for column, quantity in enumerate(QUANTITIES, 1)
+            }
+            largest = max(errors.values())
+            if best is None or largest < best[0]:
+                best = (largest, num_steps, errors)
+                worsening = 0
+            elif not math.isinf(best[0]):
+                worsening += 1
+            if largest <= tolerance:
+                converged = True
+                break
+            if worsening >= MAX_WORSENING:
+                break
+        intervals *= 2
+
+    if best is None or math.isinf(best[0]):
+        # Without a single estimate, the finest grid is the best bet
+        best = (math.inf, grids[-1][0], errors)
+    return {
+        'num_steps': best[1],
+        'converged': converged,
+        'error': best[2],
+        'grids': grids
+    }
+
+
+def resolve(action: Dict[str, Any],
+            thrust_values: List[Tuple[float, float]],
+            mass_values: List[Tuple[float, float]],
+            cache: result_cache.ResultCache = None
+            ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Replaces a num_steps of 'auto' by the result of a convergence study
+
+    Args:
+        action: Dictionary that represents an action
+        thrust_values: Thrust curve of the action's engine
+        mass_values: Mass curve of the action's engine
+        cache: Optional cache of previously simulated trajectories. The grid
+            that is chosen is cached along the way, so the action itself
+            doesn't integrate it again
+
+    Returns:
+        the action with the chosen num_steps, and the study, see
+            select_num_steps, or None if num_steps wasn't 'auto'
+    """
+    if action['num_steps'] != 'auto':
+        return action, None
+    grapher = graph_altitude.AltitudeGrapher(
+        thrust_values=thrust_values,
+        mass_values=mass_values,
+        result_cache=cache,
+        **dict(action, num_steps=INITIAL_INTERVALS + 1))
+    study = select_num_steps(
+        grapher,
+        tolerance=action.get('step_tolerance', DEFAULT_TOLERANCE),
+        use_cache=action.get('cache', True))
+    return dict(action, num_steps=study['num_steps']), study
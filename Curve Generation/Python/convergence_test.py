@@ -0,0 +1,83 @@
+"""Unit test script for the convergence study"""
+
+import math
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import convergence
+import main
+import test_fixtures
+from graph import graph_altitude
+
+
+class ConvergenceTest(unittest.TestCase):
+    """Unittest case for the automatic number of steps"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.engine_file = os.path.join(self._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(self.engine_file)
+        self.thrust_values, self.mass_values = main.load_engine(
+            self.engine_file)
+
+    def test_richardson_error(self):
+        """Tests the estimate on first and second order sequences."""
+        self.assertAlmostEqual(
+            convergence.richardson_error(10.4, 10.2, 10.1), 0.1)
+        self.assertAlmostEqual(
+            convergence.richardson_error(10.16, 10.04, 10.01), 0.01)
+        # Changes that flip sign or grow aren't converging yet
+        self.assertEqual(
+            convergence.richardson_error(10.0, 10.2, 10.1), math.inf)
+        self.assertEqual(
+            convergence.richardson_error(10.0, 10.1, 10.3), math.inf)
+
+    def test_select_num_steps(self):
+        """Tests that the chosen grid is within the tolerance."""
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=self.thrust_values,
+            mass_values=self.mass_values,
+            total_time=10.0,
+            num_steps=2,
+            diameter=0.1)
+        study = convergence.select_num_steps(grapher, tolerance=1e-3)
+        self.assertTrue(study['converged'])
+        self.assertEqual(study['num_steps'], study['grids'][-1][0])
+        self.assertLessEqual(max(study['error'].values()), 1e-3)
+
+        # Compare against a much finer grid
+        num_steps = study['num_steps']
+        fine = grapher.simulate(
+            grapher.total_time / ((num_steps - 1) * 4),
+            (num_steps - 1) * 4 + 1,
+            base_mass=grapher.base_mass,
+            drag_constant=grapher.drag_coefficient,
+            diameter=grapher.diameter)
+        apogee = np.max(fine['altitude'])
+        self.assertLess(
+            abs(study['grids'][-1][1] - apogee) / apogee, 2e-3)
+
+    def test_auto_action(self):
+        """Tests that actions report the number of steps they chose."""
+        filename = os.path.join(self._directory.name, 'flight.csv')
+        result = main.parse_action({
+            'action': 'save_rocket',
+            'engine_file': self.engine_file,
+            'diameter': 0.1,
+            'total_time': 10.0,
+            'num_steps': 'auto',
+            'step_tolerance': 1e-2,
+            'filename': filename
+        })
+        self.assertEqual(result['num_steps'],
+                         result['step_study']['num_steps'])
+        self.assertGreater(result['num_steps'], convergence.INITIAL_INTERVALS)
+        self.assertTrue(os.path.exists(filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
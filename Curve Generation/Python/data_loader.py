@@ -3,8 +3,14 @@
 
 from typing import List, Dict
 import io
+import itertools
 import xml.etree.ElementTree as et
 
+import numpy as np
+
+# Number of rows parsed at a time when reading telemetry
+TELEMETRY_CHUNK_SIZE = 65536
+
 def read_rock_sim(filename: str,
                   convert_to_kilos: bool = True) -> List[Dict[str, float]]:
     """Reads in a rock_sim data file
@@ -32,3 +38,45 @@ def read_rock_sim(filename: str,
     # Iterate through each eng-data tag and convert the values to floats
     return list(map(lambda x: dict(
         map(lambda y: (y[0], (float(y[1]) if y[0] != 'm' and convert_to_kilos else 0.001 * float(y[1]))), x.attrib.items())), data))
+
+
+def read_telemetry(filename: str,
+                   delimiter: str = ' ',
+                   chunk_size: int = TELEMETRY_CHUNK_SIZE) -> np.ndarray:
+    """Reads in recorded telemetry, such as the files written by save_rocket
+
+    The file is parsed in chunks of rows so that the temporary memory needed
+    while parsing stays bounded, no matter how long the recording is.
+
+    Args:
+        filename: Location of the file. Each row starts with the time
+            (SECONDS), altitude (METERS) and acceleration (METERS / SECONDS ^
+            2), any further columns are ignored
+        delimiter: Delimiter between the columns
+        chunk_size: Number of rows to parse at a time
+
+    Returns:
+        array with one row per sample and columns for time, altitude and
+            acceleration
+
+    Raises:
+        OSError: the file cannot be opened
+        ValueError: the file isn't formatted correctly
+    """
+    chunks = []
+    with io.open(filename, 'r', newline='\n') as file:
+        while True:
+            lines = list(itertools.islice(file, chunk_size))
+            if not lines:
+                break
+            chunks.append(
+                np.loadtxt(
+                    lines,
+                    delimiter=delimiter,
+                    usecols=(0, 1, 2),
+                    ndmin=2,
+                    dtype=float))
+
+    if not chunks:
+        return np.empty((0, 3))
+    return np.concatenate(chunks)
@@ -0,0 +1,51 @@
+"""Unit test script for the data loader"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import data_loader
+import test_fixtures
+
+
+class ReadTelemetryTest(unittest.TestCase):
+    """Unittest case for data_loader.read_telemetry"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.data_file = os.path.join(self._directory.name, 'telemetry.csv')
+
+    def test_chunks(self):
+        """Tests that files longer than a chunk are read whole."""
+        expected = test_fixtures.telemetry(10)
+        test_fixtures.write_telemetry_file(self.data_file, 10)
+
+        for chunk_size in (1, 3, 5, 10, 11):
+            with self.subTest(chunk_size=chunk_size):
+                np.testing.assert_array_equal(
+                    data_loader.read_telemetry(
+                        self.data_file, chunk_size=chunk_size), expected)
+
+    def test_extra_columns(self):
+        """Tests that columns after the acceleration are ignored."""
+        expected = test_fixtures.telemetry(7)
+        extra = np.column_stack((expected, np.arange(7), -np.arange(7)))
+        np.savetxt(self.data_file, extra, delimiter=',', fmt='%.17g')
+
+        telemetry = data_loader.read_telemetry(
+            self.data_file, delimiter=',', chunk_size=2)
+        np.testing.assert_array_equal(telemetry, expected)
+
+    def test_empty(self):
+        """Tests that an empty file has no rows."""
+        open(self.data_file, 'w').close()
+
+        self.assertEqual(data_loader.read_telemetry(self.data_file).shape,
+                         (0, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,356 @@
+"""Dispersion analysis of the apogee over uncertain rocket parameters
+
+Parameters are drawn from uniform ranges with a Sobol sequence or Latin
+hypercubes (see sampling), a batch at a time. Each batch is integrated
+together (see batch_integrator), and sampling stops as soon as the confidence
+intervals of the apogee statistics are narrower than the requested tolerance.
+
+Quasi-random samples aren't independent, so the usual confidence intervals
+would hide how much faster they converge. Instead, the samples are split
+across independently randomized replicates, and the intervals come from how
+much the statistics of the replicates disagree.
+"""
+
+import csv
+import io
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import batch_integrator
+import instrumentation
+import sampling
+from graph import graph_altitude
+from graph import graph_ensemble
+
+# Parameters that can be dispersed. acceleration_error_constant is applied as
+# a constant offset of the acceleration
+DISPERSION_PARAMETERS = ('base_mass', 'diameter', 'drag_coefficient',
+                         'acceleration_error_constant')
+
+SAMPLING_METHODS = ('sobol', 'latin_hypercube', 'random')
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_REPLICATES = 8
+DEFAULT_MAX_SAMPLES = 65536
+DEFAULT_TOLERANCE = 1.0
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_PERCENTILES = (5.0, 50.0, 95.0)
+
+
+def student_t_quantile(probability: float, degrees_of_freedom: int) -> float:
+    """Quantile of Student's t-distribution
+
+    Args:
+        probability: Probability in (0.5, 1)
+        degrees_of_freedom: Degrees of freedom, at least 1
+
+    Returns:
+        the value below which the given fraction of the distribution lies
+    """
+    nu = degrees_of_freedom
+    scale = math.exp(
+        math.lgamma((nu + 1) / 2) - math.lgamma(nu / 2)) / math.sqrt(
+            nu * math.pi)
+
+    def cdf(value: float) -> float:
+        # Simpson's rule over the density, which is smooth and symmetric
+        points = np.linspace(0.0, value, 2001)
+        density = scale * (1 + points * points / nu)**(-(nu + 1) / 2)
+        weights = np.ones(len(points))
+        weights[1:-1:2] = 4
+        weights[2:-1:2] = 2
+        return 0.5 + value / 6000 * np.dot(weights, density)
+
+    lower, upper = 0.0, 1.0
+    while cdf(upper) < probability:
+        lower, upper = upper, upper * 2
+    for _ in range(60):
+        middle = (lower + upper) / 2
+        if cdf(middle) < probability:
+            lower = middle
+        else:
+            upper = middle
+    return (lower + upper) / 2
+
+
+class Dispersion(object):
+    """Samples apogees until their statistics converge
+
+    Attributes:
+        grapher: Grapher with the engine, the discretization and the values of
+            the parameters that aren't dispersed
+        ranges: Lower and upper bound of each dispersed parameter
+        method: Sampling method, see SAMPLING_METHODS
+        replicates: Number of independently randomized replicates
+        samples: Parameters and apogees of each batch of the last run
+        ensemble: If set, every simulated trajectory is added to it, see
+            graph_ensemble.EnsemblePlot
+    """
+
+    def __init__(self,
+                 grapher: graph_altitude.AltitudeGrapher,
+                 ranges: Dict[str, Tuple[float, float]],
+                 method: str = 'sobol',
+                 replicates: int = DEFAULT_REPLICATES,
+                 seed: int = None):
+        """Initializes the analysis
+
+        Args:
+            grapher: Grapher with the engine and the discretization
+            ranges: Lower and upper bound of each parameter to disperse, see
+                DISPERSION_PARAMETERS
+            method: 'sobol', 'latin_hypercube' or 'random'
+            replicates: Number of independently randomized replicates the
+                confidence intervals are estimated from, at least 2
+            seed: Seed of the samples. Analyses with the same seed are
+                identical
+
+        Raises:
+            ValueError: Raised if an unknown parameter is dispersed, a range is
+                empty, the sampling method is unknown or there are too few
+                replicates
+        """
+        for name, (lower, upper) in ranges.items():
+            if name not in DISPERSION_PARAMETERS:
+                raise ValueError('cannot disperse ' + name)
+            if lower > upper:
+                raise ValueError('the range of {} is empty'.format(name))
+        if method not in SAMPLING_METHODS:
+            raise ValueError('sampling must be one of ' +
+                             ', '.join(SAMPLING_METHODS))
+        if replicates < 2:
+            raise ValueError('at least 2 replicates are needed')
+
+        self.grapher = grapher
+        self.ranges = ranges
+        self.method = method
+        self.replicates = replicates
+        self.samples = []
+        self.ensemble = None
+
+        self._names = [name for name in DISPERSION_PARAMETERS if name in ranges]
+        self._random = np.random.default_rng(seed)
+        self._sequences = []
+        if method == 'sobol':
+            self._sequences = [
+                sampling.Sobol(
+                    len(self._names), seed=self._random.integers(1 << 32))
+                for _ in range(replicates)
+            ]
+        self._drawn = 0
+
+    def draw(self, count: int) -> Dict[str, np.ndarray]:
+        """Draws the next count points of every replicate
+
+        Args:
+            count: Number of points per replicate
+
+        Returns:
+            values of every parameter of DISPERSION_PARAMETERS, for count
+                samples of each replicate in turn
+        """
+        dimensions = len(self._names)
+        if self.method == 'sobol':
+            unit = np.concatenate([
+                sequence.sample(self._drawn, count)
+                for sequence in self._sequences
+            ])
+        elif self.method == 'latin_hypercube':
+            unit = np.concatenate([
+                sampling.latin_hypercube(count, dimensions, self._random)
+                for _ in range(self.replicates)
+            ])
+        else:
+            unit = self._random.random((count * self.replicates, dimensions))
+        self._drawn += count
+
+        total = count * self.replicates
+        parameters = {
+            'base_mass': np.full(total, float(self.grapher.base_mass)),
+            'diameter': np.full(total, float(self.grapher.diameter)),
+            'drag_coefficient': np.full(total,
+                                        float(self.grapher.drag_coefficient)),
+            'acceleration_error_constant': np.zeros(total)
+        }
+        for column, name in enumerate(self._names):
+            lower, upper = self.ranges[name]
+            parameters[name] = lower + unit[:, column] * (upper - lower)
+        return parameters
+
+    def apogees(self, parameters: Dict[str, np.ndarray]
+                ) -> Tuple[np.ndarray, np.ndarray]:
+        """Simulates a batch of rockets
+
+        Args:
+            parameters: Values of DISPERSION_PARAMETERS for each rocket
+
+        Returns:
+            the apogee (METERS) of each rocket, and whether it was still
+                climbing at the end of the simulation
+        """
+        time_step = self.grapher.total_time / (self.grapher.num_steps - 1)
+        # The model diverges once a rocket has fallen far enough, well after
+        # its apogee
+        with np.errstate(over='ignore', invalid='ignore'):
+            altitude = batch_integrator.simulate(
+                self.grapher.thrust_values,
+                self.grapher.mass_values,
+                time_step,
+                self.grapher.num_steps,
+                parameters['base_mass'],
+                parameters['drag_coefficient'],
+                parameters['diameter'],
+                acceleration_bias=parameters['acceleration_error_constant'])
+            highest = np.nanargmax(altitude, axis=0)
+            if self.ensemble is not None:
+                self.ensemble.add(altitude)
+        return (altitude[highest, np.arange(altitude.shape[1])],
+                highest == len(altitude) - 1)
+
+    def run(self,
+            tolerance: float = DEFAULT_TOLERANCE,
+            percentiles: List[float] = DEFAULT_PERCENTILES,
+            confidence: float = DEFAULT_CONFIDENCE,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            max_samples: int = DEFAULT_MAX_SAMPLES) -> Dict[str, Any]:
+        """Samples batches until the statistics of the apogee converge
+
+        After every batch, the confidence intervals of the mean and of each
+        percentile are compared against the tolerance.
+
+        Args:
+            tolerance: (METERS) half width that every confidence interval must
+                fall below
+            percentiles: Percentiles of the apogee to estimate
+            confidence: Confidence level of the intervals, in (0, 1)
+            batch_size: Number of samples per batch, split evenly across the
+                replicates. A power of two suits Sobol sampling best
+            max_samples: Number of samples after which to stop regardless
+
+        Returns:
+            dictionary with the number of 'samples' used, whether the
+                statistics 'converged', the 'mean' and 'percentiles' of the
+                apogee, their confidence 'intervals' (METERS), and the number
+                of samples that were still climbing at the end of the
+                simulation ('truncated')
+
+        Raises:
+            ValueError: Raised if max_samples is less than one batch
+        """
+        t = student_t_quantile(0.5 + confidence / 2, self.replicates - 1)
+        per_replicate = max(1, batch_size // self.replicates)
+        if max_samples < per_replicate * self.replicates:
+            raise ValueError('max_samples must be at least one batch of {} '
+                             'samples'.format(per_replicate * self.replicates))
+        self.samples = []
+        apogees = np.empty((self.replicates, 0))
+        truncated = 0
+        converged = False
+
+        while (apogees.size + per_replicate * self.replicates <= max_samples
+               and not converged):
+            parameters = self.draw(per_replicate)
+            with instrumentation.stage('dispersion'):
+                batch, climbing = self.apogees(parameters)
+            self.samples.append((parameters, batch))
+            apogees = np.concatenate(
+                (apogees, batch.reshape(self.replicates, per_replicate)),
+                axis=1)
+            truncated += int(np.count_nonzero(climbing))
+            instrumentation.count('dispersion_samples', batch.size)
+
+            statistics = self._replicate_statistics(apogees, percentiles)
+            half_widths = t * np.std(
+                statistics, axis=0, ddof=1) / math.sqrt(self.replicates)
+            converged = bool(np.all(half_widths < tolerance))
+
+        pooled = apogees.ravel()
+        estimates = [np.mean(pooled)] + [
+            np.percentile(pooled, percentile) for percentile in percentiles
+        ]
+        names = ['mean'] + [str(percentile) for percentile in percentiles]
+        return {
+            'samples': pooled.size,
+            'converged': converged,
+            'truncated': truncated,
+            'mean': float(estimates[0]),
+            'percentiles': {
+                name: float(estimate)
+                for name, estimate in zip(names[1:], estimates[1:])
+            },
+            'intervals': {
+                name: [
+                    float(estimate - half_width),
+                    float(estimate + half_width)
+                ]
+                for name, estimate, half_width in zip(names, estimates,
+                                                      half_widths)
+            }
+        }
+
+    @staticmethod
+    def _replicate_statistics(apogees: np.ndarray,
+                              percentiles: List[float]) -> np.ndarray:
+        """Mean and percentiles of the apogees of each replicate"""
+        return np.column_stack([np.mean(apogees, axis=1)] + [
+            np.percentile(apogees, percentile, axis=1)
+            for percentile in percentiles
+        ])
+
+    def write_samples(self, filename: str, delimiter: str = ' ') -> None:
+        """Writes the samples of the last run to a csv file
+
+        Args:
+            filename: Location of the file. Each row holds the values of
+                DISPERSION_PARAMETERS and the apogee (METERS) of a sample
+            delimiter: Delimiter between the columns
+        """
+        with io.open(filename, 'w', newline='\n') as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            for parameters, apogees in self.samples:
+                columns = [parameters[name] for name in DISPERSION_PARAMETERS]
+                writer.writerows(np.column_stack(columns + [apogees]).tolist())
+
+
+def from_action(grapher: graph_altitude.AltitudeGrapher,
+                action: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs a dispersion_rocket action
+
+    Args:
+        grapher: Grapher with the engine and the rocket of the action
+        action: Dictionary that represents a dispersion_rocket action
+
+    Returns:
+        the result of Dispersion.run
+    """
+    analysis = Dispersion(
+        grapher, {
+            name: tuple(bounds)
+            for name, bounds in action['dispersion'].items()
+        },
+        method=action.get('sampling', 'sobol'),
+        replicates=action.get('replicates', DEFAULT_REPLICATES),
+        seed=action.get('seed'))
+    if 'plot_file' in action:
+        analysis.ensemble = graph_ensemble.EnsemblePlot(
+            grapher.total_time,
+            grapher.num_steps,
+            mode=action.get('plot_mode', 'density'))
+    result = analysis.run(
+        tolerance=action.get('tolerance', DEFAULT_TOLERANCE),
+        percentiles=action.get('percentiles', DEFAULT_PERCENTILES),
+        confidence=action.get('confidence', DEFAULT_CONFIDENCE),
+        batch_size=action.get('batch_size', DEFAULT_BATCH_SIZE),
+        max_samples=action.get('max_samples', DEFAULT_MAX_SAMPLES))
+
+    if 'filename' in action:
+        analysis.write_samples(action['filename'],
+                               action.get('delimiter', ' '))
+    if 'plot_file' in action:
+        analysis.ensemble.render(
+            action['plot_file'],
+            percentiles=action.get('percentiles', DEFAULT_PERCENTILES),
+            title='Altitude dispersion')
+    return result
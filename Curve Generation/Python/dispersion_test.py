@@ -0,0 +1,103 @@
+"""Unit test script for the dispersion analysis"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import batch_integrator
+import dispersion
+import main
+import test_fixtures
+from graph import graph_altitude
+
+
+class DispersionTest(unittest.TestCase):
+    """Unittest case for Dispersion"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        engine_file = os.path.join(cls._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(engine_file)
+        cls.thrust_values, cls.mass_values = main.load_engine(engine_file)
+        cls.grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=cls.thrust_values,
+            mass_values=cls.mass_values,
+            total_time=20.0,
+            num_steps=500,
+            diameter=0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def test_student_t_quantile(self):
+        """Tests the quantiles against tabulated values."""
+        self.assertAlmostEqual(
+            dispersion.student_t_quantile(0.975, 1), 12.706, places=3)
+        self.assertAlmostEqual(
+            dispersion.student_t_quantile(0.975, 7), 2.365, places=3)
+
+    def test_apogees(self):
+        """Tests the apogees against the highest simulated altitudes."""
+        analysis = dispersion.Dispersion(
+            self.grapher, {'base_mass': (0.9, 1.1)}, seed=0)
+        parameters = analysis.draw(4)
+        apogees, climbing = analysis.apogees(parameters)
+        self.assertEqual(len(apogees), 4 * analysis.replicates)
+        self.assertFalse(np.any(climbing))
+
+        time_step = self.grapher.total_time / (self.grapher.num_steps - 1)
+        altitude = batch_integrator.simulate(
+            self.thrust_values, self.mass_values, time_step,
+            self.grapher.num_steps, parameters['base_mass'][:2],
+            self.grapher.drag_coefficient, self.grapher.diameter)
+        np.testing.assert_allclose(apogees[:2], altitude.max(axis=0))
+
+    def test_converges(self):
+        """Tests that sampling stops once the intervals are narrow enough."""
+        ranges = {
+            'base_mass': (0.9, 1.1),
+            'acceleration_error_constant': (-1.0, 1.0)
+        }
+        result = dispersion.Dispersion(
+            self.grapher, ranges, seed=0).run(tolerance=5.0, batch_size=64)
+        self.assertTrue(result['converged'])
+        self.assertLess(result['samples'], dispersion.DEFAULT_MAX_SAMPLES)
+        self.assertEqual(result['samples'] % 64, 0)
+        for lower, upper in result['intervals'].values():
+            self.assertLess(upper - lower, 10.0)
+        self.assertLess(result['percentiles']['5.0'], result['mean'])
+        self.assertLess(result['mean'], result['percentiles']['95.0'])
+
+    def test_sobol_needs_fewer_samples(self):
+        """Tests that quasi-random samples converge before random ones."""
+        ranges = {'base_mass': (0.9, 1.1), 'drag_coefficient': (0.04, 0.06)}
+        samples = {
+            method: dispersion.Dispersion(
+                self.grapher, ranges, method=method, seed=0).run(
+                    tolerance=0.5,
+                    percentiles=[],
+                    batch_size=64,
+                    max_samples=8192)['samples']
+            for method in ('sobol', 'random')
+        }
+        self.assertLess(samples['sobol'], samples['random'])
+
+    def test_invalid(self):
+        """Tests that unknown parameters and methods are rejected."""
+        with self.assertRaises(ValueError):
+            dispersion.Dispersion(self.grapher, {'thrust': (0, 1)})
+        with self.assertRaises(ValueError):
+            dispersion.Dispersion(
+                self.grapher, {'base_mass': (0.9, 1.1)}, method='grid')
+        with self.assertRaises(ValueError):
+            dispersion.Dispersion(self.grapher, {
+                'base_mass': (0.9, 1.1)
+            }).run(batch_size=256, max_samples=100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,324 @@
+"""Fits rocket parameters to recorded flight telemetry
+
+The fit minimizes the root mean square difference between the recorded
+altitude and the simulated one, using differential evolution. Every generation
+of candidates is integrated as a single batch (see batch_integrator), split
+across worker processes if asked to.
+"""
+
+import concurrent.futures
+import csv
+import io
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import batch_integrator
+import data_loader
+import instrumentation
+import shared_tables
+from graph import graph_altitude
+
+# Parameters that can be fitted. Parameters that aren't fitted keep the
+# grapher's value
+FIT_PARAMETERS = ('base_mass', 'drag_coefficient')
+
+DEFAULT_POPULATION = 32
+DEFAULT_GENERATIONS = 100
+DEFAULT_TOLERANCE = 1e-3
+
+# Differential evolution constants, see
+# https://en.wikipedia.org/wiki/Differential_evolution
+DIFFERENTIAL_WEIGHT = 0.7
+CROSSOVER_PROBABILITY = 0.9
+
+# Name the engine curves are shared with the worker processes under
+SHARED_CURVES = 'fit'
+
+
+def rms_errors(altitude: np.ndarray, time_step: float, times: np.ndarray,
+               recorded: np.ndarray) -> np.ndarray:
+    """Compares a batch of simulated flights against the recorded altitude
+
+    Args:
+        altitude: (num_steps, rockets) simulated altitudes (METERS) on a grid
+            starting at zero
+        time_step: (SECONDS) time between two steps of the grid
+        times: (SECONDS) times of the recorded samples, within the grid
+        recorded: (METERS) recorded altitude of each sample
+
+    Returns:
+        root mean square error (METERS) of each rocket
+    """
+    position = times / time_step
+    lower = np.minimum(position.astype(int), len(altitude) - 2)
+    weight = (position - lower)[:, None]
+    simulated = altitude[lower] * (1 - weight) + altitude[lower + 1] * weight
+    return np.sqrt(np.mean((simulated - recorded[:, None])**2, axis=0))
+
+
+def _evaluate(engine: Tuple[List[Tuple[float, float]], List[Tuple[
+        float, float]]], grid: Tuple[float, int, float], telemetry: np.ndarray,
+              base_mass: np.ndarray, drag_coefficient: np.ndarray) -> np.ndarray:
+    """Integrates a batch of candidates and scores them, see Fitter.evaluate"""
+    time_step, num_steps, diameter = grid
+    # Candidates that are too light for the time step blow up, which only
+    # means they're a bad fit
+    with np.errstate(over='ignore', invalid='ignore'):
+        altitude = batch_integrator.simulate(
+            engine[0], engine[1], time_step, num_steps, base_mass,
+            drag_coefficient, diameter)
+        errors = rms_errors(altitude, time_step, telemetry[:, 0],
+                            telemetry[:, 1])
+    return np.where(np.isfinite(errors), errors, np.inf)
+
+
+def _evaluate_shared(grid: Tuple[float, int, float], telemetry: np.ndarray,
+                     base_mass: np.ndarray,
+                     drag_coefficient: np.ndarray) -> np.ndarray:
+    """Scores candidates within a worker, with the engine of shared_tables"""
+    return _evaluate(
+        shared_tables.find_curves(SHARED_CURVES), grid, telemetry, base_mass,
+        drag_coefficient)
+
+
+class Fitter(object):
+    """Fits the parameters of a rocket to recorded telemetry
+
+    Attributes:
+        grapher: Grapher with the engine, the discretization and the values of
+            the parameters that aren't fitted
+        telemetry: Recorded samples within the simulated time span, see
+            data_loader.read_telemetry
+        bounds: Lower and upper bound of each fitted parameter
+    """
+
+    def __init__(self,
+                 grapher: graph_altitude.AltitudeGrapher,
+                 telemetry: np.ndarray,
+                 bounds: Dict[str, Tuple[float, float]],
+                 workers: int = 1):
+        """Initializes the fitter
+
+        Args:
+            grapher: Grapher with the engine and the discretization
+            telemetry: Array of recorded time (SECONDS), altitude (METERS) and
+                acceleration (METERS / SECONDS ^ 2)
+            bounds: Lower and upper bound of each parameter to fit, see
+                FIT_PARAMETERS
+            workers: Number of processes to split each generation across
+
+        Raises:
+            ValueError: Raised if an unknown parameter is fitted, a bound is
+                empty, or no sample is within the simulated time span
+        """
+        for name, (lower, upper) in bounds.items():
+            if name not in FIT_PARAMETERS:
+                raise ValueError('cannot fit ' + name)
+            if lower > upper:
+                raise ValueError('the bounds of {} are empty'.format(name))
+
+        self.grapher = grapher
+        self.bounds = bounds
+        within = (telemetry[:, 0] >= 0) & (telemetry[:, 0] <=
+                                           grapher.total_time)
+        self.telemetry = telemetry[within]
+        if len(self.telemetry) == 0:
+            raise ValueError('no telemetry within the simulated time span')
+
+        self._names = [name for name in FIT_PARAMETERS if name in bounds]
+        self._time_step = grapher.total_time / (grapher.num_steps - 1)
+        self._workers = workers
+        self._pool = None
+        self.evaluations = 0
+
+    def _parameters(self, candidates: np.ndarray) -> Dict[str, np.ndarray]:
+        """Completes candidates with the parameters that aren't fitted"""
+        parameters = {
+            name: np.full(len(candidates), getattr(self.grapher, name))
+            for name in FIT_PARAMETERS
+        }
+        for column, name in enumerate(self._names):
+            parameters[name] = candidates[:, column]
+        return parameters
+
+    def evaluate(self, candidates: np.ndarray) -> np.ndarray:
+        """Scores a population of candidates
+
+        Args:
+            candidates: (population, fitted parameters) array, in the order
+                of FIT_PARAMETERS
+
+        Returns:
+            root mean square error (METERS) of each candidate
+        """
+        parameters = self._parameters(candidates)
+        grid = (self._time_step, self.grapher.num_steps, self.grapher.diameter)
+        self.evaluations += len(candidates)
+
+        if self._pool is None:
+            engine = (self.grapher.thrust_values, self.grapher.mass_values)
+            return _evaluate(engine, grid, self.telemetry,
+                             parameters['base_mass'],
+                             parameters['drag_coefficient'])
+
+        chunks = np.array_split(np.arange(len(candidates)), self._workers)
+        futures = [
+            self._pool.submit(_evaluate_shared, grid, self.telemetry,
+                              parameters['base_mass'][chunk],
+                              parameters['drag_coefficient'][chunk])
+            for chunk in chunks if len(chunk)
+        ]
+        return np.concatenate([future.result() for future in futures])
+
+    def fit(self,
+            population: int = DEFAULT_POPULATION,
+            generations: int = DEFAULT_GENERATIONS,
+            tolerance: float = DEFAULT_TOLERANCE,
+            seed: int = None) -> Dict[str, Any]:
+        """Searches for the parameters with the smallest error
+
+        Stops after the given number of generations, or once the errors of the
+        whole population are within tolerance of each other.
+
+        Args:
+            population: Number of candidates per generation, at least 4
+            generations: Maximum number of generations
+            tolerance: (METERS) spread of the errors at which to stop
+            seed: Seed of the random search. Fits with the same seed are
+                identical
+
+        Returns:
+            dictionary with the fitted 'parameters', their 'rms_error'
+                (METERS), and the number of 'generations' and 'evaluations'
+        """
+        random = np.random.default_rng(seed)
+        lower = np.array([self.bounds[name][0] for name in self._names])
+        upper = np.array([self.bounds[name][1] for name in self._names])
+
+        tables = None
+        if self._workers > 1:
+            # The workers get the engine once instead of with every batch
+            tables = shared_tables.SharedTables()
+            description = tables.add_curves(SHARED_CURVES,
+                                            self.grapher.thrust_values,
+                                            self.grapher.mass_values)
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                self._workers,
+                initializer=shared_tables.attach,
+                initargs=(description, ))
+        try:
+            candidates, errors, generation = self._evolve(
+                random, lower, upper, population, generations, tolerance)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            if tables is not None:
+                tables.close()
+
+        best = int(np.argmin(errors))
+        parameters = {
+            name: float(values[best])
+            for name, values in self._parameters(candidates).items()
+        }
+        return {
+            'parameters': parameters,
+            'rms_error': float(errors[best]),
+            'generations': generation,
+            'evaluations': self.evaluations
+        }
+
+    def _evolve(self, random: np.random.Generator, lower: np.ndarray,
+                upper: np.ndarray, population: int, generations: int,
+                tolerance: float) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Runs differential evolution, see fit
+
+        Returns:
+            the final candidates, their errors and the number of generations
+        """
+        dimensions = len(lower)
+        candidates = lower + random.random((population, dimensions)) * (upper -
+                                                                         lower)
+        with instrumentation.stage('fitting'):
+            errors = self.evaluate(candidates)
+
+        generation = 0
+        for generation in range(1, generations + 1):
+            if np.ptp(errors) <= tolerance:
+                break
+
+            # Three distinct other candidates for each candidate
+            order = np.argsort(
+                random.random((population, population)) +
+                np.eye(population), axis=1)
+            first, second, third = order[:, 0], order[:, 1], order[:, 2]
+            mutants = np.clip(
+                candidates[first] + DIFFERENTIAL_WEIGHT *
+                (candidates[second] - candidates[third]), lower, upper)
+
+            crossover = random.random(
+                (population, dimensions)) < CROSSOVER_PROBABILITY
+            crossover[np.arange(population),
+                      random.integers(dimensions, size=population)] = True
+            trials = np.where(crossover, mutants, candidates)
+
+            with instrumentation.stage('fitting'):
+                trial_errors = self.evaluate(trials)
+            better = trial_errors <= errors
+            candidates[better] = trials[better]
+            errors[better] = trial_errors[better]
+        return candidates, errors, generation
+
+    def residuals(self, parameters: Dict[str, float]) -> np.ndarray:
+        """Compares the flight with the given parameters against the telemetry
+
+        Args:
+            parameters: Values of FIT_PARAMETERS
+
+        Returns:
+            array with columns for time (SECONDS), recorded altitude, simulated
+                altitude and their difference (METERS)
+        """
+        altitude = batch_integrator.simulate(
+            self.grapher.thrust_values, self.grapher.mass_values,
+            self._time_step, self.grapher.num_steps, parameters['base_mass'],
+            parameters['drag_coefficient'], self.grapher.diameter)[:, 0]
+        times, recorded = self.telemetry[:, 0], self.telemetry[:, 1]
+        simulated = np.interp(times, np.arange(len(altitude)) *
+                              self._time_step, altitude)
+        return np.column_stack((times, recorded, simulated,
+                                simulated - recorded))
+
+
+def from_action(grapher: graph_altitude.AltitudeGrapher,
+                action: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs a fit_rocket action
+
+    Args:
+        grapher: Grapher with the engine and the rocket of the action
+        action: Dictionary that represents a fit_rocket action
+
+    Returns:
+        the result of Fitter.fit
+    """
+    telemetry = data_loader.read_telemetry(action['data_file'],
+                                           action.get('delimiter', ' '))
+    fitter = Fitter(
+        grapher,
+        telemetry, {
+            name: tuple(bounds)
+            for name, bounds in action['fit'].items()
+        },
+        workers=action.get('workers', 1))
+    result = fitter.fit(
+        population=action.get('population', DEFAULT_POPULATION),
+        generations=action.get('generations', DEFAULT_GENERATIONS),
+        tolerance=action.get('tolerance', DEFAULT_TOLERANCE),
+        seed=action.get('seed'))
+
+    if 'filename' in action:
+        with io.open(action['filename'], 'w', newline='\n') as file:
+            writer = csv.writer(file, delimiter=' ')
+            writer.writerows(fitter.residuals(result['parameters']).tolist())
+    return result
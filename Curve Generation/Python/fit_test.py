@@ -0,0 +1,126 @@
+"""Unit test script for batch integration and fitting"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import batch_integrator
+import fit
+import main
+import test_fixtures
+from graph import graph_altitude
+
+
+class FitTest(unittest.TestCase):
+    """Unittest case for batch_integrator and Fitter"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        engine_file = os.path.join(cls._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(engine_file)
+        cls.thrust_values, cls.mass_values = main.load_engine(engine_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def _grapher(self, **parameters):
+        return graph_altitude.AltitudeGrapher(
+            thrust_values=self.thrust_values,
+            mass_values=self.mass_values,
+            total_time=10.0,
+            num_steps=500,
+            diameter=0.1,
+            **parameters)
+
+    def _telemetry(self, base_mass, drag_coefficient):
+        grapher = self._grapher()
+        time_step = grapher.total_time / (grapher.num_steps - 1)
+        altitude = grapher.simulate(
+            time_step,
+            grapher.num_steps,
+            base_mass=base_mass,
+            drag_constant=drag_coefficient,
+            diameter=grapher.diameter,
+            use_cache=False)['altitude']
+        times = np.arange(len(altitude)) * time_step
+        return np.column_stack((times, altitude, np.zeros(len(altitude))))[::7]
+
+    def test_batch_parity(self):
+        """Tests that a batch matches simulating each rocket on its own."""
+        grapher = self._grapher()
+        time_step = grapher.total_time / (grapher.num_steps - 1)
+        base_mass = np.array([0.5, 1.0, 2.0])
+        drag_coefficient = np.array([0.1, 0.5, 0.75])
+        batch = batch_integrator.simulate(
+            self.thrust_values, self.mass_values, time_step,
+            grapher.num_steps, base_mass, drag_coefficient, grapher.diameter)
+        self.assertEqual(batch.shape, (grapher.num_steps, 3))
+
+        for index in range(3):
+            altitude = grapher.simulate(
+                time_step,
+                grapher.num_steps,
+                base_mass=base_mass[index],
+                drag_constant=drag_coefficient[index],
+                diameter=grapher.diameter,
+                use_cache=False)['altitude']
+            np.testing.assert_allclose(
+                batch[:, index], altitude, rtol=1e-9, atol=1e-9)
+
+    def test_recovers_parameters(self):
+        """Tests that fitting synthetic telemetry finds its parameters."""
+        fitter = fit.Fitter(
+            self._grapher(),
+            self._telemetry(1.2, 0.4), {
+                'base_mass': (0.5, 2.0),
+                'drag_coefficient': (0.1, 1.0)
+            })
+        result = fitter.fit(population=16, generations=80, seed=1)
+        self.assertAlmostEqual(result['parameters']['base_mass'], 1.2, places=2)
+        self.assertAlmostEqual(
+            result['parameters']['drag_coefficient'], 0.4, places=2)
+        self.assertLess(result['rms_error'], 0.1)
+
+        residuals = fitter.residuals(result['parameters'])
+        self.assertEqual(residuals.shape, (len(fitter.telemetry), 4))
+        self.assertLess(np.abs(residuals[:, 3]).max(), 0.5)
+
+    def test_fixed_parameter(self):
+        """Tests that parameters without bounds keep the grapher's value."""
+        fitter = fit.Fitter(
+            self._grapher(base_mass=1.2),
+            self._telemetry(1.2, 0.4), {'drag_coefficient': (0.1, 1.0)})
+        result = fitter.fit(population=8, generations=30, seed=2)
+        self.assertEqual(result['parameters']['base_mass'], 1.2)
+        self.assertAlmostEqual(
+            result['parameters']['drag_coefficient'], 0.4, places=2)
+
+    def test_workers(self):
+        """Tests that worker processes find the same fit as a single one."""
+        bounds = {'base_mass': (0.5, 2.0), 'drag_coefficient': (0.1, 1.0)}
+        telemetry = self._telemetry(1.2, 0.4)
+        single = fit.Fitter(self._grapher(), telemetry, bounds)
+        workers = fit.Fitter(self._grapher(), telemetry, bounds, workers=2)
+
+        self.assertEqual(
+            workers.fit(population=8, generations=5, seed=3),
+            single.fit(population=8, generations=5, seed=3))
+
+    def test_invalid(self):
+        """Tests that unusable bounds and telemetry are rejected."""
+        telemetry = self._telemetry(1.0, 0.5)
+        with self.assertRaises(ValueError):
+            fit.Fitter(self._grapher(), telemetry, {'diameter': (0.1, 0.2)})
+        with self.assertRaises(ValueError):
+            fit.Fitter(self._grapher(), telemetry, {'base_mass': (2.0, 1.0)})
+        with self.assertRaises(ValueError):
+            fit.Fitter(self._grapher(), telemetry + [100.0, 0, 0],
+                       {'base_mass': (1.0, 2.0)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,361 @@
+"""Renders how the simulation evolves as telemetry of a flight comes in"""
+
+import json
+import math
+import os
+from typing import Any, Dict
+
+import numpy as np
+
+import data_loader
+import instrumentation
+import state_estimator
+from graph import graph_altitude
+
+GRAPH = graph_altitude.GRAPH
+
+CHECKPOINT_FILENAME = 'checkpoint.json'
+CHECKPOINT_VERSION = 2
+
+# Ways the simulation can use the telemetry received so far
+FEEDBACK = ('interpolate', 'estimator')
+
+
+class FlightGenerator(object):
+    """Generates plots as recorded telemetry comes in
+
+    Each plot shows the telemetry received so far, together with the flight
+    that the simulation predicts from it. By default there's one plot for
+    every sample, but high-rate telemetry can be rendered at a lower frame
+    rate: every sample is still ingested, but the simulation only runs and
+    renders at frame boundaries.
+
+    Long runs periodically write a checkpoint to the result directory, so an
+    interrupted run can be resumed instead of started over. The simulation is
+    rebuilt from the telemetry received so far for every frame, so the
+    telemetry position and the seed of the noise are all the state a frame
+    depends on.
+
+    By default, every frame replays all of the telemetry received so far, so
+    frames get slower as the flight goes on. With 'estimator' feedback, the
+    telemetry is fused into a state estimate as it comes in instead, and
+    every prediction starts from that estimate, at a constant cost.
+
+    Attributes:
+        grapher: The grapher used to simulate and plot
+        result_directory: Destination directory for the generated plots
+        flags: Flags passed to the grapher for each plot
+        seed: Seed of the noise. Drawn from the OS if not given
+        checkpoint_interval: Number of frames between checkpoints
+        resume: Whether to continue from the checkpoint in result_directory
+        feedback: 'interpolate' or 'estimator', see FEEDBACK
+    """
+
+    def __init__(self,
+                 grapher: graph_altitude.AltitudeGrapher,
+                 data_file: str,
+                 result_directory: str,
+                 random_scale: float = 0.0,
+                 delimiter: str = ' ',
+                 seed: int = None,
+                 chunk_size: int = data_loader.TELEMETRY_CHUNK_SIZE,
+                 flags: int = GRAPH.ALTITUDE | GRAPH.BURNOUT,
+                 frame_stride: int = 1,
+                 frame_rate: float = None,
+                 checkpoint_interval: int = 100,
+                 resume: bool = False,
+                 feedback: str = 'interpolate'):
+        """Initializes the generator
+
+        Args:
+            grapher: The grapher used to simulate and plot
+            data_file: Path to recorded telemetry, see
+                data_loader.read_telemetry
+            result_directory: Destination directory for the generated plots
+            random_scale: Scale of the uniform noise added to the recorded
+                altitude (METERS) and acceleration (METERS / SECONDS ^ 2)
+            delimiter: Delimiter used in the data_file
+            seed: Seed for the noise. Runs with the same seed are identical
+            chunk_size: Number of telemetry rows to parse at a time
+            flags: Flags passed to the grapher for each plot
+            frame_stride: Number of telemetry samples per frame
+            frame_rate: (HERTZ) Frames per second of flight time. Takes
+                precedence over frame_stride
+            checkpoint_interval: Number of frames between checkpoints
+            resume: Whether to continue from the checkpoint in
+                result_directory. Frames that already exist aren't rendered
+                again
+            feedback: 'interpolate' to predict from all of the telemetry
+                received so far, or 'estimator' to predict from a state
+                estimate, see state_estimator
+
+        Raises:
+            ValueError: Raised if the stride, frame rate or checkpoint interval
+                isn't positive, or the feedback is unknown
+        """
+        if frame_stride < 1:
+            raise ValueError('frame_stride must be at least 1')
+        if frame_rate is not None and frame_rate <= 0:
+            raise ValueError('frame_rate must be positive')
+        if checkpoint_interval < 1:
+            raise ValueError('checkpoint_interval must be at least 1')
+        if feedback not in FEEDBACK:
+            raise ValueError('feedback must be one of ' + ', '.join(FEEDBACK))
+
+        self.grapher = grapher
+        self.result_directory = result_directory
+        self.flags = flags | GRAPH.SAVE_PLOT
+        # The entropy is recorded in checkpoints, so unseeded runs can resume
+        self.seed = seed if seed is not None else np.random.SeedSequence(
+        ).entropy
+        self._seeded = seed is not None
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.feedback = feedback
+
+        self._data_file = data_file
+        self._random_scale = random_scale
+        self._delimiter = delimiter
+        self._chunk_size = chunk_size
+        self._frame_stride = frame_stride
+        self._frame_rate = frame_rate
+
+    def load_telemetry(self) -> np.ndarray:
+        """Reads the telemetry and adds noise to it
+
+        Returns:
+            array with columns for time (SECONDS), altitude (METERS) and
+                acceleration (METERS / SECONDS ^ 2)
+        """
+        with instrumentation.stage('telemetry_loading'):
+            telemetry = data_loader.read_telemetry(
+                self._data_file, self._delimiter, self._chunk_size)
+            # Row-major, so the noise is drawn in the same order as a loop
+            # over the rows would
+            telemetry[:, 1:] += np.random.default_rng(self.seed).uniform(
+                -1, 1, size=(len(telemetry), 2)) * self._random_scale
+        return telemetry
+
+    def frame_rows(self, times: np.ndarray) -> np.ndarray:
+        """Determines after which telemetry samples a frame is rendered
+
+        The last sample always ends a frame, so that the final plot includes
+        all of the telemetry.
+
+        Args:
+            times: (SECONDS) time of each telemetry sample, in order
+
+        Returns:
+            sorted indices of the samples that end a frame
+        """
+        if len(times) == 0:
+            return np.empty(0, dtype=int)
+
+        if self._frame_rate is not None:
+            # A frame starts with the first sample of every frame period
+            periods = np.floor((times - times[0]) * self._frame_rate)
+            rows = np.flatnonzero(np.diff(periods, prepend=-1))
+        else:
+            rows = np.arange(self._frame_stride - 1, len(times),
+                             self._frame_stride)
+
+        if len(rows) == 0 or rows[-1] != len(times) - 1:
+            rows = np.append(rows, len(times) - 1)
+        return rows
+
+    def frame_filename(self, index: int) -> str:
+        """Returns the location of the plot for the given frame
+
+        Args:
+            index: Index of the frame, zero being the frame without telemetry
+        """
+        return os.path.join(self.result_directory,
+                            '{:0>5}.png'.format(str(index)))
+
+    @property
+    def checkpoint_filename(self) -> str:
+        """Location of the checkpoint within the result directory"""
+        return os.path.join(self.result_directory, CHECKPOINT_FILENAME)
+
+    def _settings(self) -> Dict[str, Any]:
+        """Returns the settings that a checkpoint is only valid for"""
+        return {
+            'version': CHECKPOINT_VERSION,
+            'data_file': os.path.abspath(self._data_file),
+            'random_scale': self._random_scale,
+            'seed': self.seed,
+            'frame_stride': self._frame_stride,
+            'frame_rate': self._frame_rate,
+            'feedback': self.feedback
+        }
+
+    def read_checkpoint(self) -> Dict[str, Any]:
+        """Reads the checkpoint of a previous run
+
+        A checkpoint of an unseeded run also sets the seed, so the resumed run
+        draws the same noise.
+
+        Returns:
+            the checkpoint, or None if there isn't one
+
+        Raises:
+            ValueError: Raised if the checkpoint was written with different
+                settings
+        """
+        if not os.path.exists(self.checkpoint_filename):
+            return None
+        with open(self.checkpoint_filename, 'r') as file:
+            checkpoint = json.load(file)
+
+        settings = self._settings()
+        if not self._seeded:
+            settings['seed'] = checkpoint.get('seed')
+        for key, value in settings.items():
+            if checkpoint.get(key) != value:
+                raise ValueError(
+                    'cannot resume from {}, it was written with a different {}'.
+                    format(self.checkpoint_filename, key))
+
+        self.seed = checkpoint['seed']
+        return checkpoint
+
+    def write_checkpoint(self, frame: int, row: int, num_frames: int) -> None:
+        """Records the progress of the run
+
+        Args:
+            frame: Index of the last frame that was generated
+            row: Number of telemetry rows consumed up to that frame
+            num_frames: Total number of frames of the run
+        """
+        checkpoint = self._settings()
+        checkpoint.update(frame=frame, row=row, num_frames=num_frames)
+
+        temporary = self.checkpoint_filename + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(checkpoint, file, indent=2)
+        os.replace(temporary, self.checkpoint_filename)
+
+    def create_estimator(self) -> state_estimator.StateEstimator:
+        """Creates the estimator for 'estimator' feedback
+
+        The noise added to the telemetry is uniform, with a standard
+        deviation of random_scale / sqrt(3), on top of that of the sensors.
+
+        Returns:
+            an estimator that hasn't received any telemetry yet
+        """
+        added_noise = self._random_scale / math.sqrt(3)
+        return state_estimator.StateEstimator(
+            altitude_noise=math.hypot(state_estimator.ALTITUDE_NOISE,
+                                      added_noise),
+            acceleration_noise=math.hypot(state_estimator.ACCELERATION_NOISE,
+                                          added_noise))
+
+    def render(self, index: int) -> None:
+        """Plots a single frame
+
+        The plot is written under a temporary name first, so a frame that
+        exists is always complete, even if the run was killed while rendering.
+
+        Args:
+            index: Index of the frame
+        """
+        filename = self.frame_filename(index)
+        directory, basename = os.path.split(filename)
+        temporary = os.path.join(directory, '.partial-' + basename)
+        self.grapher.plot(flags=self.flags, filename=temporary)
+        os.replace(temporary, filename)
+
+    def generate(self) -> int:
+        """Generates all of the plots
+
+        When resuming, frames up to the checkpoint and any other frames that
+        already exist are skipped.
+
+        Returns:
+            the number of plots generated
+
+        Raises:
+            ValueError: Raised if the checkpoint was written with different
+                settings, or if an unseeded run with noise is resumed without
+                a checkpoint while frames exist, since their noise can't be
+                drawn again
+        """
+        checkpoint = self.read_checkpoint() if self.resume else None
+        completed = checkpoint['frame'] if checkpoint is not None else -1
+
+        telemetry = self.load_telemetry()
+        previous_altitude = []
+        previous_acceleration = []
+        self.grapher.previous_altitude = previous_altitude
+        self.grapher.previous_acceleration = previous_acceleration
+        estimator = None
+        if self.feedback == 'estimator':
+            estimator = self.create_estimator()
+            self.grapher.estimator = estimator
+
+        rows = telemetry.tolist()
+        frame_rows = self.frame_rows(telemetry[:, 0]).tolist()
+        num_frames = len(frame_rows) + 1
+        if (self.resume and checkpoint is None and not self._seeded
+                and self._random_scale > 0 and any(
+                    os.path.exists(self.frame_filename(index))
+                    for index in range(num_frames))):
+            raise ValueError(
+                'cannot resume in {} without a checkpoint or a seed, the '
+                'existing frames have different noise'.format(
+                    self.result_directory))
+        generated = 0
+        start = 0
+        # Frame zero is rendered before any telemetry has come in
+        for index, end in enumerate([-1] + frame_rows):
+            for time, altitude, acceleration in rows[start:end + 1]:
+                previous_altitude.append((time, altitude))
+                previous_acceleration.append((time, acceleration))
+                if estimator is not None:
+                    estimator.update(time, altitude, acceleration)
+            start = end + 1
+
+            if index <= completed or (self.resume and os.path.exists(
+                    self.frame_filename(index))):
+                continue
+
+            self.render(index)
+            generated += 1
+            if (index + 1) % self.checkpoint_interval == 0:
+                self.write_checkpoint(index, start, num_frames)
+
+        self.write_checkpoint(num_frames - 1, start, num_frames)
+        return generated
+
+
+def from_action(grapher: graph_altitude.AltitudeGrapher,
+                action: Dict[str, Any]) -> FlightGenerator:
+    """Creates the generator for a generate_flight action
+
+    Args:
+        grapher: The grapher used to simulate and plot
+        action: Dictionary that represents a generate_flight action
+
+    Returns:
+        the flight generator
+    """
+    flags = GRAPH.ALTITUDE | GRAPH.BURNOUT
+    if ('errors' in action and 'acceleration' in action['errors']
+            or action.get('uncertainty') == 'covariance'):
+        flags |= GRAPH.ACCELEROMETER_ERROR
+
+    return FlightGenerator(
+        grapher,
+        action['data_file'],
+        action['result_directory'],
+        random_scale=action['random_scale'],
+        delimiter=action.get('delimiter', ' '),
+        seed=action.get('seed'),
+        chunk_size=action.get('chunk_size', data_loader.TELEMETRY_CHUNK_SIZE),
+        flags=flags,
+        frame_stride=action.get('frame_stride', 1),
+        frame_rate=action.get('frame_rate'),
+        checkpoint_interval=action.get('checkpoint_interval', 100),
+        resume=action.get('resume', False),
+        feedback=action.get('feedback', 'interpolate'))
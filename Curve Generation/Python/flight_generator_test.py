@@ -0,0 +1,152 @@
+"""Unit test script for the flight generator"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import flight_generator
+import test_fixtures
+
+
+class RecordingGrapher(object):
+    """Stands in for the grapher and records the telemetry of every plot"""
+
+    def __init__(self):
+        self.previous_altitude = []
+        self.previous_acceleration = []
+        self.plotted = []
+
+    def plot(self, flags: int, filename: str) -> None:
+        self.plotted.append(os.path.basename(filename))
+        with open(filename, 'w') as file:
+            file.write(repr(self.previous_altitude))
+
+
+class FlightGeneratorTest(unittest.TestCase):
+    """Unittest case for FlightGenerator"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.data_file = os.path.join(self._directory.name, 'telemetry.csv')
+        test_fixtures.write_telemetry_file(self.data_file, 20)
+
+    def _generator(self, result_directory, **kwargs):
+        os.makedirs(result_directory, exist_ok=True)
+        grapher = RecordingGrapher()
+        generator = flight_generator.FlightGenerator(
+            grapher, self.data_file, result_directory, random_scale=0.5,
+            **kwargs)
+        return generator, grapher
+
+    def _frames(self, result_directory):
+        frames = {}
+        for name in sorted(os.listdir(result_directory)):
+            if name.endswith('.png'):
+                with open(os.path.join(result_directory, name), 'r') as file:
+                    frames[name] = file.read()
+        return frames
+
+    def test_frame_stride(self):
+        """Tests that all telemetry is used but only every nth row plotted."""
+        directory = os.path.join(self._directory.name, 'stride')
+        generator, grapher = self._generator(directory, frame_stride=3)
+
+        self.assertEqual(generator.generate(), 8)
+        self.assertEqual(len(grapher.previous_altitude), 20)
+
+    def test_frame_rate(self):
+        """Tests that frames follow flight time instead of samples."""
+        directory = os.path.join(self._directory.name, 'rate')
+        generator, _ = self._generator(directory, frame_rate=2.0)
+
+        # A frame starts with the first sample of every half second, and the
+        # last sample always ends one
+        np.testing.assert_array_equal(
+            generator.frame_rows(np.arange(10) * 0.25), [0, 2, 4, 6, 8, 9])
+        self.assertEqual(len(generator.frame_rows(np.empty(0))), 0)
+
+        # Faster than the telemetry, every sample gets a frame
+        generator, grapher = self._generator(directory, frame_rate=1000.0)
+        self.assertEqual(generator.generate(), 21)
+        self.assertEqual(len(grapher.previous_altitude), 20)
+        with self.assertRaises(ValueError):
+            self._generator(directory, frame_rate=0.0)
+
+    def test_seed(self):
+        """Tests that the seed alone determines the noise."""
+        directory = os.path.join(self._directory.name, 'seed')
+        first = self._generator(directory, seed=3)[0].load_telemetry()
+        again = self._generator(directory, seed=3)[0].load_telemetry()
+        other = self._generator(directory, seed=4)[0].load_telemetry()
+
+        np.testing.assert_array_equal(first, again)
+        self.assertFalse(np.array_equal(first[:, 1:], other[:, 1:]))
+        # Only the altitude and acceleration are noisy
+        np.testing.assert_array_equal(first[:, 0], other[:, 0])
+
+    def test_resume(self):
+        """Tests that a resumed run produces the same frames as a full run."""
+        full = os.path.join(self._directory.name, 'full')
+        generator, _ = self._generator(full, seed=3)
+        generator.generate()
+
+        # Pretend the run died after frame 12, with a checkpoint at frame 9
+        partial = os.path.join(self._directory.name, 'partial')
+        generator, _ = self._generator(partial, seed=3, checkpoint_interval=5)
+        generator.generate()
+        for index in range(13, 21):
+            os.remove(generator.frame_filename(index))
+        generator.write_checkpoint(9, 9, 21)
+
+        # The seed comes from the checkpoint
+        generator, grapher = self._generator(partial, resume=True)
+        self.assertEqual(generator.generate(), 8)
+        self.assertTrue(grapher.plotted[0].endswith('00013.png'))
+        self.assertEqual(self._frames(partial), self._frames(full))
+
+    def test_resume_with_different_settings(self):
+        """Tests that a checkpoint is only used with the same settings."""
+        directory = os.path.join(self._directory.name, 'settings')
+        generator, _ = self._generator(directory)
+        generator.generate()
+
+        generator, _ = self._generator(directory, frame_stride=2, resume=True)
+        with self.assertRaises(ValueError):
+            generator.generate()
+
+    def test_resume_without_checkpoint(self):
+        """Tests that unseeded frames aren't mixed with new noise."""
+        directory = os.path.join(self._directory.name, 'unseeded')
+        generator, _ = self._generator(directory)
+        generator.generate()
+        os.remove(generator.checkpoint_filename)
+
+        generator, _ = self._generator(directory, resume=True)
+        with self.assertRaises(ValueError):
+            generator.generate()
+
+        # With a seed, the noise of the existing frames can be drawn again
+        generator, _ = self._generator(directory, seed=3)
+        generator.generate()
+        os.remove(generator.checkpoint_filename)
+        generator, _ = self._generator(directory, seed=3, resume=True)
+        self.assertEqual(generator.generate(), 0)
+
+    def test_estimator_feedback(self):
+        """Tests that the estimator is fed every telemetry sample."""
+        directory = os.path.join(self._directory.name, 'estimator')
+        generator, grapher = self._generator(
+            directory, frame_stride=4, feedback='estimator')
+        generator.generate()
+
+        self.assertEqual(grapher.estimator.state.time,
+                         grapher.previous_altitude[-1][0])
+        with self.assertRaises(ValueError):
+            self._generator(directory, feedback='average')
+
+
+if __name__ == '__main__':
+    unittest.main()
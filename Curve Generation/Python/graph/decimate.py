@@ -0,0 +1,67 @@
+"""Reduces curves to the points that are visible at a given resolution
+
+A curve with far more points than the plot has pixel columns draws the same
+pixels no matter how many points there are. Keeping the first, last, minimum
+and maximum point of every column (M4 decimation) produces an identical
+rasterized line from at most four points per column, so rendering time only
+depends on the size of the figure.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def min_max(x: np.ndarray,
+            y: np.ndarray,
+            num_columns: int,
+            x_range: Tuple[Optional[float], Optional[float]] = None
+            ) -> Tuple[np.ndarray, np.ndarray]:
+    """Decimates a curve to the extremes of each pixel column
+
+    Args:
+        x: Ascending x coordinates of the curve
+        y: y coordinates of the curve
+        num_columns: Number of pixel columns the curve is drawn across
+        x_range: Lower and upper bound of the visible x coordinates, either
+            of which may be None for the end of the curve. Points outside of
+            it are dropped, except for the ones next to it so that the line
+            still runs to the edge, and the columns span this range
+
+    Returns:
+        the x and y coordinates of the decimated curve, in order. Curves that
+            are already small enough are returned unchanged
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    lower, upper = x_range if x_range is not None else (None, None)
+    if len(x) and (lower is not None or upper is not None):
+        first = 0 if lower is None else max(
+            int(np.searchsorted(x, lower, side='right')) - 1, 0)
+        last = len(x) if upper is None else int(
+            np.searchsorted(x, upper, side='left')) + 1
+        x, y = x[first:last], y[first:last]
+    if num_columns < 1 or len(x) <= 4 * num_columns:
+        return x, y
+
+    start = x[0] if lower is None else max(lower, x[0])
+    span = (x[-1] if upper is None else min(upper, x[-1])) - start
+    if span <= 0:
+        return x, y
+    columns = np.clip(((x - start) * (num_columns / span)).astype(int), 0,
+                      num_columns - 1)
+
+    # x is ascending, so every column is a contiguous run of points
+    starts = np.flatnonzero(np.diff(columns, prepend=-1))
+    ends = np.append(starts[1:], len(x)) - 1
+    keep = [starts, ends]
+    run = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(x))))
+    for reduce in (np.minimum, np.maximum):
+        extremes = reduce.reduceat(y, starts)
+        candidates = np.flatnonzero(y == extremes[run])
+        # The first occurrence of the extreme within each run
+        _, first = np.unique(run[candidates], return_index=True)
+        keep.append(candidates[first])
+
+    indices = np.unique(np.concatenate(keep))
+    return x[indices], y[indices]
@@ -0,0 +1,56 @@
+"""Unit test script for curve decimation"""
+
+import unittest
+
+import numpy as np
+
+from graph import decimate
+
+
+class MinMaxTest(unittest.TestCase):
+    """Unittest case for decimate.min_max"""
+
+    def test_small_curve_unchanged(self):
+        """Tests that curves with few points are returned as is."""
+        x = np.arange(10.0)
+        y = x**2
+        decimated_x, decimated_y = decimate.min_max(x, y, 100)
+        np.testing.assert_array_equal(decimated_x, x)
+        np.testing.assert_array_equal(decimated_y, y)
+
+    def test_keeps_extremes(self):
+        """Tests that every column keeps its endpoints, minimum and maximum."""
+        x = np.linspace(0.0, 20.0, num=1000000)
+        y = np.sin(x * 50.0) * 100.0 + x
+        decimated_x, decimated_y = decimate.min_max(x, y, 1000)
+
+        self.assertLessEqual(len(decimated_x), 4000)
+        self.assertTrue(np.all(np.diff(decimated_x) > 0))
+        self.assertEqual(decimated_x[0], x[0])
+        self.assertEqual(decimated_x[-1], x[-1])
+        self.assertEqual(decimated_y.max(), y.max())
+        self.assertEqual(decimated_y.min(), y.min())
+
+        # Every decimated point lies on the original curve
+        indices = np.searchsorted(x, decimated_x)
+        np.testing.assert_array_equal(y[indices], decimated_y)
+
+    def test_visible_range(self):
+        """Tests that points beyond the range are dropped before decimating."""
+        x = np.linspace(0.0, 100.0, num=1000001)
+        y = np.sin(x * 50.0) * 100.0 + x
+        decimated_x, decimated_y = decimate.min_max(x, y, 1000,
+                                                    (None, 20.00005))
+
+        # All of the columns go to the visible range, plus the first point
+        # past it that the line runs to the edge with
+        visible = x < 20.00005
+        self.assertLessEqual(len(decimated_x), 4001)
+        self.assertEqual(decimated_x[0], x[0])
+        self.assertEqual(decimated_x[-1], x[np.count_nonzero(visible)])
+        self.assertTrue(np.all(decimated_x[:-1] < 20.00005))
+        self.assertEqual(decimated_y[:-1].max(), y[visible].max())
+        self.assertEqual(decimated_y[:-1].min(), y[visible].min())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,28 @@
-"""Defines all of the functionality for plotting altitude"""
+"""Defines all of the functionality for plotting altitude
+
+matplotlib is only imported once something is drawn, so that simulating and
+saving trajectories doesn't pay for it.
+"""
 
 import operator
 import io
 import csv
 import enum
-from typing import List, Tuple
-import matplotlib.pyplot as plt
+from typing import Any, Dict, List, Tuple
 import numpy as np
 from calculate import unary_linear_interpolator
 from calculate import acceleration_calculator
+from calculate import covariance_propagator
+from graph import decimate
+import instrumentation
+import native
+import result_cache
+import state_estimator
 import verlet_integrator
 
 UnaryLinearInterpolator = unary_linear_interpolator.UnaryLinearInterpolator
 AccelerationCalculatorDrag = acceleration_calculator.AccelerationCalculatorDrag
+ResultCache = result_cache.ResultCache
 
 
 class GRAPH(enum.IntFlag):
@@ -25,6 +35,30 @@ class GRAPH(enum.IntFlag):
     VELOCITY = 1 << 6
 
 
+def create_figure(figure_size: Tuple[float, float], headless: bool) -> Any:
+    """Creates an empty matplotlib figure
+
+    Args:
+        figure_size: Size of the figure in inches
+        headless: Whether the figure will only be written to a file. Such
+            figures are drawn with the Agg backend and never touch pyplot, so
+            no window system is needed
+
+    Returns:
+        the matplotlib figure
+    """
+    if headless:
+        from matplotlib.backends import backend_agg
+        from matplotlib import figure
+
+        new_figure = figure.Figure(figsize=figure_size)
+        backend_agg.FigureCanvasAgg(new_figure)
+        return new_figure
+
+    import matplotlib.pyplot as plt
+    return plt.figure(figsize=figure_size)
+
+
 class AltitudeGrapher(object):
     """Responsible for data collection and provides plotting methods for
     altitude data.
@@ -42,6 +76,13 @@ class AltitudeGrapher(object):
                  mass_values: List[Tuple[float, float]] = None,
                  diameter: float = None,
                  acceleration_error_constant: float = None,
+                 result_cache: ResultCache = None,
+                 precision: str = 'float64',
+                 backend: str = 'python',
+                 estimator: state_estimator.StateEstimator = None,
+                 uncertainty: str = 'lanes',
+                 drag_coefficient_error: float = 0.0,
+                 base_mass_error: float = 0.0,
                  **kwargs) -> None:
         """Initializes the object
 
@@ -60,6 +101,26 @@ class AltitudeGrapher(object):
             base_mass (optional): Optional value that specifies the mass of an
                 empty rocket in kilograms
             diameter (optional): Diameter of the rocket in meters
+            result_cache (optional): Cache used to reuse trajectories that were
+                simulated with identical parameters
+            precision (optional): 'float32' to simulate in single precision
+                like the flight computer, 'float64' otherwise
+            backend (optional): 'c' to integrate with the flight computer's
+                C libraries, see the native package. Only used for double
+                precision trajectories without recorded data or error lines,
+                the rest always uses 'python'
+            estimator (optional): Estimator of the state of the rocket. If
+                given, predictions start from its estimate instead of from
+                the previously recorded data, see estimator
+            uncertainty (optional): How the error lines are computed. 'lanes'
+                integrates two more trajectories with the acceleration offset
+                by its error, 'covariance' propagates the covariance of the
+                state along the trajectory instead, see
+                calculate.covariance_propagator
+            drag_coefficient_error (optional): Standard deviation of the drag
+                coefficient, only used with 'covariance' uncertainty
+            base_mass_error (optional): Standard deviation of the base mass in
+                kilograms, only used with 'covariance' uncertainty
 
         Raises:
             TypeError: If the correct arguments aren't supplied
@@ -73,9 +134,22 @@ class AltitudeGrapher(object):
         self._drag_coefficient = drag_coefficient
         self._diameter = diameter
         self._acceleration_error_constant = acceleration_error_constant
+        self.result_cache = result_cache
+        if precision not in ('float32', 'float64'):
+            raise TypeError('precision must be \'float32\' or \'float64\'')
+        self._precision = precision
+        if backend not in ('python', 'c'):
+            raise TypeError('backend must be \'python\' or \'c\'')
+        self._backend = backend
+        if uncertainty not in ('lanes', 'covariance'):
+            raise TypeError('uncertainty must be \'lanes\' or \'covariance\'')
+        self._uncertainty = uncertainty
+        self._drag_coefficient_error = drag_coefficient_error
+        self._base_mass_error = base_mass_error
 
         self._previous_acceleration = previous_acceleration if previous_acceleration else []
         self._previous_altitude = previous_altitude if previous_altitude else []
+        self.estimator = estimator
 
         self._total_time = total_time
         self._num_steps = num_steps
@@ -237,6 +311,8 @@ class AltitudeGrapher(object):
         Returns:
             time of the last altitude value captured in seconds
         """
+        if self.estimator is not None:
+            return self.estimator.state.time
         return max(
             map(operator.itemgetter(0), self.previous_altitude), default=0.0)
 
@@ -249,6 +325,305 @@ class AltitudeGrapher(object):
         """
         return self._diameter
 
+    @property
+    def precision(self) -> str:
+        """Accessor for the floating point precision of the simulation
+
+        Returns:
+            'float32' or 'float64'
+        """
+        return self._precision
+
+    @property
+    def backend(self) -> str:
+        """Accessor for the implementation used to integrate
+
+        Returns:
+            'python' or 'c'
+        """
+        return self._backend
+
+    @property
+    def uncertainty(self) -> str:
+        """Accessor for the method used to compute the error lines
+
+        Returns:
+            'lanes' or 'covariance'
+        """
+        return self._uncertainty
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Type the integrator and calculators work in
+
+        Returns:
+            np.float32 in single precision, None for Python floats
+        """
+        return np.float32 if self.precision == 'float32' else None
+
+    @property
+    def estimator(self) -> state_estimator.StateEstimator:
+        """Accessor for the estimator of the state of the rocket
+
+        While there's an estimator, simulations start from its latest
+        estimate, at its time, instead of replaying all of the previously
+        recorded data. Predicting then costs the same however much telemetry
+        has been recorded.
+
+        Returns:
+            the estimator, or None to predict from the recorded data
+        """
+        return self._estimator
+
+    @estimator.setter
+    def estimator(self, estimator: state_estimator.StateEstimator) -> None:
+        """Mutator for the estimator
+
+        Args:
+            estimator: Estimator that is fed the telemetry, or None
+        """
+        self._estimator = estimator
+
+    @property
+    def collected_data(self) -> List[Dict[str, float]]:
+        """Pairs the previously recorded acceleration and altitude values
+
+        Returns:
+            list of dictionaries with the time (seconds), acceleration (meters
+                / seconds ^ 2) and altitude (meters) of each recorded sample
+        """
+        return [{
+            'time': (acceleration[0] + altitude[0]) * 0.5,
+            'acceleration': acceleration[1],
+            'altitude': altitude[1]
+        } for acceleration, altitude in zip(self.previous_acceleration, self.
+                                            previous_altitude)]
+
+    def create_acceleration_calculator(
+            self, base_mass: float, drag_constant: float, diameter: float,
+            collected_data: List[Dict[str, float]]
+    ) -> AccelerationCalculatorDrag:
+        """Builds the acceleration calculator used during integration
+
+        Args:
+            base_mass: Mass of an empty rocket in kilograms
+            drag_constant: Dimensionless constant related to the drag of the
+                rocket
+            diameter: Diameter of the rocket in meters
+            collected_data: Previously recorded data, see collected_data
+
+        Returns:
+            the acceleration calculator
+        """
+        return acceleration_calculator.AccelerationCalculatorDrag(
+            thrust=self.thrust_values,
+            mass=self.mass_values,
+            base_mass=base_mass,
+            drag_constant=drag_constant,
+            diameter=diameter,
+            collected_data=collected_data,
+            dtype=self.dtype)
+
+    def simulate(self,
+                 time_step: float,
+                 num_steps: int,
+                 base_mass: float,
+                 drag_constant: float,
+                 diameter: float,
+                 acceleration_error_constant: float = None,
+                 errors: bool = False,
+                 use_cache: bool = True) -> Dict[str, np.ndarray]:
+        """Integrates the altitude of the rocket
+
+        Trajectories without any previously recorded data are looked up in
+        (and stored to) the result cache, if there is one. With an estimator,
+        the trajectory starts from its estimate instead, see estimator.
+
+        Args:
+            time_step: Time between two steps in seconds
+            num_steps: Number of steps to simulate
+            base_mass: Mass of an empty rocket in kilograms
+            drag_constant: Dimensionless constant related to the drag of the
+                rocket
+            diameter: Diameter of the rocket in meters
+            acceleration_error_constant: Constant that represents the maximum
+                error in the accelerometer
+            errors: Whether to compute the error lines, see uncertainty
+            use_cache: Set to False to bypass the result cache
+
+        Returns:
+            dictionary with the 'altitude' (meters) and 'velocity' (meters /
+                seconds) arrays, plus 'upper_error' and 'lower_error'
+                (meters) if errors were requested
+        """
+        initial_state = None
+        if self.estimator is not None:
+            initial_state = self.estimator.state
+            collected_data = []
+        else:
+            collected_data = self.collected_data
+
+        key = None
+        if (self.result_cache is not None and use_cache and not collected_data
+                and initial_state is None):
+            key = result_cache.make_key(
+                thrust_values=self.thrust_values,
+                mass_values=self.mass_values,
+                time_step=time_step,
+                num_steps=num_steps,
+                base_mass=base_mass,
+                drag_constant=drag_constant,
+                diameter=diameter,
+                acceleration_error_constant=(acceleration_error_constant
+                                             if errors else None),
+                errors=errors,
+                precision=self.precision,
+                backend=self.backend,
+                **self._uncertainty_key(errors))
+            trajectory = self.result_cache.get(key)
+            if trajectory is not None:
+                instrumentation.count('cache_hits')
+                return trajectory
+            instrumentation.count('cache_misses')
+
+        if (self.backend == 'c' and not collected_data and not errors
+                and self.dtype is None and initial_state is None):
+            with instrumentation.stage('integration'):
+                trajectory = native.simulate(
+                    self.thrust_values,
+                    self.mass_values,
+                    time_step,
+                    num_steps=num_steps,
+                    base_mass=base_mass,
+                    drag_constant=drag_constant,
+                    diameter=diameter,
+                    past_n_steps=verlet_integrator.moving_average_steps(
+                        time_step))
+            if key is not None:
+                self.result_cache.put(key, trajectory)
+            return trajectory
+
+        with instrumentation.stage('integration'):
+            acceleration_drag = self.create_acceleration_calculator(
+                base_mass, drag_constant, diameter, collected_data)
+            start = {}
+            if initial_state is not None:
+                start = dict(
+                    start_time=initial_state.time,
+                    initial_value=initial_state.altitude,
+                    initial_velocity=initial_state.velocity,
+                    initial_acceleration=initial_state.acceleration)
+            # The integrator evaluates the acceleration at start_time + step *
+            # time_step, in its own precision
+            dtype = self.dtype or np.float64
+            acceleration_drag.precompute(
+                dtype(start.get('start_time', 0.0)) +
+                np.arange(num_steps, dtype=dtype) * dtype(time_step))
+            altitude_drag = verlet_integrator.SteppingVerletIntegrator(
+                time_step,
+                acceleration_drag,
+                num_steps=num_steps,
+                collected_data=collected_data,
+                acceleration_error_constant=acceleration_error_constant,
+                dtype=self.dtype,
+                **start)
+
+            trajectory = {
+                'altitude': np.array(list(altitude_drag), dtype=self.precision)
+            }
+            # Error lines append to the velocity storage, so read it first
+            trajectory['velocity'] = altitude_drag.velocity_storage
+            if errors and self.uncertainty == 'covariance':
+                propagate = covariance_propagator.CovariancePropagator(
+                    acceleration_drag,
+                    acceleration_error=(
+                        altitude_drag.compute_accelerometer_error() or 0.0),
+                    drag_coefficient_error=self._drag_coefficient_error,
+                    base_mass_error=self._base_mass_error)
+                altitude = trajectory['altitude']
+                deviation = propagate(
+                    start.get('start_time', 0.0) +
+                    (altitude_drag.last_index + np.arange(len(altitude))) *
+                    time_step,
+                    altitude,
+                    initial_covariance=(self.estimator.covariance[:2, :2]
+                                        if self.estimator is not None else
+                                        None))
+                trajectory['upper_error'] = (altitude + deviation).astype(
+                    self.precision)
+                trajectory['lower_error'] = (altitude - deviation).astype(
+                    self.precision)
+            elif errors:
+                upper_error, lower_error = altitude_drag.get_accelerometer_error(
+                )
+                trajectory['upper_error'] = np.array(
+                    upper_error, dtype=self.precision)
+                trajectory['lower_error'] = np.array(
+                    lower_error, dtype=self.precision)
+
+        if key is not None:
+            self.result_cache.put(key, trajectory)
+        return trajectory
+
+    def _uncertainty_key(self, errors: bool) -> Dict[str, Any]:
+        """Settings of the uncertainty that belong in the cache key
+
+        Error lines by lanes are keyed as they always have been, so existing
+        cache entries stay valid.
+        """
+        if not errors or self.uncertainty == 'lanes':
+            return {}
+        return {
+            'uncertainty': [
+                self.uncertainty, self._drag_coefficient_error,
+                self._base_mass_error
+            ]
+        }
+
+    def predict(self,
+                num_steps: int,
+                total_time: float,
+                base_mass: float,
+                drag_constant: float,
+                diameter: float,
+                acceleration_error_constant: float = None,
+                errors: bool = False,
+                use_cache: bool = True
+                ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Predicts the flight from the current time on
+
+        This is the in-flight prediction: it uses whatever telemetry has been
+        recorded so far, or the estimator, see simulate.
+
+        Args:
+            num_steps: Number of steps from the current time to total_time
+            total_time: Time in seconds to predict up to
+            base_mass: Mass of an empty rocket in kilograms
+            drag_constant: Dimensionless constant related to the drag of the
+                rocket
+            diameter: Diameter of the rocket in meters
+            acceleration_error_constant: Constant that represents the maximum
+                error in the accelerometer
+            errors: Whether to compute the error lines, see uncertainty
+            use_cache: Set to False to bypass the result cache
+
+        Returns:
+            the time (seconds) of each step, and the trajectory, see simulate
+        """
+        time = np.linspace(self.current_time, total_time, num=num_steps)
+
+        time_step = time[1] - time[0]
+        trajectory = self.simulate(
+            time_step,
+            num_steps=num_steps,
+            base_mass=base_mass,
+            drag_constant=drag_constant,
+            diameter=diameter,
+            acceleration_error_constant=acceleration_error_constant,
+            errors=errors,
+            use_cache=use_cache)
+        return time, trajectory
+
     def plot(self,
              flags: int = GRAPH.ALTITUDE | GRAPH.BURNOUT,
              figure_size: Tuple[float, float] = (12.8, 9.6),
@@ -259,7 +634,8 @@ class AltitudeGrapher(object):
              diameter: float = None,
              acceleration_error_constant: float = None,
              title: str = 'Altitude',
-             filename: str = None) -> None:
+             filename: str = None,
+             use_cache: bool = True) -> Dict[str, np.ndarray]:
         """Plots the values determined from the given flags
 
         Args:
@@ -280,6 +656,11 @@ class AltitudeGrapher(object):
                 error in the accelerometer
             title: String that titles the figure
             filename: String for a filename to save to
+            use_cache: Set to False to bypass the result cache
+
+        Returns:
+            the simulated trajectory, see simulate, or None if the altitude
+                isn't plotted
         """
         total_time = total_time if total_time else self.total_time
         num_steps = num_steps if num_steps else self.num_steps
@@ -288,60 +669,57 @@ class AltitudeGrapher(object):
         diameter = diameter if diameter else self.diameter
         acceleration_error_constant = acceleration_error_constant if acceleration_error_constant else self.acceleration_error_constant
 
-        figure = plt.figure(figsize=figure_size)
+        figure = create_figure(figure_size, bool(flags & GRAPH.SAVE_PLOT))
         axes = figure.add_subplot(
             1, 1, 1, xlabel=r'Time $(seconds)$', ylabel=r'Altitude $(meters)$')
+        # Curves are decimated to the pixel columns of the visible time range,
+        # so rendering time doesn't grow with num_steps or total_time
+        time_limit = 20
+        visible = (None, time_limit)
+        num_columns = int(np.ceil(axes.get_window_extent().width))
 
-        collected_data = [{
-            'time': (acceleration[0] + altitude[0]) * 0.5,
-            'acceleration': acceleration[1],
-            'altitude': altitude[1]
-        } for acceleration, altitude in zip(self.previous_acceleration, self.
-                                            previous_altitude)]
-
-        acceleration_drag = acceleration_calculator.AccelerationCalculatorDrag(
-            thrust=self.thrust_values,
-            mass=self.mass_values,
-            base_mass=base_mass,
-            drag_constant=drag_constant,
-            diameter=diameter,
-            collected_data=collected_data)
-
+        trajectory = None
         if flags & GRAPH.ALTITUDE:
             axes.plot(
-                list(map(operator.itemgetter(0), self.previous_altitude)),
-                list(map(operator.itemgetter(1), self.previous_altitude)),
+                *decimate.min_max(
+                    list(map(operator.itemgetter(0), self.previous_altitude)),
+                    list(map(operator.itemgetter(1), self.previous_altitude)),
+                    num_columns, visible),
                 color='blue')
-            time = np.linspace(self.current_time, total_time, num=num_steps)
-
-            time_step = time[1] - time[0]
-            altitude_drag = verlet_integrator.SteppingVerletIntegrator(
-                time_step,
-                acceleration_drag,
+            time, trajectory = self.predict(
                 num_steps=num_steps,
-                collected_data=collected_data,
-                acceleration_error_constant=acceleration_error_constant)
+                total_time=total_time,
+                base_mass=base_mass,
+                drag_constant=drag_constant,
+                diameter=diameter,
+                acceleration_error_constant=acceleration_error_constant,
+                errors=bool(flags & GRAPH.ACCELEROMETER_ERROR),
+                use_cache=use_cache)
+            altitude_drag = trajectory['altitude']
             axes.plot(
-                time[:len(altitude_drag)],
-                altitude_drag,
+                *decimate.min_max(time[:len(altitude_drag)], altitude_drag,
+                                  num_columns, visible),
                 color='black',
                 label='Simulation')
 
             if flags & GRAPH.ACCELEROMETER_ERROR:
-                upper_error, lower_error = altitude_drag.get_accelerometer_error(
-                )
+                upper_error = trajectory['upper_error']
+                lower_error = trajectory['lower_error']
+                error_label = ('Acceleration {} Error'
+                               if self.uncertainty == 'lanes' else
+                               '{} Standard Deviation')
                 axes.plot(
-                    time[:len(upper_error)],
-                    upper_error,
+                    *decimate.min_max(time[:len(upper_error)], upper_error,
+                                      num_columns, visible),
                     linestyle='--',
                     color='orange',
-                    label='Acceleration Upper Error')
+                    label=error_label.format('Upper'))
                 axes.plot(
-                    time[:len(lower_error)],
-                    lower_error,
+                    *decimate.min_max(time[:len(lower_error)], lower_error,
+                                      num_columns, visible),
                     linestyle='--',
                     color='orange',
-                    label='Acceleration Lower Error')
+                    label=error_label.format('Lower'))
 
         if flags & GRAPH.BURNOUT:
             axes.axvline(
@@ -351,15 +729,19 @@ class AltitudeGrapher(object):
         if flags & GRAPH.LEGEND:
             axes.legend()
 
-        axes.set_xlim(right=20)
+        axes.set_xlim(right=time_limit)
         axes.set_ylim(bottom=0, top=3000)
         axes.set_title(title)
-        if not flags & GRAPH.SAVE_PLOT:
-            figure.show()
-            plt.show()
-        else:
-            figure.savefig(filename)
-        plt.close(figure)
+        with instrumentation.stage('rendering'):
+            if not flags & GRAPH.SAVE_PLOT:
+                import matplotlib.pyplot as plt
+                figure.show()
+                plt.show()
+                plt.close(figure)
+            else:
+                figure.savefig(filename)
+        instrumentation.count('frames_rendered')
+        return trajectory
 
     def save(self,
              filename: str,
@@ -369,7 +751,8 @@ class AltitudeGrapher(object):
              base_mass: float = None,
              drag_constant: float = None,
              diameter: float = None,
-             acceleration_error_constant: float = None) -> None:
+             acceleration_error_constant: float = None,
+             use_cache: bool = True) -> Dict[str, np.ndarray]:
         """Saves the generated curves to a csv file
         
         Args:
@@ -387,6 +770,10 @@ class AltitudeGrapher(object):
             diameter: Diameter of the rocket in meters,
             acceleration_error_constant: Constant that represents the maximum
                 error in the accelerometer
+            use_cache: Set to False to bypass the result cache
+
+        Returns:
+            the simulated trajectory, see simulate
         """
         total_time = total_time if total_time else self.total_time
         num_steps = num_steps if num_steps else self.num_steps
@@ -395,34 +782,26 @@ class AltitudeGrapher(object):
         diameter = diameter if diameter else self.diameter
         acceleration_error_constant = acceleration_error_constant if acceleration_error_constant else self.acceleration_error_constant
 
-        collected_data = [{
-            'time': (acceleration[0] + altitude[0]) * 0.5,
-            'acceleration': acceleration[1],
-            'altitude': altitude[1]
-        } for acceleration, altitude in zip(self.previous_acceleration, self.
-                                            previous_altitude)]
-
-        acceleration_drag = acceleration_calculator.AccelerationCalculatorDrag(
-            thrust=self.thrust_values,
-            mass=self.mass_values,
-            base_mass=base_mass,
-            drag_constant=drag_constant,
-            diameter=diameter,
-            collected_data=collected_data)
+        acceleration_drag = self.create_acceleration_calculator(
+            base_mass, drag_constant, diameter, self.collected_data)
 
         time = np.linspace(0.0, total_time, num=num_steps)
         time_step = time[1] - time[0]
-        altitude_drag = verlet_integrator.SteppingVerletIntegrator(
+        acceleration_drag.precompute(time)
+        trajectory = self.simulate(
             time_step,
-            acceleration_drag,
             num_steps=num_steps,
-            collected_data=collected_data,
-            acceleration_error_constant=acceleration_error_constant)
+            base_mass=base_mass,
+            drag_constant=drag_constant,
+            diameter=diameter,
+            acceleration_error_constant=acceleration_error_constant,
+            use_cache=use_cache)
 
-        with io.open(filename, 'w', newline='\n') as file:
+        with instrumentation.stage('csv_writing'), io.open(
+                filename, 'w', newline='\n') as file:
             writer = csv.writer(file, delimiter=' ')
             for time_value, altitude_value, velocity_value in zip(
-                    time, altitude_drag, altitude_drag.get_velocity_iter()):
+                    time, trajectory['altitude'], trajectory['velocity']):
                 row = [time_value]
                 if flags & GRAPH.ALTITUDE:
                     row.append(altitude_value)
@@ -433,3 +812,4 @@ class AltitudeGrapher(object):
                     # pass
 
                 writer.writerow(row)
+        return trajectory
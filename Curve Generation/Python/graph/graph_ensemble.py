@@ -0,0 +1,257 @@
+"""Plots ensembles of thousands of trajectories, such as a dispersion's
+
+Drawing each trajectory as its own line costs a matplotlib artist per
+trajectory, so rendering slows down with the size of the ensemble. Instead,
+trajectories are added a batch at a time to a histogram of altitude by time,
+with one time column per pixel column of the figure. The histogram is drawn
+as a single image, and the percentile envelopes are read off of it, so
+rendering takes the same time for a hundred trajectories as for a hundred
+thousand, and memory doesn't grow with the ensemble either.
+
+In 'lines' mode, up to max_lines of the trajectories are drawn on top of the
+histogram as a single LineCollection.
+
+    ensemble = EnsemblePlot(total_time, num_steps)
+    for altitude in batches:
+        ensemble.add(altitude)
+    ensemble.render('ensemble.png')
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+import instrumentation
+from graph import graph_altitude
+
+MODES = ('density', 'lines')
+
+DEFAULT_PERCENTILES = (5.0, 50.0, 95.0)
+# Pixel columns of the default figure size
+DEFAULT_COLUMNS = 1280
+DEFAULT_ROWS = 480
+DEFAULT_MAX_LINES = 1000
+
+# Room above the highest altitude of the first batch, when the range of the
+# altitude isn't given
+ALTITUDE_MARGIN = 1.25
+
+
+class EnsemblePlot(object):
+    """Accumulates trajectories and plots their distribution
+
+    Attributes:
+        mode: 'density' or 'lines', see MODES
+        time: (SECONDS) time of each column of the histogram
+        altitude_range: (METERS) lower and upper bound of the histogram
+        histogram: Number of trajectories in each (column, row) cell
+        count: Number of trajectories added
+        lines: Trajectories kept for 'lines' mode, sampled at time
+    """
+
+    def __init__(self,
+                 total_time: float,
+                 num_steps: int,
+                 mode: str = 'density',
+                 altitude_range: Tuple[float, float] = None,
+                 columns: int = DEFAULT_COLUMNS,
+                 rows: int = DEFAULT_ROWS,
+                 max_lines: int = DEFAULT_MAX_LINES):
+        """Initializes an empty ensemble
+
+        Args:
+            total_time: (SECONDS) time span of the trajectories
+            num_steps: Number of steps of every trajectory
+            mode: 'density' to draw the histogram, or 'lines' to also draw
+                some of the trajectories
+            altitude_range: (METERS) lower and upper bound of the histogram.
+                Defaults to the ground up to ALTITUDE_MARGIN times the highest
+                altitude of the first batch. Altitudes above the range are
+                counted in the top row
+            columns: Number of time columns, at most num_steps
+            rows: Number of altitude rows
+            max_lines: Number of trajectories kept for 'lines' mode
+
+        Raises:
+            ValueError: Raised if the mode is unknown
+        """
+        if mode not in MODES:
+            raise ValueError('mode must be one of ' + ', '.join(MODES))
+
+        self.mode = mode
+        self.altitude_range = altitude_range
+        self.count = 0
+        self._indices = np.unique(
+            np.linspace(0, num_steps - 1, min(columns, num_steps)).round()
+            .astype(int))
+        self.time = self._indices * (total_time / max(num_steps - 1, 1))
+        self._rows = rows
+        self.histogram = np.zeros((len(self._indices), rows), dtype=np.int64)
+        self._max_lines = max_lines if mode == 'lines' else 0
+        self.lines = np.empty((0, len(self._indices)))
+
+    def add(self, altitude: np.ndarray) -> None:
+        """Adds a batch of trajectories
+
+        Args:
+            altitude: (num_steps, trajectories) array of altitudes (METERS),
+                as returned by batch_integrator.simulate. Steps that are below
+                the range or not finite, such as those of a diverged
+                simulation, are left out
+        """
+        sampled = np.asarray(altitude, dtype=float)[self._indices]
+        if sampled.ndim == 1:
+            sampled = sampled[:, np.newaxis]
+        if self.altitude_range is None:
+            with np.errstate(invalid='ignore'):
+                highest = np.nanmax(np.where(np.isfinite(sampled), sampled,
+                                             np.nan))
+            self.altitude_range = (0.0, ALTITUDE_MARGIN * float(highest))
+        lower, upper = self.altitude_range
+
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(sampled) & (sampled >= lower)
+            rows = np.minimum(
+                ((np.where(valid, sampled, lower) - lower) *
+                 (self._rows / (upper - lower))).astype(int), self._rows - 1)
+        cells = (np.arange(len(self._indices))[:, np.newaxis] * self._rows +
+                 rows)[valid]
+        self.histogram += np.bincount(
+            cells, minlength=self.histogram.size).reshape(self.histogram.shape)
+        self.count += sampled.shape[1]
+
+        if len(self.lines) < self._max_lines:
+            self.lines = np.concatenate(
+                (self.lines,
+                 sampled[:, :self._max_lines - len(self.lines)].T))
+        instrumentation.count('ensemble_trajectories', sampled.shape[1])
+
+    def percentiles(self, percentiles: Sequence[float]) -> np.ndarray:
+        """Percentiles of the altitude at each column
+
+        Read off of the histogram, interpolating linearly within a row, so
+        they are accurate to the height of a row.
+
+        Args:
+            percentiles: Percentiles to compute, in [0, 100]
+
+        Returns:
+            (percentiles, columns) array of altitudes (METERS). Columns
+                without any trajectory are NaN
+        """
+        lower, upper = self.altitude_range
+        height = (upper - lower) / self._rows
+        cumulative = np.cumsum(self.histogram, axis=1)
+        totals = cumulative[:, -1]
+        values = np.full((len(percentiles), len(totals)), np.nan)
+        filled = totals > 0
+        columns = np.arange(len(totals))[filled]
+        for index, percentile in enumerate(percentiles):
+            target = totals[filled] * (percentile / 100.0)
+            row = np.minimum(
+                np.sum(cumulative[filled] < target[:, np.newaxis], axis=1),
+                self._rows - 1)
+            below = cumulative[columns, row] - self.histogram[columns, row]
+            fraction = (target - below) / np.maximum(
+                self.histogram[columns, row], 1)
+            values[index, filled] = lower + (row + fraction) * height
+        return values
+
+    def render(self,
+               filename: str = None,
+               percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+               figure_size: Tuple[float, float] = (12.8, 9.6),
+               title: str = 'Altitude') -> None:
+        """Plots the histogram, the percentile envelopes and the lines
+
+        Args:
+            filename: If given, the plot is saved to this image file instead
+                of being shown in a window
+            percentiles: Percentiles of the altitude to draw as envelopes
+            figure_size: Size of the figure in inches
+            title: String that titles the figure
+
+        Raises:
+            ValueError: Raised if no trajectories were added
+        """
+        if self.count == 0:
+            raise ValueError('no trajectories to plot')
+        from matplotlib import collections
+
+        lower, upper = self.altitude_range
+        figure = graph_altitude.create_figure(figure_size,
+                                              filename is not None)
+        axes = figure.add_subplot(
+            1, 1, 1, xlabel=r'Time $(seconds)$', ylabel=r'Altitude $(meters)$')
+
+        # One image however many trajectories there are. Each column is
+        # scaled to its own peak, or the spread out columns after burnout
+        # would be too faint to see next to the narrow ones before it
+        shown = self.histogram / np.maximum(
+            self.histogram.max(axis=1, keepdims=True), 1)
+        axes.imshow(
+            np.ma.masked_equal(shown.T, 0),
+            origin='lower',
+            aspect='auto',
+            interpolation='nearest',
+            cmap='Blues',
+            extent=(self.time[0], self.time[-1], lower, upper))
+
+        if len(self.lines):
+            segments = np.stack(
+                np.broadcast_arrays(self.time[np.newaxis, :], self.lines),
+                axis=-1)
+            axes.add_collection(
+                collections.LineCollection(
+                    segments,
+                    colors='black',
+                    linewidths=0.5,
+                    alpha=min(1.0, max(0.02, 20.0 / len(self.lines)))))
+
+        for percentile, values in zip(percentiles,
+                                      self.percentiles(percentiles)):
+            axes.plot(
+                self.time,
+                values,
+                color='red',
+                linestyle='-' if percentile == 50 else '--',
+                label='{:g}th percentile'.format(percentile))
+
+        if len(percentiles):
+            axes.legend()
+        axes.set_xlim(self.time[0], self.time[-1])
+        axes.set_ylim(bottom=lower, top=upper)
+        axes.set_title('{} ({} trajectories)'.format(title, self.count))
+        with instrumentation.stage('rendering'):
+            if filename is None:
+                import matplotlib.pyplot as plt
+                figure.show()
+                plt.show()
+                plt.close(figure)
+            else:
+                figure.savefig(filename)
+        instrumentation.count('frames_rendered')
+
+
+def plot_trajectories(altitude: np.ndarray,
+                      total_time: float,
+                      filename: str = None,
+                      mode: str = 'density',
+                      percentiles: Sequence[float] = DEFAULT_PERCENTILES
+                      ) -> EnsemblePlot:
+    """Plots trajectories that are already in memory
+
+    Args:
+        altitude: (num_steps, trajectories) array of altitudes (METERS)
+        total_time: (SECONDS) time span of the trajectories
+        filename: If given, the plot is saved to this image file
+        mode: 'density' or 'lines', see MODES
+        percentiles: Percentiles of the altitude to draw as envelopes
+
+    Returns:
+        the ensemble that was plotted
+    """
+    ensemble = EnsemblePlot(total_time, len(altitude), mode=mode)
+    ensemble.add(altitude)
+    ensemble.render(filename, percentiles)
+    return ensemble
@@ -0,0 +1,66 @@
+"""Unit test script for ensemble plots"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from graph import graph_ensemble
+
+
+class EnsemblePlotTest(unittest.TestCase):
+    """Unittest case for EnsemblePlot"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        # Parabolas with uniformly spread peaks
+        self.time = np.linspace(0.0, 10.0, 2001)
+        peaks = np.random.default_rng(0).uniform(100.0, 200.0, 5000)
+        self.altitude = peaks * (1.0 - ((self.time[:, np.newaxis] - 5.0) /
+                                        5.0)**2)
+
+    def test_histogram(self):
+        """Tests that batches add up and every trajectory is counted."""
+        ensemble = graph_ensemble.EnsemblePlot(10.0, 2001, columns=100)
+        for start in range(0, 5000, 1000):
+            ensemble.add(self.altitude[:, start:start + 1000])
+        self.assertEqual(ensemble.count, 5000)
+        self.assertEqual(len(ensemble.time), 100)
+        np.testing.assert_array_equal(
+            ensemble.histogram.sum(axis=1), np.full(100, 5000))
+        # Diverged steps are left out
+        diverged = self.altitude[:, :10].copy()
+        diverged[-5:] = np.nan
+        ensemble.add(diverged)
+        self.assertEqual(ensemble.histogram[-1].sum(), 5000)
+
+    def test_percentiles(self):
+        """Tests the envelopes against exact percentiles."""
+        ensemble = graph_ensemble.EnsemblePlot(10.0, 2001, columns=200)
+        ensemble.add(self.altitude)
+        lower, upper = ensemble.altitude_range
+        height = (upper - lower) / graph_ensemble.DEFAULT_ROWS
+        envelopes = ensemble.percentiles([5, 50, 95])
+        indices = np.round(ensemble.time / 10.0 * 2000).astype(int)
+        exact = np.percentile(self.altitude[indices], [5, 50, 95], axis=1)
+        np.testing.assert_allclose(envelopes, exact, atol=height)
+
+    def test_render(self):
+        """Tests that both modes write a plot, with a bounded number of lines."""
+        for mode in graph_ensemble.MODES:
+            with self.subTest(mode=mode):
+                filename = os.path.join(self._directory.name, mode + '.png')
+                ensemble = graph_ensemble.plot_trajectories(
+                    self.altitude, 10.0, filename=filename, mode=mode)
+                self.assertTrue(os.path.exists(filename))
+                self.assertEqual(
+                    len(ensemble.lines),
+                    graph_ensemble.DEFAULT_MAX_LINES if mode == 'lines' else 0)
+        with self.assertRaises(ValueError):
+            graph_ensemble.EnsemblePlot(10.0, 2001, mode='scatter')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Timers and counters used to find out where the time goes in a run
+
+Instrumentation is disabled by default, in which case every call is close to
+free. Enable it with the --profile flag of main.py, or through enable() when
+using the modules directly.
+
+Example:
+    with instrumentation.stage('integration'):
+        ...
+    instrumentation.count('frames_rendered')
+"""
+
+import collections
+import contextlib
+import json
+import time
+from typing import Any, Dict, Iterator
+
+
+class Instrumentation(object):
+    """Collects timings of named stages and named counters
+
+    Attributes:
+        enabled: Whether anything is being recorded
+        counters: Value of each named counter
+    """
+
+    def __init__(self):
+        """Initializes a disabled, empty instrumentation object"""
+        self.enabled = False
+        self.reset()
+
+    def reset(self) -> None:
+        """Discards everything that has been recorded"""
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self.counters = collections.Counter()
+        self._actions = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Times the enclosed block under the given name
+
+        Stages may be nested, in which case the time is counted towards each
+        of them.
+
+        Args:
+            name: Name of the stage
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stage = self._stages.setdefault(name, {
+                'calls': 0,
+                'seconds': 0.0
+            })
+            stage['calls'] += 1
+            stage['seconds'] += elapsed
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increments the named counter
+
+        Args:
+            name: Name of the counter
+            amount: Value to add to the counter
+        """
+        if self.enabled:
+            self.counters[name] += amount
+
+    @contextlib.contextmanager
+    def action(self, index: int, action_type: str) -> Iterator[None]:
+        """Records the runtime and counters of a single action
+
+        Args:
+            index: Position of the action within the input
+            action_type: The 'action' value of the action
+        """
+        if not self.enabled:
+            yield
+            return
+
+        counters = self.counters.copy()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._actions.append({
+                'index': index,
+                'action': action_type,
+                'seconds': time.perf_counter() - start,
+                'counters': dict(self.counters - counters)
+            })
+
+    def report(self) -> Dict[str, Any]:
+        """Summarizes everything that has been recorded
+
+        Returns:
+            dictionary with the 'stages', 'counters' and 'actions' recorded
+        """
+        return {
+            'stages': {
+                name: dict(stage)
+                for name, stage in sorted(self._stages.items())
+            },
+            'counters': dict(sorted(self.counters.items())),
+            'actions': list(self._actions)
+        }
+
+    def write_report(self, filename: str) -> None:
+        """Writes the report to a JSON file
+
+        Args:
+            filename: Location of the report
+        """
+        with open(filename, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+INSTRUMENTATION = Instrumentation()
+
+
+def enable() -> None:
+    """Enables the shared instrumentation object"""
+    INSTRUMENTATION.enabled = True
+
+
+def disable() -> None:
+    """Disables the shared instrumentation object"""
+    INSTRUMENTATION.enabled = False
+
+
+def stage(name: str):
+    """Times the enclosed block, see Instrumentation.stage"""
+    return INSTRUMENTATION.stage(name)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Increments the named counter, see Instrumentation.count"""
+    # Inlined since this is called from within the integration loop
+    if INSTRUMENTATION.enabled:
+        INSTRUMENTATION.counters[name] += amount
+
+
+def action(index: int, action_type: str):
+    """Records a single action, see Instrumentation.action"""
+    return INSTRUMENTATION.action(index, action_type)
@@ -0,0 +1,111 @@
+"""Unit test script for the instrumentation"""
+
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+
+import instrumentation
+import main
+import test_fixtures
+
+
+class InstrumentationTest(unittest.TestCase):
+    """Unittest case for instrumentation.Instrumentation"""
+
+    def test_disabled(self):
+        """Tests that nothing is recorded unless enabled."""
+        recorder = instrumentation.Instrumentation()
+        with recorder.action(0, 'save_rocket'), recorder.stage('integration'):
+            recorder.count('frames_rendered')
+
+        self.assertEqual(recorder.report(), {
+            'stages': {},
+            'counters': {},
+            'actions': []
+        })
+
+    def test_actions(self):
+        """Tests that every action only gets its own counters."""
+        recorder = instrumentation.Instrumentation()
+        recorder.enabled = True
+        recorder.count('frames_rendered', 2)
+        with recorder.action(3, 'plot_rocket'):
+            with recorder.stage('rendering'), recorder.stage('integration'):
+                recorder.count('frames_rendered')
+
+        report = recorder.report()
+        self.assertEqual(report['counters'], {'frames_rendered': 3})
+        self.assertEqual(list(report['stages']), ['integration', 'rendering'])
+        self.assertEqual(report['stages']['rendering']['calls'], 1)
+        self.assertEqual(len(report['actions']), 1)
+        self.assertEqual(report['actions'][0]['index'], 3)
+        self.assertEqual(report['actions'][0]['action'], 'plot_rocket')
+        self.assertEqual(report['actions'][0]['counters'],
+                         {'frames_rendered': 1})
+
+
+class ProfileFlagTest(unittest.TestCase):
+    """Unittest case for the --profile and --cprofile flags of main.py"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        instrumentation.INSTRUMENTATION.reset()
+        self.addCleanup(instrumentation.INSTRUMENTATION.reset)
+        self.addCleanup(instrumentation.disable)
+
+    def _path(self, name):
+        return os.path.join(self._directory.name, name)
+
+    def test_report(self):
+        """Tests that a run writes the stages, counters and actions."""
+        test_fixtures.write_engine_file(self._path('engine.rse'))
+        rocket = {
+            'engine_file': self._path('engine.rse'),
+            'diameter': 0.1,
+            'total_time': 10.0,
+            'num_steps': 50
+        }
+        actions = [
+            dict(rocket, action='save_rocket', filename=self._path('out.csv')),
+            dict(rocket, action='plot_rocket', filename=self._path('out.png'))
+        ]
+        with open(self._path('actions.json'), 'w') as file:
+            json.dump(actions, file)
+
+        argv = [
+            'main.py', '-f', self._path('actions.json'), '--no-cache',
+            '--profile', self._path('report.json'), '--cprofile',
+            self._path('run.prof')
+        ]
+        with mock.patch('sys.argv', argv):
+            main.main()
+
+        with open(self._path('report.json'), 'r') as file:
+            report = json.load(file)
+        for name in ('schema_loading', 'schema_validation', 'engine_parsing',
+                     'integration', 'csv_writing', 'rendering'):
+            self.assertIn(name, report['stages'])
+        self.assertGreater(report['counters']['acceleration_evaluations'], 0)
+        self.assertEqual(report['counters']['frames_rendered'], 1)
+
+        self.assertEqual([entry['action'] for entry in report['actions']],
+                         ['save_rocket', 'plot_rocket'])
+        self.assertEqual([entry['index'] for entry in report['actions']],
+                         [0, 1])
+        self.assertGreater(
+            report['actions'][0]['counters']['acceleration_evaluations'], 0)
+        self.assertNotIn('frames_rendered', report['actions'][0]['counters'])
+        self.assertEqual(report['actions'][1]['counters']['frames_rendered'],
+                         1)
+
+        # The cProfile statistics can be loaded for the whole run
+        self.assertGreater(pstats.Stats(self._path('run.prof')).total_calls,
+                           0)
+
+
+if __name__ == '__main__':
+    unittest.main()
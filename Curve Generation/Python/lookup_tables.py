@@ -0,0 +1,551 @@
+#!/usr/bin/env python
+"""Precomputes lookup tables for the flight computer as C headers
+
+Evaluating the density and integrating the rest of the flight costs the
+flight computer floating point work every cycle. Instead, this tabulates
+
+    density_table.h     density by altitude above sea level
+    apogee_table.h      apogee by altitude and velocity after burnout
+
+on uniform grids, quantized to 8 or 16 bit integers, with the same density
+calculator and integrator as the simulation. Each header has a lookup
+function that interpolates linearly between the entries, and documents the
+resolution of the table and the largest error of a lookup. The error is
+measured against the exact values between the entries, so it includes both
+the interpolation and the quantization.
+
+    $ python lookup_tables.py -f actions.json -o ../C/include --check
+
+The apogee table belongs to the rocket of one action of the file. --check
+compiles the headers with the host's C++ compiler and compares their lookups
+against the ones done here.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import math
+import os
+import subprocess
+import tempfile
+import textwrap
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+import batch_integrator
+import convergence
+import main
+import native
+from calculate import density_calculator
+from graph import graph_altitude
+
+# Range of the pressure table (METERS)
+DENSITY_RANGE = (0.0, 9144.0)
+DEFAULT_DENSITY_SIZE = 256
+DEFAULT_APOGEE_SIZE = (64, 64)
+DEFAULT_BITS = 16
+BITS = (8, 16)
+
+# The apogee table reaches this much beyond the nominal apogee and the
+# nominal maximum velocity
+RANGE_MARGIN = 1.25
+
+# Number of points between two entries at which the error is measured
+ERROR_SUBDIVISIONS = 16
+
+FLAGS = ['-std=c++11', '-Wall', '-Wextra', '-Werror']
+
+
+class QuantizedTable(object):
+    """Values on a uniform grid, stored as unsigned integers
+
+    A value is offset + code * scale. Lookups clamp to the grid.
+
+    Attributes:
+        name: Name of the table in C, e.g. 'Density' for kDensityTable and
+            LookupDensity
+        unit: Unit of the values
+        axes: (name, unit, start, step, size) of each dimension, the first
+            one varying slowest
+        codes: Quantized values
+        offset: Value of code 0
+        scale: Difference in value between successive codes
+        error: Largest absolute error of a lookup, see measure_error
+        relative_error: error relative to the largest value
+    """
+
+    def __init__(self, name: str, unit: str,
+                 axes: List[Tuple[str, str, float, float, int]],
+                 values: np.ndarray, bits: int = DEFAULT_BITS):
+        """Quantizes the values
+
+        Args:
+            name: Name of the table in C
+            unit: Unit of the values
+            axes: (name, unit, start, step, size) of each dimension
+            values: Value at every point of the grid
+            bits: Bits per entry, 8 or 16
+
+        Raises:
+            ValueError: Raised if the number of bits is unsupported, there are
+                more than two axes, an axis has fewer than two entries, or the
+                values don't match the grid
+        """
+        if bits not in BITS:
+            raise ValueError('bits must be one of ' +
+                             ', '.join(map(str, BITS)))
+        if not 1 <= len(axes) <= 2:
+            raise ValueError('tables have one or two axes')
+        if any(axis[4] < 2 for axis in axes):
+            raise ValueError('every axis needs at least two entries')
+        values = np.asarray(values, dtype=float)
+        if values.shape != tuple(axis[4] for axis in axes):
+            raise ValueError('the values do not match the grid')
+
+        self.name = name
+        self.unit = unit
+        self.axes = axes
+        self.bits = bits
+        # Rounded like the constants in the header, so lookups here match
+        self.offset = float(np.float32(values.min()))
+        spread = float(values.max()) - self.offset
+        self.scale = float(np.float32(spread / (2**bits - 1) or 1.0))
+        self.codes = np.clip(
+            np.round((values - self.offset) / self.scale), 0,
+            2**bits - 1).astype(np.uint8 if bits == 8 else np.uint16)
+        self.error = math.nan
+        self.relative_error = math.nan
+
+    def lookup(self, *coordinates: np.ndarray) -> np.ndarray:
+        """Interpolates the table the way the C lookup does
+
+        Args:
+            coordinates: Position along every axis
+
+        Returns:
+            the interpolated values
+        """
+        corners = []
+        for axis, coordinate in zip(self.axes, coordinates):
+            _, _, start, step, size = axis
+            # Multiplied by the inverse step in single precision, as in C
+            position = np.clip(
+                (np.asarray(coordinate, dtype=float) - np.float32(start)) *
+                float(np.float32(1.0 / step)), 0.0, size - 1)
+            index = np.minimum(position.astype(int), size - 2)
+            corners.append((index, position - index))
+
+        code = 0.0
+        for offsets in itertools.product((0, 1), repeat=len(corners)):
+            weight = 1.0
+            for offset, (_, fraction) in zip(offsets, corners):
+                weight = weight * (fraction if offset else 1.0 - fraction)
+            entry = self.codes[tuple(
+                index + offset
+                for offset, (index, _) in zip(offsets, corners))]
+            code = code + weight * entry
+        return self.offset + code * self.scale
+
+    def measure_error(self, exact: Callable[..., np.ndarray],
+                      subdivisions: int = ERROR_SUBDIVISIONS) -> float:
+        """Measures the largest error of a lookup
+
+        Args:
+            exact: Exact value at the given coordinates, vectorized
+            subdivisions: Number of points per interval along every axis
+
+        Returns:
+            the largest absolute error, also stored in error
+        """
+        grids = [
+            np.linspace(start, start + step * (size - 1),
+                        (size - 1) * subdivisions + 1)
+            for _, _, start, step, size in self.axes
+        ]
+        coordinates = [
+            grid.ravel() for grid in np.meshgrid(*grids, indexing='ij')
+        ]
+        values = exact(*coordinates)
+        difference = np.abs(self.lookup(*coordinates) - values)
+        self.error = float(np.max(difference))
+        self.relative_error = self.error / float(np.max(np.abs(values)))
+        return self.error
+
+    def header(self, description: str) -> str:
+        """Renders the table as a C header
+
+        Args:
+            description: What the table holds and where it comes from
+
+        Returns:
+            the contents of the header
+        """
+        prefix = 'k{}Table'.format(self.name)
+        guard = '_CURVE_GEN_{}_TABLE_H_'.format(self.name.upper())
+        code_type = 'uint{}_t'.format(self.bits)
+        lines = ['/**'] + [
+            ' * ' + line for line in textwrap.wrap(description, 76)
+        ] + [' *']
+        lines.append(' * Generated by lookup_tables.py, do not edit.')
+        for name, unit, start, step, size in self.axes:
+            lines.append(' * {}: {} entries from {:g} to {:g} {}, every {:g}'
+                         ' {}.'.format(name, size, start,
+                                       start + step * (size - 1), unit, step,
+                                       unit))
+        lines.append(' * Quantized to {} bits, in steps of {:.6g} {}.'.format(
+            self.bits, self.scale, self.unit))
+        lines.append(' * Largest error of a lookup within the table: '
+                     '{:.6g} {} ({:.3g}% of the largest value).'.format(
+                         self.error, self.unit, self.relative_error * 100))
+        lines += [' */', '', '#ifndef ' + guard, '#define ' + guard, '']
+        lines += ['#include <stddef.h>', '#include <stdint.h>', '']
+
+        lines.append('static const float {}Offset = {};'.format(
+            prefix, _float(self.offset)))
+        lines.append('static const float {}Scale = {};'.format(
+            prefix, _float(self.scale)))
+        for name, _, start, step, size in self.axes:
+            axis = prefix + _camel(name)
+            lines.append('static const size_t {}Size = {};'.format(axis, size))
+            lines.append('static const float {}Start = {};'.format(
+                axis, _float(start)))
+            lines.append('static const float {}InverseStep = {};'.format(
+                axis, _float(1.0 / step)))
+        lines.append('')
+
+        dimensions = ''.join('[{}]'.format(size) for *_, size in self.axes)
+        lines.append('static const {} {}{} = {{'.format(
+            code_type, prefix, dimensions))
+        rows = self.codes.reshape(-1, self.axes[-1][4])
+        for row in rows:
+            entries = ['{}'.format(code) for code in row.tolist()]
+            row_lines = [
+                '  ' + ', '.join(entries[start:start + 12]) + ','
+                for start in range(0, len(entries), 12)
+            ]
+            if len(self.axes) == 2:
+                row_lines = (['  {'] + ['  ' + line for line in row_lines] +
+                             ['  },'])
+            lines += row_lines
+        lines += ['};', '']
+
+        names = [name for name, *_ in self.axes]
+        lines.append('/**')
+        lines.append(' * Interpolates the {} table linearly.'.format(
+            self.name.lower()))
+        for name, unit, *_ in self.axes:
+            lines.append(' * @param {} expressed in {}, clamped to the table.'
+                         .format(name, unit))
+        lines.append(' * @return {}, expressed in {}.'.format(
+            self.name.lower(), self.unit))
+        lines.append(' */')
+        lines.append('static inline float Lookup{}({}) {{'.format(
+            self.name, ', '.join('float ' + name for name in names)))
+        for name in names:
+            axis = prefix + _camel(name)
+            lines += [
+                '  float {0}_position = ({0} - {1}Start) * {1}InverseStep;'.
+                format(name, axis),
+                '  if ({0}_position < 0.0f) {0}_position = 0.0f;'.format(name),
+                '  if ({0}_position > (float)({1}Size - 1)) {{'.format(
+                    name, axis),
+                '    {0}_position = (float)({1}Size - 1);'.format(name, axis),
+                '  }',
+                '  size_t {0}_index = (size_t){0}_position;'.format(name),
+                '  if ({0}_index > {1}Size - 2) {0}_index = {1}Size - 2;'.
+                format(name, axis),
+                '  float {0}_fraction = {0}_position - (float){0}_index;'.
+                format(name),
+            ]
+        if len(names) == 1:
+            lines += [
+                '  float low = {}[{}_index];'.format(prefix, names[0]),
+                '  float high = {}[{}_index + 1];'.format(prefix, names[0]),
+                '  float code = low + {}_fraction * (high - low);'.format(
+                    names[0])
+            ]
+        else:
+            first, second = names
+            for row in ('low', 'high'):
+                lines.append('  const {} *{} = {}[{}_index{}];'.format(
+                    code_type, row, prefix, first,
+                    '' if row == 'low' else ' + 1'))
+                lines.append(
+                    '  float {0}_code = {0}[{1}_index] + {1}_fraction * '
+                    '((float){0}[{1}_index + 1] - (float){0}[{1}_index]);'.
+                    format(row, second))
+            lines.append('  float code = low_code + {}_fraction * '
+                         '(high_code - low_code);'.format(first))
+        lines += [
+            '  return {0}Offset + code * {0}Scale;'.format(prefix), '}', '',
+            '#endif // ' + guard, ''
+        ]
+        return '\n'.join(lines)
+
+
+def _camel(name: str) -> str:
+    """altitude -> Altitude"""
+    return ''.join(word.capitalize() for word in name.split('_'))
+
+
+def _float(value: float) -> str:
+    """C literal of the float closest to value"""
+    return '{!r}f'.format(float(np.float32(value)))
+
+
+def density_table(size: int = DEFAULT_DENSITY_SIZE,
+                  bits: int = DEFAULT_BITS) -> QuantizedTable:
+    """Tabulates the density of air over the range of the pressure table
+
+    Args:
+        size: Number of entries
+        bits: Bits per entry, 8 or 16
+
+    Returns:
+        the table, with its error measured
+    """
+    start, stop = DENSITY_RANGE
+    step = (stop - start) / (size - 1)
+    density = density_calculator.DensityCalculator(start_height=0.0)
+    altitude = start + step * np.arange(size)
+    table = QuantizedTable('Density', 'kilograms / (meters ^ 3)',
+                           [('altitude', 'meters', start, step, size)],
+                           density(altitude), bits)
+    table.measure_error(density)
+    return table
+
+
+def coast_apogees(grapher: graph_altitude.AltitudeGrapher,
+                  altitude: np.ndarray, velocity: np.ndarray) -> np.ndarray:
+    """Integrates the flight of the rocket after burnout
+
+    Args:
+        grapher: Grapher with the engine, the rocket and the discretization
+        altitude: (METERS) altitude of each rocket at burnout
+        velocity: (METERS / SECONDS) velocity of each rocket at burnout
+
+    Returns:
+        the apogee (METERS) of each rocket
+    """
+    time_step = grapher.total_time / (grapher.num_steps - 1)
+    # Drag only shortens the climb
+    climb_time = float(np.max(velocity)) / batch_integrator.GRAVITY
+    num_steps = int(math.ceil(climb_time / time_step)) + 3
+    empty_mass = grapher.base_mass + grapher.mass_values[-1][1]
+    with np.errstate(over='ignore', invalid='ignore'):
+        trajectory = batch_integrator.simulate([(0.0, 0.0)],
+                                               [(0.0, 0.0)],
+                                               time_step,
+                                               num_steps,
+                                               empty_mass,
+                                               grapher.drag_coefficient,
+                                               grapher.diameter,
+                                               initial_value=altitude,
+                                               initial_velocity=velocity)
+    return np.nanmax(trajectory, axis=0)
+
+
+def apogee_table(grapher: graph_altitude.AltitudeGrapher,
+                 max_altitude: float = None,
+                 max_velocity: float = None,
+                 size: Tuple[int, int] = DEFAULT_APOGEE_SIZE,
+                 bits: int = DEFAULT_BITS) -> QuantizedTable:
+    """Tabulates the apogee of the rocket by its state after burnout
+
+    Args:
+        grapher: Grapher with the engine, the rocket and the discretization
+        max_altitude: (METERS) largest altitude of the table. Defaults to the
+            nominal apogee plus a margin
+        max_velocity: (METERS / SECONDS) largest velocity of the table.
+            Defaults to the nominal maximum velocity plus a margin
+        size: Number of altitudes and velocities
+        bits: Bits per entry, 8 or 16
+
+    Returns:
+        the table, with its error measured
+    """
+    if max_altitude is None or max_velocity is None:
+        time_step = grapher.total_time / (grapher.num_steps - 1)
+        with np.errstate(over='ignore', invalid='ignore'):
+            nominal = batch_integrator.simulate(
+                grapher.thrust_values, grapher.mass_values, time_step,
+                grapher.num_steps, grapher.base_mass,
+                grapher.drag_coefficient, grapher.diameter)[:, 0]
+        if max_altitude is None:
+            max_altitude = RANGE_MARGIN * float(np.nanmax(nominal))
+        if max_velocity is None:
+            max_velocity = RANGE_MARGIN * float(
+                np.nanmax(np.diff(nominal)) / time_step)
+
+    altitudes, velocities = size
+    axes = [('altitude', 'meters', 0.0, max_altitude / (altitudes - 1),
+             altitudes),
+            ('velocity', 'meters / seconds', 0.0,
+             max_velocity / (velocities - 1), velocities)]
+    grid = np.meshgrid(
+        np.linspace(0.0, max_altitude, altitudes),
+        np.linspace(0.0, max_velocity, velocities),
+        indexing='ij')
+    apogees = coast_apogees(grapher, grid[0].ravel(), grid[1].ravel())
+    table = QuantizedTable('Apogee', 'meters', axes,
+                           apogees.reshape(size), bits)
+    # Integrating every point is costly, so only the centers of the cells,
+    # which are furthest from the entries, are measured
+    table.measure_error(
+        lambda altitude, velocity: coast_apogees(grapher, altitude, velocity),
+        subdivisions=2)
+    return table
+
+
+def write_headers(tables: Dict[str, Tuple[QuantizedTable, str]],
+                  directory: str) -> List[str]:
+    """Writes each table to a header
+
+    Args:
+        tables: Table and description by file name
+        directory: Directory to write the headers to
+
+    Returns:
+        the locations of the headers
+    """
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for name, (table, description) in tables.items():
+        filename = os.path.join(directory, name)
+        with io.open(filename, 'w', newline='\n') as file:
+            file.write(table.header(description))
+        filenames.append(filename)
+    return filenames
+
+
+def compile_check(headers: Dict[str, QuantizedTable],
+                  points: List[np.ndarray],
+                  compiler: str = None) -> List[np.ndarray]:
+    """Compiles the headers into a program that looks up the given points
+
+    Args:
+        headers: Table by location of its header
+        points: Coordinates to look up in each table, one array per axis
+            stacked into rows
+        compiler: C++ compiler to use, see native.build.find_compiler for the
+            default
+
+    Returns:
+        the values the compiled lookups returned, for each table
+
+    Raises:
+        OSError: Raised if there's no compiler
+        subprocess.CalledProcessError: Raised if the headers don't compile
+    """
+    compiler = compiler or native.build.find_compiler()
+    if compiler is None:
+        raise OSError('no C++ compiler found to check the headers, set CXX')
+
+    lines = ['#include <stdio.h>', '']
+    lines += ['#include "{}"'.format(os.path.abspath(header))
+              for header in headers]
+    lines += ['', 'int main() {']
+    for table, coordinates in zip(headers.values(), points):
+        coordinates = np.atleast_2d(coordinates)
+        for column in range(coordinates.shape[1]):
+            lines.append('  printf("%.9g\\n", Lookup{}({}));'.format(
+                table.name, ', '.join(
+                    _float(value) for value in coordinates[:, column])))
+    lines += ['  return 0;', '}', '']
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'check.cc')
+        program = os.path.join(directory, 'check')
+        with io.open(source, 'w') as file:
+            file.write('\n'.join(lines))
+        subprocess.run([compiler] + FLAGS + [source, '-o', program],
+                       check=True)
+        output = subprocess.run([program],
+                                check=True,
+                                stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+    values = np.array(output.split(), dtype=float)
+    counts = [np.atleast_2d(coordinates).shape[1] for coordinates in points]
+    return np.split(values, np.cumsum(counts)[:-1])
+
+
+def run() -> None:
+    """Writes the headers for an action of the given file"""
+    parser = argparse.ArgumentParser(
+        description='Exports quantized lookup tables as C headers')
+    parser.add_argument(
+        '-f',
+        type=argparse.FileType(),
+        required=True,
+        help='a JSON file of a list of actions')
+    parser.add_argument(
+        '-o', type=str, required=True, help='directory to write headers to')
+    parser.add_argument(
+        '--index',
+        type=int,
+        default=0,
+        help='the action whose rocket the apogee table is for')
+    parser.add_argument(
+        '--bits', type=int, choices=BITS, default=DEFAULT_BITS)
+    parser.add_argument(
+        '--density-size', type=int, default=DEFAULT_DENSITY_SIZE)
+    parser.add_argument(
+        '--apogee-size', type=int, nargs=2, default=DEFAULT_APOGEE_SIZE)
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help='compile the headers and compare their lookups')
+    args = parser.parse_args()
+
+    actions = json.load(args.f)
+    args.f.close()
+    main.load_validator().validate(actions)
+    action = actions[args.index]
+    thrust_values, mass_values = main.load_engine(action['engine_file'])
+    action, _ = convergence.resolve(action, thrust_values, mass_values)
+    grapher = graph_altitude.AltitudeGrapher(
+        thrust_values=thrust_values, mass_values=mass_values, **action)
+
+    tables = {
+        'density_table.h': (density_table(args.density_size, args.bits),
+                            'Density of air by altitude above sea level.'),
+        'apogee_table.h': (apogee_table(
+            grapher, size=tuple(args.apogee_size), bits=args.bits),
+                           'Apogee above the pad by altitude above the pad and '
+                           'velocity after burnout, for the rocket of {} with '
+                           '{:g} kg, {:g} m and a drag coefficient of {:g}.'
+                           .format(
+                               os.path.basename(action['engine_file']),
+                               grapher.base_mass, grapher.diameter,
+                               grapher.drag_coefficient))
+    }
+    filenames = write_headers(tables, args.o)
+    for filename, (table, _) in zip(filenames, tables.values()):
+        print('{}: {} entries, largest error {:.6g} {}'.format(
+            filename, table.codes.size, table.error, table.unit))
+
+    if args.check:
+        headers = {
+            filename: table
+            for filename, (table, _) in zip(filenames, tables.values())
+        }
+        random = np.random.default_rng(0)
+        points = [
+            np.array([
+                random.uniform(start, start + step * (size - 1), 1000)
+                for _, _, start, step, size in table.axes
+            ]) for table in headers.values()
+        ]
+        for table, coordinates, values in zip(
+                headers.values(), points, compile_check(headers, points)):
+            # Lookups are in single precision on the flight computer
+            expected = table.lookup(*np.float32(coordinates).astype(float))
+            print('{}: compiled lookups differ by up to {:.3g} {}'.format(
+                table.name,
+                float(np.max(np.abs(values - expected))), table.unit))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,119 @@
+"""Unit test script for the lookup tables of the flight computer"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import lookup_tables
+import main
+import native
+import test_fixtures
+from calculate import density_calculator
+from graph import graph_altitude
+
+
+class LookupTablesTest(unittest.TestCase):
+    """Unittest case for quantized tables and their C headers"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        engine_file = os.path.join(cls._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(engine_file)
+        thrust_values, mass_values = main.load_engine(engine_file)
+        cls.grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values,
+            mass_values=mass_values,
+            total_time=20.0,
+            num_steps=2000,
+            diameter=0.1)
+        cls.density = lookup_tables.density_table(size=64)
+        cls.apogee = lookup_tables.apogee_table(cls.grapher, size=(12, 16))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def test_quantization(self):
+        """Tests that entries are within half a step of their values."""
+        values = np.linspace(1.0, 2.0, 11)**2
+        for bits in lookup_tables.BITS:
+            with self.subTest(bits=bits):
+                table = lookup_tables.QuantizedTable(
+                    'Square', 'meters', [('x', 'meters', 1.0, 0.1, 11)],
+                    values, bits)
+                lookup = table.lookup(np.linspace(1.0, 2.0, 11))
+                self.assertLessEqual(
+                    np.max(np.abs(lookup - values)), table.scale * 0.5001)
+                # Clamped outside of the table
+                self.assertAlmostEqual(
+                    float(table.lookup(0.0)), float(lookup[0]))
+                self.assertAlmostEqual(
+                    float(table.lookup(5.0)), float(lookup[-1]))
+        with self.assertRaises(ValueError):
+            lookup_tables.QuantizedTable('Square', 'meters',
+                                         [('x', 'meters', 1.0, 0.1, 11)],
+                                         values, 12)
+
+    def test_error_bounds(self):
+        """Tests that lookups stay within the measured error."""
+        density = density_calculator.DensityCalculator(start_height=0.0)
+        altitude = np.random.default_rng(0).uniform(0.0, 9144.0, 1000)
+        self.assertLessEqual(
+            np.max(np.abs(self.density.lookup(altitude) - density(altitude))),
+            self.density.error)
+        self.assertLess(self.density.relative_error, 1e-2)
+        self.assertLess(self.apogee.relative_error, 1e-2)
+
+    def test_coast_apogees(self):
+        """Tests the apogee against the flight it was taken from."""
+        time_step = self.grapher.total_time / (self.grapher.num_steps - 1)
+        flight = self.grapher.simulate(
+            time_step,
+            self.grapher.num_steps,
+            base_mass=self.grapher.base_mass,
+            drag_constant=self.grapher.drag_coefficient,
+            diameter=self.grapher.diameter,
+            use_cache=False)
+        altitude = flight['altitude']
+        burnout = int(np.ceil(test_fixtures.BURN_TIME / time_step)) + 1
+        velocity = (altitude[burnout] - altitude[burnout - 1]) / time_step
+        apogee = lookup_tables.coast_apogees(
+            self.grapher, np.array([altitude[burnout], 100.0]),
+            np.array([velocity, 0.0]))
+        # Restarting loses the moving average of the velocity, so the two
+        # only agree closely
+        self.assertLess(abs(apogee[0] / np.max(altitude) - 1.0), 5e-3)
+        self.assertAlmostEqual(apogee[1], 100.0)
+
+    @unittest.skipUnless(native.build.find_compiler(),
+                         'no C++ compiler to check the headers with')
+    def test_compile_check(self):
+        """Tests that the headers compile and look up the same values."""
+        tables = {
+            'density_table.h': (self.density, 'Density.'),
+            'apogee_table.h': (self.apogee, 'Apogee.')
+        }
+        filenames = lookup_tables.write_headers(tables, self._directory.name)
+        headers = {
+            filename: table
+            for filename, (table, _) in zip(filenames, tables.values())
+        }
+        points = [
+            np.array([[-10.0, 0.0, 1234.5, 9144.0, 20000.0]]),
+            np.array([[0.0, 500.0, 1e4], [0.0, 123.4, -5.0]])
+        ]
+        for table, coordinates, values in zip(
+                headers.values(), points,
+                lookup_tables.compile_check(headers, points)):
+            np.testing.assert_allclose(
+                values,
+                table.lookup(*coordinates),
+                rtol=1e-5,
+                atol=table.scale * 1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
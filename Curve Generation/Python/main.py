@@ -1,16 +1,32 @@
 #!/usr/bin/env python
-"""Entry point into the "application". Really a convenience to the user"""
+"""Entry point into the "application". Really a convenience to the user
+
+jsonschema and matplotlib are imported lazily, since interpreter startup
+dominates the runtime of small runs.
+"""
 
 import argparse
-import random
+import cProfile
+import functools
 import json
-import jsonschema
 import io
-import csv
 import os.path
-from typing import List, Dict, Any, IO
+import time
+from typing import List, Dict, Any, IO, Iterable, Iterator, Tuple
+
+import numpy as np
 
+import convergence
 import data_loader
+import dispersion
+import fit
+import flight_generator
+import instrumentation
+import replay
+import result_cache
+import sensitivity
+import shared_tables
+import sweep
 from graph import graph_altitude
 
 
@@ -19,13 +35,57 @@ def main() -> None:
     parser = create_argparser()
     args = parser.parse_args()
 
+    if args.profile:
+        instrumentation.enable()
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler:
+        profiler.enable()
+
+    try:
+        run(args)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if args.profile:
+            instrumentation.INSTRUMENTATION.write_report(args.profile)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Performs the work requested by the parsed command line arguments
+
+    Args:
+        args: Arguments parsed by the parser from create_argparser
+    """
     if hasattr(args, 'f') and args.f != None:
-        schema = load_schema(args.s) if hasattr(
-            args, 's') and args.s != None else load_schema()
-        actions = json.load(args.f)
+        import jsonschema
+
+        with instrumentation.stage('schema_loading'):
+            validator = load_validator(args.s) if hasattr(
+                args, 's') and args.s != None else load_validator()
+        json_lines = args.jsonl or args.f.name.endswith('.jsonl')
+        cache = None if args.no_cache else result_cache.ResultCache(
+            args.cache_dir)
+        log = io.open(args.results, 'w') if args.results else None
         try:
-            jsonschema.Draft7Validator(schema).validate(actions)
-            parse_actions(actions)
+            if json_lines:
+                # Every action is validated right before it runs
+                actions = read_json_lines(args.f)
+            else:
+                actions = json.load(args.f)
+                with instrumentation.stage('schema_validation'):
+                    validator.validate(actions)
+            for index, result in enumerate(
+                    iterate_results(
+                        actions,
+                        cache=cache,
+                        validator=validator if json_lines else None,
+                        log=log)):
+                if 'step_study' in result:
+                    print('action {}: num_steps {} ({})'.format(
+                        index, result['num_steps'], 'converged'
+                        if result['step_study']['converged'] else
+                        'did not converge'))
             args.f.close()
         except (jsonschema.exceptions.SchemaError,
                 jsonschema.exceptions.ValidationError) as err:
@@ -33,6 +93,9 @@ def main() -> None:
         except ValueError as err:
             raise ValueError('invalid input from file: ' +
                              str(args.f.name)) from err
+        finally:
+            if log is not None:
+                log.close()
 
 
 def create_argparser() -> argparse.ArgumentParser:
@@ -51,28 +114,200 @@ def create_argparser() -> argparse.ArgumentParser:
         '-s',
         type=str,
         help='a JSON schema to validate against file input')
+    parser.add_argument(
+        '--jsonl',
+        action='store_true',
+        help='read -f as JSON Lines, one action per line, and run each '
+        'action as soon as it is read. Implied by a .jsonl extension')
+    parser.add_argument(
+        '--results',
+        type=str,
+        metavar='LOG',
+        help='write a JSON line with the apogee, burnout time, runtime and '
+        'output of every action to this file as soon as it finishes')
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=result_cache.DEFAULT_DIRECTORY,
+        help='directory used to cache simulated trajectories')
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='always recompute trajectories instead of reusing cached ones')
+    parser.add_argument(
+        '--profile',
+        type=str,
+        metavar='REPORT',
+        help='write per-stage timings and counters to this JSON file')
+    parser.add_argument(
+        '--cprofile',
+        type=str,
+        metavar='STATS',
+        help='write cProfile statistics to this file')
     return parser
 
 
-def parse_actions(actions: List[Dict[str, Any]]) -> None:
+def parse_actions(actions: List[Dict[str, Any]],
+                  cache: result_cache.ResultCache = None
+                  ) -> List[Dict[str, Any]]:
     """Parses the given actions
 
     Args:
         actions: List of dictionaries that represent actions. Usually read in
             from JSON file
+        cache: Optional cache of previously simulated trajectories
+
+    Returns:
+        the result of each action, see parse_action
 
     Raises:
         ValueError: Raised when the format of the JSON is wrong
     """
-    for action in actions:
-        parse_action(action)
+    return list(iterate_results(actions, cache=cache))
+
+
+def iterate_results(actions: Iterable[Dict[str, Any]],
+                    cache: result_cache.ResultCache = None,
+                    validator: 'jsonschema.Draft7Validator' = None,
+                    log: IO[str] = None) -> Iterator[Dict[str, Any]]:
+    """Parses actions one at a time
+
+    Actions are only read from the iterable when the previous one is done, so
+    actions can be streamed in, and their results streamed out.
+
+    Args:
+        actions: Dictionaries that represent actions, see read_json_lines
+        cache: Optional cache of previously simulated trajectories
+        validator: If given, every action is validated right before it is
+            parsed
+        log: If given, a line with the summary of each result is written to
+            it as soon as the action is done, see log_result
+
+    Yields:
+        the result of each action, see parse_action
+
+    Raises:
+        ValueError: Raised when the format of the JSON is wrong
+        jsonschema.exceptions.ValidationError: Raised when an action doesn't
+            match the schema
+    """
+    for index, action in enumerate(actions):
+        if validator is not None:
+            with instrumentation.stage('schema_validation'):
+                validator.validate([action])
+        start = time.perf_counter()
+        with instrumentation.action(index, action.get('action')):
+            result = parse_action(action, cache=cache, details=log is not None)
+        if log is not None:
+            log_result(log, index, result, time.perf_counter() - start)
+        yield result
+
+
+def read_json_lines(file: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Reads actions from a JSON Lines file, one line at a time
+
+    Args:
+        file: File with one JSON action per line. Blank lines are skipped
+
+    Yields:
+        each action
+
+    Raises:
+        ValueError: Raised when a line isn't valid JSON
+    """
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as err:
+            raise ValueError('line {} is not valid JSON: {}'.format(
+                number, err)) from err
+
+
+def log_result(log: IO[str], index: int, result: Dict[str, Any],
+               runtime: float) -> None:
+    """Writes the summary of a result as a line of JSON
+
+    The line is flushed right away, so other programs can follow the log
+    while the actions are still running.
+
+    Args:
+        log: File to write to
+        index: Position of the action within the input
+        result: Result of the action, see parse_action with details
+        runtime: (SECONDS) time it took to parse the action
+    """
+    log.write(
+        json.dumps({
+            'index': index,
+            'action': result['action'],
+            'apogee': result.get('apogee'),
+            'burnout_time': result.get('burnout_time'),
+            'runtime': runtime,
+            'output': result.get('filename', result.get('result_directory'))
+        }) + '\n')
+    log.flush()
+
+
+def load_engine(filename: str
+                ) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+    """Reads the thrust and mass curves from an engine file
+
+    Parsed curves are kept in memory for as long as the file is unchanged, so
+    long-running processes only parse each engine once. Engines that another
+    process shared with this one (see shared_tables) aren't parsed at all.
+
+    Args:
+        filename: Location of the .rse file
+
+    Returns:
+        thrust values as (SECONDS, NEWTONS) and mass values as (SECONDS,
+            KILOGRAMS) tuples
+
+    Raises:
+        OSError: the file cannot be opened
+    """
+    shared = shared_tables.find_engine(filename)
+    if shared is not None:
+        return shared
+
+    status = os.stat(filename)
+    return _load_engine(
+        os.path.abspath(filename), status.st_mtime_ns, status.st_size)
+
+
+@functools.lru_cache(maxsize=64)
+def _load_engine(filename: str, modification_time: int, size: int
+                 ) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+    """Parses the engine file, see load_engine
+
+    The modification time and size are only part of the cache key.
+    """
+    with instrumentation.stage('engine_parsing'):
+        data = data_loader.read_rock_sim(filename)
+
+    thrust_values = [(x['t'], x['f']) for x in data]
+    mass_values = [(x['t'], x['m']) for x in data]
+    return (thrust_values, mass_values)
 
 
-def parse_action(action: Dict[str, Any]) -> None:
+def parse_action(action: Dict[str, Any],
+                 cache: result_cache.ResultCache = None,
+                 details: bool = False) -> Dict[str, Any]:
     """Parses the given action
 
     Args:
         action: Dictionary that represents an action
+        cache: Optional cache of previously simulated trajectories. Ignored
+            if the action sets 'cache' to false
+        details: Whether to add the 'burnout_time' (SECONDS) of the engine to
+            the result, and the 'apogee' (METERS) of actions that simulate a
+            single flight
+
+    Returns:
+        dictionary with the 'action' type and the files it produced under
+            'filename' or 'result_directory'
 
     Raises:
         ValueError: Raised if the format of the given dictionary is incorrect.
@@ -80,52 +315,80 @@ def parse_action(action: Dict[str, Any]) -> None:
     if not 'action' in action:
         raise ValueError('no action is defined')
     action_type = action['action']
+    result = {'action': action_type}
+    trajectory = None
 
-    data_filename = action['engine_file']
-    data = data_loader.read_rock_sim(data_filename)
-
-    thrust_values = [(x['t'], x['f']) for x in data]
-    mass_values = [(x['t'], x['m']) for x in data]
+    thrust_values, mass_values = load_engine(action['engine_file'])
+    action, study = convergence.resolve(
+        action, thrust_values, mass_values, cache=cache)
+    if study is not None:
+        result['num_steps'] = study['num_steps']
+        result['step_study'] = study
+    use_cache = action.get('cache', True)
     grapher = graph_altitude.AltitudeGrapher(
-        thrust_values=thrust_values, mass_values=mass_values, **action)
+        thrust_values=thrust_values,
+        mass_values=mass_values,
+        result_cache=cache,
+        **action)
 
     if action_type == 'plot_rocket':
 
         flags = graph_altitude.GRAPH.ALTITUDE | graph_altitude.GRAPH.BURNOUT | graph_altitude.GRAPH.LEGEND
-        if 'errors' in action and 'acceleration' in action['errors']:
+        if ('errors' in action and 'acceleration' in action['errors']
+                or action.get('uncertainty') == 'covariance'):
             flags |= graph_altitude.GRAPH.ACCELEROMETER_ERROR
-        grapher.plot(flags=flags)
+        if 'filename' in action:
+            flags |= graph_altitude.GRAPH.SAVE_PLOT
+        trajectory = grapher.plot(
+            flags=flags, filename=action.get('filename'), use_cache=use_cache)
+        if 'filename' in action:
+            result['filename'] = action['filename']
 
     elif action_type == 'save_rocket':
         flags = graph_altitude.GRAPH.ALTITUDE | graph_altitude.GRAPH.ACCELERATION | graph_altitude.GRAPH.VELOCITY
-        grapher.save(action['filename'], flags=flags)
+        trajectory = grapher.save(
+            action['filename'], flags=flags, use_cache=use_cache)
+        result['filename'] = action['filename']
 
     elif action_type == 'generate_flight':
-        previous_altitude = []
-        previous_acceleration = []
-        flags = graph_altitude.GRAPH.ALTITUDE | graph_altitude.GRAPH.BURNOUT | graph_altitude.GRAPH.SAVE_PLOT
-        if 'errors' in action and 'acceleration' in action['errors']:
-            flags |= graph_altitude.GRAPH.ACCELEROMETER_ERROR
+        generator = flight_generator.from_action(grapher, action)
+        result['frames'] = generator.generate()
+        result['result_directory'] = action['result_directory']
+
+    elif action_type == 'sweep_rocket':
+        result['trajectories'] = sweep.run(
+            grapher,
+            action['result_directory'],
+            action['sweep'],
+            chunk_size=action.get('chunk_size', sweep.DEFAULT_CHUNK_SIZE))
+        result['result_directory'] = action['result_directory']
+
+    elif action_type == 'fit_rocket':
+        result.update(fit.from_action(grapher, action))
+        if 'filename' in action:
+            result['filename'] = action['filename']
+
+    elif action_type == 'dispersion_rocket':
+        result.update(dispersion.from_action(grapher, action))
+        if 'filename' in action:
+            result['filename'] = action['filename']
 
-        with io.open(action['data_file'], 'r', newline='\n') as file:
-            reader = csv.reader(file, delimiter=' ')
-            csv_iterator = iter(reader)
+    elif action_type == 'replay_flight':
+        result.update(replay.from_action(grapher, action))
+        if 'filename' in action:
+            result['filename'] = action['filename']
 
-            grapher.previous_altitude = previous_altitude
-            grapher.previous_acceleration = previous_acceleration
-            grapher.plot(
-                flags=flags,
-                filename=os.path.join(action['result_directory'], '00000.png'))
-            for index, row in enumerate(csv_iterator):
-                previous_altitude.append((float(row[0]), float(
-                    row[1]) + random.uniform(-1, 1) * action['random_scale']))
-                previous_acceleration.append((float(row[0]), float(
-                    row[2]) + random.uniform(-1, 1) * action['random_scale']))
+    elif action_type == 'sensitivity_rocket':
+        result.update(sensitivity.from_action(grapher, action))
+        if 'filename' in action:
+            result['filename'] = action['filename']
 
-                grapher.plot(
-                    flags=flags,
-                    filename=os.path.join(action['result_directory'],
-                                          '{:0>5}.png'.format(str(index + 1))))
+    if details:
+        result['burnout_time'] = max(
+            thrust_time for thrust_time, _ in thrust_values)
+        if trajectory is not None:
+            result['apogee'] = float(np.max(trajectory['altitude']))
+    return result
 
 
 def load_schema(filename: str = os.path.join('schema', 'input.schema.json')) -> Dict[str, Any]:
@@ -143,5 +406,23 @@ def load_schema(filename: str = os.path.join('schema', 'input.schema.json')) ->
     return schema
 
 
+def load_validator(filename: str = os.path.join('schema', 'input.schema.json')
+                   ) -> 'jsonschema.Draft7Validator':
+    """Loads the JSON schema and builds a validator for it
+
+    jsonschema is only imported here, so runs without an action file don't
+    pay for it.
+
+    Args:
+        filename: Optional parameter to specify a different schema
+
+    Returns:
+        validator for the schema
+    """
+    import jsonschema
+
+    return jsonschema.Draft7Validator(load_schema(filename))
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,85 @@
+"""Unit test script for streaming actions from JSON Lines"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import jsonschema
+
+import main
+import test_fixtures
+
+
+class JsonLinesTest(unittest.TestCase):
+    """Unittest case for JSON Lines input and the result log"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.engine_file = os.path.join(self._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(self.engine_file)
+
+    def _action(self, name: str) -> dict:
+        return {
+            'action': 'save_rocket',
+            'engine_file': self.engine_file,
+            'diameter': 0.1,
+            'total_time': 10.0,
+            'num_steps': 200,
+            'filename': os.path.join(self._directory.name, name)
+        }
+
+    def test_read_json_lines(self):
+        """Tests that blank lines are skipped and bad lines are reported."""
+        lines = io.StringIO('{"a": 1}\n\n{"b": 2}\n')
+        self.assertEqual(list(main.read_json_lines(lines)), [{
+            'a': 1
+        }, {
+            'b': 2
+        }])
+        with self.assertRaisesRegex(ValueError, 'line 2'):
+            list(main.read_json_lines(io.StringIO('{}\n{\n')))
+
+    def test_streaming(self):
+        """Tests that each action runs and is logged before the next is read."""
+        log = io.StringIO()
+        logged = []
+
+        def actions():
+            for index in range(3):
+                # Everything before this action must be in the log already
+                logged.append(log.getvalue().count('\n'))
+                yield self._action('flight{}.csv'.format(index))
+
+        results = list(main.iterate_results(actions(), log=log))
+        self.assertEqual(logged, [0, 1, 2])
+        self.assertEqual(len(results), 3)
+
+        lines = [json.loads(line) for line in log.getvalue().splitlines()]
+        for index, line in enumerate(lines):
+            self.assertEqual(line['index'], index)
+            self.assertEqual(line['action'], 'save_rocket')
+            self.assertEqual(line['output'], results[index]['filename'])
+            self.assertEqual(line['apogee'], results[index]['apogee'])
+            self.assertGreater(line['apogee'], 0.0)
+            self.assertGreater(line['burnout_time'], 0.0)
+            self.assertGreaterEqual(line['runtime'], 0.0)
+            self.assertTrue(os.path.exists(line['output']))
+
+    def test_validation(self):
+        """Tests that an invalid action fails after the earlier ones ran."""
+        invalid = dict(self._action('invalid.csv'), num_steps=-1)
+        results = main.iterate_results(
+            [self._action('valid.csv'), invalid],
+            validator=main.load_validator())
+        next(results)
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            next(results)
+        self.assertTrue(
+            os.path.exists(os.path.join(self._directory.name, 'valid.csv')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""C backend for the integration, backed by the flight computer's libraries
+
+See native/curve_generation.cc for what is implemented in C, and
+native/build.py for how the shared library is built.
+"""
+
+import ctypes
+import functools
+import subprocess
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from native import build
+
+_DOUBLES = np.ctypeslib.ndpointer(dtype=np.float64, flags='C_CONTIGUOUS')
+
+
+@functools.lru_cache(maxsize=None)
+def load() -> ctypes.CDLL:
+    """Loads the shared library, building it first if it's out of date
+
+    Returns:
+        the library
+
+    Raises:
+        OSError: Raised if the library can't be built or loaded
+    """
+    if build.is_stale():
+        build.build()
+
+    library = ctypes.CDLL(build.LIBRARY)
+    library.curve_generation_simulate.restype = ctypes.c_int
+    library.curve_generation_simulate.argtypes = [
+        _DOUBLES, ctypes.c_size_t, _DOUBLES, ctypes.c_size_t, ctypes.c_double,
+        ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double,
+        ctypes.c_uint, ctypes.c_double, ctypes.c_double, _DOUBLES, _DOUBLES,
+        ctypes.c_size_t
+    ]
+    return library
+
+
+def is_available() -> bool:
+    """Whether the C backend can be used"""
+    try:
+        load()
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+def simulate(thrust_values: List[Tuple[float, float]],
+             mass_values: List[Tuple[float, float]],
+             time_step: float,
+             num_steps: int,
+             base_mass: float,
+             drag_constant: float,
+             diameter: float,
+             past_n_steps: int,
+             start_height: float = 1220.0,
+             initial_value: float = 0.0,
+             initial_velocity: float = 0.0) -> Dict[str, np.ndarray]:
+    """Integrates the altitude of the rocket in C
+
+    Equivalent to SteppingVerletIntegrator with AccelerationCalculatorDrag and
+    no previously recorded data.
+
+    Args:
+        thrust_values: (SECONDS, NEWTONS) tuples of the thrust curve
+        mass_values: (SECONDS, KILOGRAMS) tuples of the fuel mass
+        time_step: (SECONDS) time between two steps
+        num_steps: Number of steps to simulate
+        base_mass: (KILOGRAMS) mass of an empty rocket
+        drag_constant: Dimensionless constant related to the drag of the
+            rocket
+        diameter: (METERS) diameter of the rocket
+        past_n_steps: Number of steps in the moving average of the velocity
+        start_height: (METERS) altitude of the launch pad
+        initial_value: (METERS) initial altitude
+        initial_velocity: (METERS / SECONDS) initial velocity
+
+    Returns:
+        dictionary with the 'altitude' (METERS) and 'velocity' (METERS /
+            SECONDS) arrays, as returned by AltitudeGrapher.simulate
+
+    Raises:
+        ValueError: Raised if there are fewer than two steps
+    """
+    thrust = np.ascontiguousarray(thrust_values, dtype=np.float64)
+    mass = np.ascontiguousarray(mass_values, dtype=np.float64)
+    altitude = np.empty(num_steps, dtype=np.float64)
+    velocity = np.empty(max(num_steps - 2, 0), dtype=np.float64)
+
+    status = load().curve_generation_simulate(
+        thrust, len(thrust), mass, len(mass), base_mass, drag_constant,
+        diameter, start_height, time_step, past_n_steps, initial_value,
+        initial_velocity, altitude, velocity, num_steps)
+    if status != 0:
+        raise ValueError('at least two steps are needed to integrate')
+    return {'altitude': altitude, 'velocity': velocity}
@@ -0,0 +1,5 @@
+"""Builds the shared library of the C backend, see native/build.py"""
+
+from native import build
+
+build.run()
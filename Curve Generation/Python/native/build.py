@@ -0,0 +1,94 @@
+"""Builds the shared library of the C backend
+
+Run from the directory containing main.py:
+
+    $ python -m native
+
+The library is also built automatically the first time the C backend is used,
+as long as a C++ compiler is available.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+from typing import List
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+C_LIBRARIES = os.path.join(
+    os.path.dirname(os.path.dirname(DIRECTORY)), 'C', 'lib')
+
+LIBRARY = os.path.join(DIRECTORY, 'libcurve_generation.so')
+
+# The flight computer's libraries, plus the interface for Python
+SOURCES = [
+    os.path.join(DIRECTORY, 'curve_generation.cc'),
+    os.path.join(C_LIBRARIES, 'interpolate', 'src', 'interpolate.cc'),
+    os.path.join(C_LIBRARIES, 'density_calculator', 'src',
+                 'density_calculator.cc'),
+    os.path.join(C_LIBRARIES, 'constant_area_drag_calculator', 'src',
+                 'constant_area_drag_calculator.cc')
+]
+INCLUDES = [
+    os.path.join(C_LIBRARIES, name, 'src')
+    for name in ('interpolate', 'density_calculator',
+                 'constant_area_drag_calculator')
+]
+
+# The C libraries assert that heights and velocities are never negative,
+# which doesn't hold once the rocket starts falling
+FLAGS = ['-std=c++11', '-O2', '-shared', '-fPIC', '-DNDEBUG']
+
+
+def find_compiler() -> str:
+    """Returns the C++ compiler to build with, or None if there isn't one"""
+    for compiler in (os.environ.get('CXX'), 'g++', 'clang++', 'c++'):
+        if compiler and shutil.which(compiler):
+            return compiler
+    return None
+
+
+def is_stale() -> bool:
+    """Whether the library is missing or older than any of its sources"""
+    if not os.path.exists(LIBRARY):
+        return True
+    built = os.path.getmtime(LIBRARY)
+    return any(os.path.getmtime(source) > built for source in SOURCES)
+
+
+def build(compiler: str = None) -> str:
+    """Compiles the shared library
+
+    Args:
+        compiler: C++ compiler to use, see find_compiler for the default
+
+    Returns:
+        the location of the library
+
+    Raises:
+        OSError: Raised if there's no compiler
+        subprocess.CalledProcessError: Raised if compilation fails
+    """
+    compiler = compiler or find_compiler()
+    if compiler is None:
+        raise OSError('no C++ compiler found to build the C backend, set CXX')
+
+    # Link to a temporary name, so a running process never loads a partial
+    # library
+    temporary = LIBRARY + '.tmp'
+    command: List[str] = [compiler] + FLAGS + [
+        '-I' + include for include in INCLUDES
+    ] + SOURCES + ['-o', temporary]
+    subprocess.run(command, check=True)
+    os.replace(temporary, LIBRARY)
+    return LIBRARY
+
+
+def run() -> None:
+    """Builds the library from the command line"""
+    parser = argparse.ArgumentParser(
+        description='Builds the shared library of the C backend')
+    parser.add_argument(
+        '--compiler', type=str, default=None, help='C++ compiler to use')
+    args = parser.parse_args()
+    print(build(args.compiler))
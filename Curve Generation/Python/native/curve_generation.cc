@@ -0,0 +1,90 @@
+/**
+ * @file curve_generation.cc
+ * @brief C interface to the flight computer's physics for the Python package
+ *
+ * Reuses the interpolation, density and drag calculations of
+ * Curve Generation/C/lib, and integrates the same way as the Python
+ * SteppingVerletIntegrator with AccelerationCalculatorDrag, so that both
+ * backends produce the same trajectories.
+ */
+
+#include <algorithm> // std::min
+#include <cstddef>   // std::size_t
+#include <utility>   // std::pair
+
+#include "constant_area_drag_calculator.h"
+#include "interpolate.h"
+
+#define GRAVITY 9.80665
+
+extern "C" {
+
+/**
+ * @brief Integrates the altitude of a rocket with thrust, fuel mass and drag
+ *
+ * @param thrust (seconds, newtons) pairs of the thrust curve
+ * @param thrust_size number of pairs in the thrust curve
+ * @param mass (seconds, kilograms) pairs of the fuel mass
+ * @param mass_size number of pairs in the fuel mass curve
+ * @param base_mass mass of the empty rocket in kilograms
+ * @param drag_coefficient dimensionless drag constant
+ * @param diameter diameter of the rocket tube in meters
+ * @param start_height launch pad altitude in meters
+ * @param timestep time between two steps in seconds
+ * @param past_num_steps number of steps in the moving average of the velocity
+ * @param initial_value initial altitude in meters
+ * @param initial_velocity initial velocity in meters / seconds
+ * @param altitude array of num_steps altitudes to fill, in meters
+ * @param velocity array of num_steps - 2 velocities to fill, in meters /
+ *  seconds. Entry i is the velocity used to calculate step i + 2
+ * @param num_steps number of steps to simulate
+ * @return 0 on success, -1 if there are fewer than two steps
+ */
+int curve_generation_simulate(const double *thrust, std::size_t thrust_size,
+                              const double *mass, std::size_t mass_size,
+                              double base_mass, double drag_coefficient,
+                              double diameter, double start_height,
+                              double timestep, unsigned int past_num_steps,
+                              double initial_value, double initial_velocity,
+                              double *altitude, double *velocity,
+                              std::size_t num_steps) {
+  if (num_steps < 2) {
+    return -1;
+  }
+
+  // Both are arrays of (first, second) doubles, the layout of std::pair
+  std::pair<double, double> *thrust_curve = reinterpret_cast<
+      std::pair<double, double> *>(const_cast<double *>(thrust));
+  std::pair<double, double> *mass_curve = reinterpret_cast<
+      std::pair<double, double> *>(const_cast<double *>(mass));
+
+  altitude[0] = initial_value;
+  altitude[1] = timestep * initial_velocity + initial_value;
+
+  for (std::size_t index = 2; index < num_steps; ++index) {
+    unsigned int num_samples = std::min<std::size_t>(past_num_steps, index - 1);
+    double sum = 0.0;
+    for (unsigned int i = 0; i < num_samples; ++i) {
+      sum += (altitude[index - 1 - i] - altitude[index - 2 - i]);
+    }
+    double current_velocity = sum / (timestep * num_samples);
+    velocity[index - 2] = current_velocity;
+
+    double time = timestep * (index - 1);
+    double height = altitude[index - 1] + current_velocity * timestep;
+    double current_mass = base_mass + Interp(mass_curve, mass_size, time);
+    double current_thrust = Interp(thrust_curve, thrust_size, time);
+    double drag = calculate_drag(start_height, height, diameter * 0.5,
+                                 drag_coefficient, current_velocity);
+
+    double weight = current_mass * GRAVITY;
+    double acceleration = (current_thrust - weight - drag) / current_mass;
+
+    altitude[index] = (2 * altitude[index - 1] - altitude[index - 2] +
+                       acceleration * timestep * timestep);
+  }
+
+  return 0;
+}
+
+} // extern "C"
@@ -0,0 +1,69 @@
+"""Parity test for the C backend against the Python integration"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+import native
+import test_fixtures
+from graph import graph_altitude
+
+
+@unittest.skipUnless(native.is_available(),
+                     'the C backend cannot be built without a C++ compiler')
+class CurveGenerationTest(unittest.TestCase):
+    """Compares trajectories of the C and Python backends"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        engine_file = os.path.join(cls._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(engine_file)
+        cls.thrust_values, cls.mass_values = main.load_engine(engine_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def _simulate(self, backend, num_steps, **parameters):
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=self.thrust_values,
+            mass_values=self.mass_values,
+            total_time=20.0,
+            num_steps=num_steps,
+            backend=backend)
+        return grapher.simulate(
+            20.0 / (num_steps - 1), num_steps, use_cache=False, **parameters)
+
+    def test_parity(self):
+        """Tests that both backends produce the same trajectory."""
+        for num_steps, parameters in [
+            (500, dict(base_mass=1.0, drag_constant=0.05, diameter=0.1)),
+            (2000, dict(base_mass=1.5, drag_constant=0.5, diameter=0.1)),
+            (3, dict(base_mass=2.0, drag_constant=0.75, diameter=0.2)),
+        ]:
+            with self.subTest(num_steps=num_steps, **parameters):
+                python = self._simulate('python', num_steps, **parameters)
+                c = self._simulate('c', num_steps, **parameters)
+                for column in ('altitude', 'velocity'):
+                    self.assertEqual(python[column].shape, c[column].shape)
+                    np.testing.assert_allclose(
+                        c[column], python[column], rtol=1e-9, atol=1e-9)
+
+    def test_error_lines_use_python(self):
+        """Tests that features the C code lacks still work on the C backend."""
+        parameters = dict(
+            base_mass=1.0,
+            drag_constant=0.05,
+            diameter=0.1,
+            acceleration_error_constant=2.0)
+        python = self._simulate('python', 200, errors=True, **parameters)
+        c = self._simulate('c', 200, errors=True, **parameters)
+        np.testing.assert_array_equal(c['upper_error'], python['upper_error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Measures how far single precision simulations drift from double precision
+
+The flight computer integrates in float32, so its predictions differ from the
+float64 simulation by more than just the model. This runs each action in both
+precisions and reports the difference.
+
+    $ python precision_drift.py -f actions.json
+"""
+
+import argparse
+import json
+from typing import Any, Dict
+
+import numpy as np
+
+import convergence
+import main
+from graph import graph_altitude
+
+
+def measure_drift(action: Dict[str, Any]) -> Dict[str, float]:
+    """Simulates the action's rocket in float32 and float64
+
+    Args:
+        action: Dictionary that represents an action, only the rocket and its
+            discretization are used
+
+    Returns:
+        dictionary with the largest altitude (METERS) and velocity (METERS /
+            SECONDS) differences, the difference in apogee (METERS) and the
+            time of the largest altitude difference (SECONDS)
+    """
+    thrust_values, mass_values = main.load_engine(action['engine_file'])
+    action, _ = convergence.resolve(action, thrust_values, mass_values)
+    trajectories = {}
+    for precision in ('float32', 'float64'):
+        parameters = dict(action, precision=precision)
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values, mass_values=mass_values, **parameters)
+        trajectories[precision] = grapher.simulate(
+            grapher.total_time / (grapher.num_steps - 1),
+            num_steps=grapher.num_steps,
+            base_mass=grapher.base_mass,
+            drag_constant=grapher.drag_coefficient,
+            diameter=grapher.diameter,
+            use_cache=False)
+
+    single, double = trajectories['float32'], trajectories['float64']
+    altitude = np.abs(single['altitude'].astype(float) - double['altitude'])
+    velocity = np.abs(single['velocity'].astype(float) - double['velocity'])
+    time_step = action['total_time'] / (action['num_steps'] - 1)
+    return {
+        'max_altitude_drift': float(altitude.max()),
+        'max_velocity_drift': float(velocity.max()),
+        'apogee_drift': float(single['altitude'].max() -
+                              double['altitude'].max()),
+        'max_altitude_drift_time': float(altitude.argmax() * time_step)
+    }
+
+
+def run() -> None:
+    """Prints the drift of every action in the given file"""
+    parser = argparse.ArgumentParser(
+        description='Compares float32 and float64 simulations')
+    parser.add_argument(
+        '-f',
+        type=argparse.FileType(),
+        required=True,
+        help='a JSON file of a list of actions')
+    args = parser.parse_args()
+
+    actions = json.load(args.f)
+    args.f.close()
+    main.load_validator().validate(actions)
+    print(json.dumps([measure_drift(action) for action in actions], indent=2))
+
+
+if __name__ == '__main__':
+    run()
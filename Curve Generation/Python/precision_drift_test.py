@@ -0,0 +1,55 @@
+"""Unit test script for single precision simulations"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+import precision_drift
+import test_fixtures
+from graph import graph_altitude
+
+
+class PrecisionTest(unittest.TestCase):
+    """Compares float32 simulations against float64 ones"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.action = {
+            'engine_file': os.path.join(self._directory.name, 'engine.rse'),
+            'diameter': 0.1,
+            'total_time': 20.0,
+            'num_steps': 500
+        }
+        test_fixtures.write_engine_file(self.action['engine_file'])
+
+    def test_float32_storage(self):
+        """Tests that float32 trajectories are stored as float32."""
+        thrust_values, mass_values = main.load_engine(
+            self.action['engine_file'])
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values,
+            mass_values=mass_values,
+            precision='float32',
+            **self.action)
+        trajectory = grapher.simulate(
+            20.0 / 499, 500, base_mass=1.0, drag_constant=0.05, diameter=0.1,
+            use_cache=False)
+
+        self.assertEqual(trajectory['altitude'].dtype, np.float32)
+        self.assertEqual(trajectory['velocity'].dtype, np.float32)
+        self.assertFalse(np.any(np.isnan(trajectory['altitude'])))
+
+    def test_drift_is_small(self):
+        """Tests that single precision stays close to double precision."""
+        drift = precision_drift.measure_drift(self.action)
+        self.assertGreater(drift['max_altitude_drift'], 0.0)
+        self.assertLess(drift['max_altitude_drift'], 1.0)
+        self.assertLess(abs(drift['apogee_drift']), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,288 @@
+"""Replays recorded telemetry through the in-flight prediction path
+
+On the rocket, samples arrive at the rate of the sensors whether or not the
+previous prediction has finished. The replay reproduces that: samples are
+released at their recorded times, scaled by the replay speed, and each
+prediction starts from every sample that has arrived by then. Samples that
+arrive while a prediction is running are still fed to the prediction path,
+but only the latest of them gets a prediction of its own, the others are
+dropped. A prediction is late if it finishes after the next sample is due.
+
+Replaying as fast as possible releases every sample as soon as the previous
+prediction is done, which measures the raw cost of the predictions.
+"""
+
+import csv
+import io
+import math
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+import data_loader
+import flight_generator
+import instrumentation
+import state_estimator
+from graph import graph_altitude
+
+# Percentiles of the latency in the summary
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+class Replay(object):
+    """Feeds telemetry to the grapher at a given speed and times predictions
+
+    Attributes:
+        grapher: Grapher whose prediction path is measured
+        speed: Multiple of real time to replay at, None for as fast as
+            possible
+        feedback: 'interpolate' or 'estimator', see
+            flight_generator.FlightGenerator
+        samples: Record of every sample of the last run, see run
+    """
+
+    def __init__(self,
+                 grapher: graph_altitude.AltitudeGrapher,
+                 data_file: str,
+                 delimiter: str = ' ',
+                 speed: float = 1.0,
+                 feedback: str = 'interpolate',
+                 chunk_size: int = data_loader.TELEMETRY_CHUNK_SIZE,
+                 clock: Callable[[], float] = time.perf_counter,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Initializes the replay
+
+        Args:
+            grapher: Grapher whose prediction path is measured
+            data_file: Path to recorded or simulated telemetry, see
+                data_loader.read_telemetry
+            delimiter: Delimiter used in the data_file
+            speed: Multiple of real time to replay at, None for as fast as
+                possible
+            feedback: 'interpolate' to predict from all of the telemetry
+                received so far, or 'estimator' to predict from a state
+                estimate
+            chunk_size: Number of telemetry rows to parse at a time
+            clock: (SECONDS) monotonic clock
+            sleep: Waits for the given number of seconds
+
+        Raises:
+            ValueError: Raised if the speed isn't positive or the feedback is
+                unknown
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError('speed must be positive')
+        if feedback not in flight_generator.FEEDBACK:
+            raise ValueError('feedback must be one of ' +
+                             ', '.join(flight_generator.FEEDBACK))
+
+        self.grapher = grapher
+        self.speed = speed
+        self.feedback = feedback
+        self.samples = []
+
+        self._data_file = data_file
+        self._delimiter = delimiter
+        self._chunk_size = chunk_size
+        self._clock = clock
+        self._sleep = sleep
+
+    def predict(self) -> float:
+        """Runs the prediction path once
+
+        Returns:
+            the highest altitude (METERS) of the predicted flight
+        """
+        grapher = self.grapher
+        _, trajectory = grapher.predict(
+            num_steps=grapher.num_steps,
+            total_time=grapher.total_time,
+            base_mass=grapher.base_mass,
+            drag_constant=grapher.drag_coefficient,
+            diameter=grapher.diameter,
+            use_cache=False)
+        return float(np.max(trajectory['altitude']))
+
+    def run(self) -> Dict[str, Any]:
+        """Replays the whole telemetry file
+
+        Returns:
+            dictionary with the number of 'samples', 'predictions', 'dropped'
+                and 'late' samples, percentiles of the 'latency' (SECONDS) of
+                the predictions from the arrival of their sample, the mean
+                'compute' time (SECONDS) of a prediction, the highest
+                altitude in the telemetry ('recorded_apogee'), the mean and
+                maximum absolute 'apogee_error' (METERS) of the predictions
+                made before it, and the 'wall_time' and 'flight_time'
+                (SECONDS) replayed
+        """
+        with instrumentation.stage('telemetry_loading'):
+            telemetry = data_loader.read_telemetry(
+                self._data_file, self._delimiter, self._chunk_size)
+        times = telemetry[:, 0]
+        rows = telemetry.tolist()
+        recorded_apogee = float(np.max(telemetry[:, 1]))
+        apogee_time = float(times[np.argmax(telemetry[:, 1])])
+        # (SECONDS) time until the next sample, at the replay speed. Nothing
+        # follows the last sample, so it can't be late
+        periods = np.append(np.diff(times), math.inf)
+        if self.speed is not None:
+            periods = periods / self.speed
+
+        previous_altitude = []
+        previous_acceleration = []
+        self.grapher.previous_altitude = previous_altitude
+        self.grapher.previous_acceleration = previous_acceleration
+        estimator = None
+        if self.feedback == 'estimator':
+            estimator = state_estimator.StateEstimator()
+        self.grapher.estimator = estimator
+
+        self.samples = []
+        start = self._clock()
+        arrivals = None
+        if self.speed is not None:
+            arrivals = start + (times - times[0]) / self.speed
+
+        highest = -math.inf
+        index = 0
+        while index < len(rows):
+            if arrivals is not None:
+                delay = arrivals[index] - self._clock()
+                if delay > 0:
+                    self._sleep(delay)
+            now = self._clock()
+            # Every sample that has arrived in the meantime is ingested, but
+            # only the latest is predicted from
+            last = index
+            if arrivals is not None:
+                last = max(index,
+                           int(np.searchsorted(arrivals, now, 'right')) - 1)
+            for row in range(index, last + 1):
+                sample_time, altitude, acceleration = rows[row]
+                previous_altitude.append((sample_time, altitude))
+                previous_acceleration.append((sample_time, acceleration))
+                highest = max(highest, altitude)
+                if estimator is not None:
+                    estimator.update(sample_time, altitude, acceleration)
+            for row in range(index, last):
+                self.samples.append(self._record(rows[row][0]))
+            instrumentation.count('samples_dropped', last - index)
+
+            started = self._clock()
+            with instrumentation.stage('prediction'):
+                # Once the apogee has passed, it's in the telemetry
+                apogee = max(self.predict(), highest)
+            finished = self._clock()
+            arrival = arrivals[last] if arrivals is not None else now
+            latency = finished - arrival
+            self.samples.append(
+                self._record(
+                    rows[last][0],
+                    latency=latency,
+                    compute=finished - started,
+                    late=bool(latency > periods[last]),
+                    apogee=apogee,
+                    apogee_error=apogee - recorded_apogee))
+            index = last + 1
+        wall_time = self._clock() - start
+
+        return self._summary(recorded_apogee, apogee_time, wall_time,
+                             float(times[-1] - times[0]))
+
+    @staticmethod
+    def _record(sample_time: float,
+                latency: float = math.nan,
+                compute: float = math.nan,
+                late: bool = False,
+                apogee: float = math.nan,
+                apogee_error: float = math.nan) -> Dict[str, Any]:
+        """Record of a sample, without a prediction if it was dropped"""
+        return {
+            'time': sample_time,
+            'predicted': not math.isnan(latency),
+            'latency': latency,
+            'compute': compute,
+            'late': late,
+            'apogee': apogee,
+            'apogee_error': apogee_error
+        }
+
+    def _summary(self, recorded_apogee: float, apogee_time: float,
+                 wall_time: float, flight_time: float) -> Dict[str, Any]:
+        """Summarizes the samples of a run, see run"""
+        predicted = [sample for sample in self.samples if sample['predicted']]
+        latency = np.array([sample['latency'] for sample in predicted])
+        compute = np.array([sample['compute'] for sample in predicted])
+        # Later predictions know the apogee from the telemetry
+        error = np.abs([
+            sample['apogee_error']
+            for sample in predicted if sample['time'] < apogee_time
+        ] or [predicted[0]['apogee_error']])
+        summary = {
+            'samples': len(self.samples),
+            'predictions': len(predicted),
+            'dropped': len(self.samples) - len(predicted),
+            'late': sum(1 for sample in predicted if sample['late']),
+            'latency': {
+                'mean': float(np.mean(latency)),
+                'max': float(np.max(latency))
+            },
+            'compute': float(np.mean(compute)),
+            'recorded_apogee': recorded_apogee,
+            'apogee_error': {
+                'mean': float(np.mean(error)),
+                'max': float(np.max(error))
+            },
+            'wall_time': wall_time,
+            'flight_time': flight_time
+        }
+        for percentile in LATENCY_PERCENTILES:
+            summary['latency']['p{}'.format(percentile)] = float(
+                np.percentile(latency, percentile))
+        return summary
+
+    def write_samples(self, filename: str, delimiter: str = ' ') -> None:
+        """Writes the record of every sample of the last run to a csv file
+
+        Args:
+            filename: Location of the file. Each row holds the time of the
+                sample, whether it was predicted from, the latency and compute
+                time of the prediction (SECONDS), whether it was late, the
+                predicted apogee and its error (METERS). Dropped samples have
+                NaN instead of a prediction
+            delimiter: Delimiter between the columns
+        """
+        columns = ('time', 'predicted', 'latency', 'compute', 'late',
+                   'apogee', 'apogee_error')
+        with io.open(filename, 'w', newline='\n') as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            for sample in self.samples:
+                writer.writerow(
+                    [float(sample[column]) for column in columns])
+
+
+def from_action(grapher: graph_altitude.AltitudeGrapher,
+                action: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs a replay_flight action
+
+    Args:
+        grapher: Grapher with the engine and the rocket of the action
+        action: Dictionary that represents a replay_flight action
+
+    Returns:
+        the summary of the replay, see Replay.run
+    """
+    speed = action.get('speed', 1.0)
+    replay = Replay(
+        grapher,
+        action['data_file'],
+        delimiter=action.get('delimiter', ' '),
+        speed=None if speed == 'max' else speed,
+        feedback=action.get('feedback', 'interpolate'),
+        chunk_size=action.get('chunk_size', data_loader.TELEMETRY_CHUNK_SIZE))
+    result = replay.run()
+    if 'filename' in action:
+        replay.write_samples(action['filename'], action.get('delimiter', ' '))
+    return result
@@ -0,0 +1,114 @@
+"""Unit test script for the telemetry replay"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+import replay
+import test_fixtures
+from graph import graph_altitude
+
+
+class FakeClock(object):
+    """Clock that only advances while sleeping"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ReplayTest(unittest.TestCase):
+    """Unittest case for Replay"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        engine_file = os.path.join(self._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(engine_file)
+        thrust_values, mass_values = main.load_engine(engine_file)
+        self.grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values,
+            mass_values=mass_values,
+            total_time=10.0,
+            num_steps=50,
+            diameter=0.1)
+        self.data_file = os.path.join(self._directory.name, 'telemetry.csv')
+        test_fixtures.write_telemetry_file(
+            self.data_file, 40, sample_rate=10.0)
+
+    def test_as_fast_as_possible(self):
+        """Tests that every sample is predicted from without waiting."""
+        sample_replay = replay.Replay(self.grapher, self.data_file, speed=None)
+        result = sample_replay.run()
+        self.assertEqual(result['samples'], 40)
+        self.assertEqual(result['predictions'], 40)
+        self.assertEqual(result['dropped'], 0)
+        self.assertEqual(result['late'], 0)
+        self.assertGreaterEqual(result['latency']['max'],
+                                result['latency']['p99'])
+        self.assertAlmostEqual(result['recorded_apogee'],
+                               test_fixtures.telemetry(40, 10.0)[:, 1].max())
+        self.assertLess(result['wall_time'], result['flight_time'])
+
+        filename = os.path.join(self._directory.name, 'samples.csv')
+        sample_replay.write_samples(filename)
+        self.assertEqual(np.loadtxt(filename).shape, (40, 7))
+
+    def test_real_time(self):
+        """Tests that samples are released at their recorded times."""
+        clock = FakeClock()
+        result = replay.Replay(
+            self.grapher,
+            self.data_file,
+            speed=2.0,
+            clock=clock,
+            sleep=clock.sleep).run()
+        # Predictions take no time on the fake clock
+        self.assertEqual(result['predictions'], 40)
+        self.assertEqual(result['latency']['max'], 0.0)
+        self.assertAlmostEqual(result['wall_time'], 3.9 / 2.0)
+
+    def test_overloaded(self):
+        """Tests that samples arriving during a prediction are dropped."""
+        clock = FakeClock()
+        sample_replay = replay.Replay(
+            self.grapher,
+            self.data_file,
+            speed=1.0,
+            feedback='estimator',
+            clock=clock,
+            sleep=clock.sleep)
+        predict = sample_replay.predict
+
+        def slow_predict():
+            clock.sleep(0.25)
+            return predict()
+
+        sample_replay.predict = slow_predict
+        result = sample_replay.run()
+        # Every prediction takes 2.5 sample periods, so all but the last
+        # are late and most samples are dropped
+        self.assertEqual(result['predictions'] + result['dropped'], 40)
+        self.assertLess(result['predictions'], 20)
+        self.assertEqual(result['late'], result['predictions'] - 1)
+        self.assertGreaterEqual(result['latency']['p50'], 0.25)
+        self.assertEqual(len(sample_replay.samples), 40)
+        # Dropped samples still reach the estimator
+        self.assertAlmostEqual(self.grapher.estimator.state.time, 3.9)
+
+    def test_invalid(self):
+        """Tests that the speed must be positive."""
+        with self.assertRaises(ValueError):
+            replay.Replay(self.grapher, self.data_file, speed=0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""Persistent, content-addressed storage for simulated trajectories
+
+Trajectories are keyed by a hash of everything that influences the result
+(engine curves, rocket parameters and the discretization) and stored as
+uncompressed numpy archives. The cache is bounded in size and evicts the least
+recently used entries first.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+DEFAULT_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'curve_generation')
+
+# 256 megabytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump whenever the integration changes in a way that invalidates old results
+CACHE_VERSION = 1
+
+_EXTENSION = '.npz'
+
+
+def _canonical(value: Any) -> Any:
+    """Converts the value into something that can be serialized to JSON
+
+    Args:
+        value: arbitrarily nested lists, tuples, dictionaries, numbers or
+            numpy values
+
+    Returns:
+        the value with tuples and numpy types replaced by lists and floats
+    """
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(x) for x in value]
+    if isinstance(value, np.ndarray):
+        return _canonical(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def make_key(**parameters) -> str:
+    """Hashes the given parameters into a cache key
+
+    Args:
+        parameters: every value that influences the cached result
+
+    Returns:
+        hexadecimal SHA-256 digest of the parameters
+    """
+    parameters['cache_version'] = CACHE_VERSION
+    serialized = json.dumps(
+        _canonical(parameters), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """Size-bounded, least-recently-used cache of trajectories on disk
+
+    Attributes:
+        directory: Location of the cached files
+        max_bytes: Upper bound on the total size of the cached files
+    """
+
+    def __init__(self,
+                 directory: str = DEFAULT_DIRECTORY,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """Initializes the cache, creating the directory if needed
+
+        Args:
+            directory: Location of the cached files
+            max_bytes: Upper bound on the total size of the cached files, in
+                bytes
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        """Returns the location of the file for the given key"""
+        return os.path.join(self.directory, key + _EXTENSION)
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Retrieves the arrays stored under the given key
+
+        Args:
+            key: value returned from make_key
+
+        Returns:
+            dictionary of named arrays, or None if the key isn't cached
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+        except (OSError, ValueError):
+            return None
+
+        # The modification time doubles as the last access time for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        """Stores the arrays under the given key, then enforces the size bound
+
+        Args:
+            key: value returned from make_key
+            arrays: dictionary of named arrays to store
+        """
+        descriptor, temporary = tempfile.mkstemp(
+            suffix=_EXTENSION, dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_EXTENSION):
+                continue
+            try:
+                status = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        """Removes every entry from the cache"""
+        for name in os.listdir(self.directory):
+            if name.endswith(_EXTENSION):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,63 @@
+"""Unit test script for the result cache"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import result_cache
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Unittest case for ResultCache"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def test_round_trip(self):
+        """Tests that stored arrays are returned unchanged."""
+        cache = result_cache.ResultCache(self._directory.name)
+        key = result_cache.make_key(num_steps=10, base_mass=1.0)
+        cache.put(key, {'altitude': np.arange(10.0)})
+
+        result = cache.get(key)
+        np.testing.assert_array_equal(result['altitude'], np.arange(10.0))
+
+    def test_key_depends_on_parameters(self):
+        """Tests that different parameters hash to different keys."""
+        key = result_cache.make_key(thrust_values=[(0.0, 1.0)], base_mass=1.0)
+        self.assertEqual(
+            key,
+            result_cache.make_key(thrust_values=[(0.0, 1.0)], base_mass=1.0))
+        self.assertNotEqual(
+            key,
+            result_cache.make_key(thrust_values=[(0.0, 2.0)], base_mass=1.0))
+
+    def test_missing_key(self):
+        """Tests that an unknown key is a cache miss."""
+        cache = result_cache.ResultCache(self._directory.name)
+        self.assertIsNone(cache.get(result_cache.make_key(num_steps=1)))
+
+    def test_least_recently_used_eviction(self):
+        """Tests that the oldest entry is evicted once the cache is full."""
+        cache = result_cache.ResultCache(self._directory.name)
+        keys = [result_cache.make_key(index=i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, {'altitude': np.zeros(1000)})
+            path = os.path.join(self._directory.name, key + '.npz')
+            os.utime(path, (i, i))
+
+        # Touch the first entry so that the second is the least recently used
+        cache.get(keys[0])
+        cache.max_bytes = 2 * os.path.getsize(path)
+        cache.evict()
+
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Space-filling samples of the unit hypercube
+
+Random samples clump together and leave gaps, so statistics of a simulation
+converge slowly with the number of samples. Sobol sequences and Latin
+hypercubes spread the samples evenly instead, and converge with far fewer.
+
+https://en.wikipedia.org/wiki/Sobol_sequence
+https://en.wikipedia.org/wiki/Latin_hypercube_sampling
+"""
+
+import numpy as np
+
+# Number of bits of every Sobol coordinate, which bounds the sequence to
+# 2 ^ BITS points
+BITS = 32
+
+# Primitive polynomials and initial direction numbers of the dimensions after
+# the first, as (degree, coefficients, initial direction numbers). From
+# S. Joe and F. Y. Kuo, new-joe-kuo-6.21201
+# https://web.maths.unsw.edu.au/~fkuo/sobol/
+SOBOL_PARAMETERS = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+]
+
+MAX_SOBOL_DIMENSIONS = len(SOBOL_PARAMETERS) + 1
+
+
+def _direction_numbers(dimension: int) -> np.ndarray:
+    """Returns the BITS direction numbers of a dimension of the sequence"""
+    directions = np.zeros(BITS, dtype=np.uint64)
+    if dimension == 0:
+        for bit in range(BITS):
+            directions[bit] = 1 << (BITS - 1 - bit)
+        return directions
+
+    degree, coefficients, initial = SOBOL_PARAMETERS[dimension - 1]
+    for bit in range(BITS):
+        if bit < degree:
+            directions[bit] = initial[bit] << (BITS - 1 - bit)
+            continue
+        value = directions[bit - degree] ^ (
+            directions[bit - degree] >> np.uint64(degree))
+        for term in range(1, degree):
+            if (coefficients >> (degree - 1 - term)) & 1:
+                value ^= directions[bit - term]
+        directions[bit] = value
+    return directions
+
+
+class Sobol(object):
+    """Sobol sequence, optionally randomized with a digital shift
+
+    Points are generated by their index in the sequence, so a long run can
+    draw them a batch at a time.
+
+    Attributes:
+        dimensions: Number of coordinates of every point
+    """
+
+    def __init__(self, dimensions: int, seed: int = None, shift: bool = True):
+        """Initializes the sequence
+
+        Args:
+            dimensions: Number of coordinates, at most MAX_SOBOL_DIMENSIONS
+            seed: Seed of the random shift
+            shift: Whether to randomize the sequence. Otherwise its first
+                point is the origin
+
+        Raises:
+            ValueError: Raised if there are too many dimensions
+        """
+        if not 1 <= dimensions <= MAX_SOBOL_DIMENSIONS:
+            raise ValueError('Sobol sequences are limited to {} dimensions'.
+                             format(MAX_SOBOL_DIMENSIONS))
+        self.dimensions = dimensions
+        self._directions = np.stack(
+            [_direction_numbers(dimension) for dimension in range(dimensions)])
+
+        self._shift = np.zeros(dimensions, dtype=np.uint64)
+        if shift:
+            self._shift = np.random.default_rng(seed).integers(
+                0, 1 << BITS, size=dimensions, dtype=np.uint64)
+
+    def sample(self, start: int, count: int) -> np.ndarray:
+        """Generates consecutive points of the sequence
+
+        Args:
+            start: Index of the first point
+            count: Number of points
+
+        Returns:
+            (count, dimensions) array of points in [0, 1)
+        """
+        index = np.arange(start, start + count, dtype=np.uint64)
+        # Gray code order only permutes each block of 2 ^ k points, so every
+        # block keeps the stratification of the sequence
+        gray = index ^ (index >> np.uint64(1))
+
+        points = np.zeros((count, self.dimensions), dtype=np.uint64)
+        for bit in range(BITS):
+            selected = ((gray >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+            points[selected] ^= self._directions[:, bit]
+        points ^= self._shift
+        return points / float(1 << BITS)
+
+
+def latin_hypercube(count: int, dimensions: int,
+                    random: np.random.Generator) -> np.ndarray:
+    """Generates a Latin hypercube sample
+
+    Every coordinate has exactly one point in each of count equal intervals.
+
+    Args:
+        count: Number of points
+        dimensions: Number of coordinates
+        random: Source of randomness
+
+    Returns:
+        (count, dimensions) array of points in [0, 1)
+    """
+    strata = np.argsort(random.random((dimensions, count)), axis=1).T
+    return (strata + random.random((count, dimensions))) / count
@@ -0,0 +1,46 @@
+"""Unit test script for the space-filling samples"""
+
+import unittest
+
+import numpy as np
+
+import sampling
+
+
+class SamplingTest(unittest.TestCase):
+    """Unittest case for Sobol and latin_hypercube"""
+
+    def test_sobol_points(self):
+        """Tests the first points of the unshifted sequence."""
+        points = sampling.Sobol(3, shift=False).sample(0, 4)
+        np.testing.assert_array_equal(
+            points, [[0, 0, 0], [0.5, 0.5, 0.5], [0.75, 0.25, 0.25],
+                     [0.25, 0.75, 0.75]])
+
+    def test_sobol_stratification(self):
+        """Tests that every block of 2 ^ k points fills each interval once."""
+        sequence = sampling.Sobol(sampling.MAX_SOBOL_DIMENSIONS, seed=0)
+        for start in (0, 64, 128):
+            points = sequence.sample(start, 64)
+            for column in points.T:
+                np.testing.assert_array_equal(
+                    np.sort(np.floor(column * 64)), np.arange(64))
+
+    def test_sobol_batches(self):
+        """Tests that drawing in batches continues the same sequence."""
+        sequence = sampling.Sobol(4, seed=1)
+        np.testing.assert_array_equal(
+            np.concatenate((sequence.sample(0, 10), sequence.sample(10, 22))),
+            sequence.sample(0, 32))
+
+    def test_latin_hypercube(self):
+        """Tests that each coordinate has one point in each interval."""
+        points = sampling.latin_hypercube(50, 3, np.random.default_rng(0))
+        self.assertEqual(points.shape, (50, 3))
+        for column in points.T:
+            np.testing.assert_array_equal(
+                np.sort(np.floor(column * 50)), np.arange(50))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Sensitivity of the apogee to the parameters of the rocket
+
+Each parameter is nudged up and down by a small fraction of its value, and
+the derivative of the apogee is the central difference of the two flights.
+The nominal rocket and every nudged one are integrated together in a single
+batch (see batch_integrator), so all of the derivatives cost about as much as
+one flight.
+
+Besides the derivatives, the elasticities (d apogee / apogee) / (d value /
+value) compare the parameters on the same scale: the percentage the apogee
+changes by for a one percent change of the parameter.
+"""
+
+import csv
+import io
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+import batch_integrator
+import instrumentation
+from graph import graph_altitude
+
+# thrust_scale multiplies the thrust of the engine
+SENSITIVITY_PARAMETERS = ('drag_coefficient', 'base_mass', 'diameter',
+                          'start_height', 'thrust_scale')
+
+DEFAULT_RELATIVE_STEP = 1e-3
+# (METERS) altitude of the launch pad, as in DensityCalculator
+DEFAULT_START_HEIGHT = 1220.0
+
+
+def analyze(grapher: graph_altitude.AltitudeGrapher,
+            parameters: Sequence[str] = SENSITIVITY_PARAMETERS,
+            start_height: float = DEFAULT_START_HEIGHT,
+            relative_step: float = DEFAULT_RELATIVE_STEP) -> Dict[str, Any]:
+    """Computes the sensitivity of the apogee to each parameter
+
+    Args:
+        grapher: Grapher with the engine, the rocket and the discretization
+        parameters: Parameters to differentiate by, see
+            SENSITIVITY_PARAMETERS
+        start_height: (METERS) altitude of the launch pad
+        relative_step: Fraction of each value to nudge it by
+
+    Returns:
+        dictionary with the nominal 'apogee' (METERS), and for each
+            parameter in 'sensitivities', its nominal 'value', the 'step' it
+            was nudged by, the 'derivative' of the apogee (METERS per unit of
+            the parameter) and the 'elasticity' of the apogee
+
+    Raises:
+        ValueError: Raised if a parameter is unknown or is zero, or the step
+            isn't in (0, 1)
+    """
+    for name in parameters:
+        if name not in SENSITIVITY_PARAMETERS:
+            raise ValueError('no sensitivity to ' + name)
+    if not 0 < relative_step < 1:
+        raise ValueError('relative_step must be between 0 and 1')
+
+    nominal = {
+        'drag_coefficient': float(grapher.drag_coefficient),
+        'base_mass': float(grapher.base_mass),
+        'diameter': float(grapher.diameter),
+        'start_height': float(start_height),
+        'thrust_scale': 1.0
+    }
+    for name in parameters:
+        if nominal[name] == 0:
+            raise ValueError('cannot nudge {}, it is zero'.format(name))
+
+    # The nominal rocket first, then each parameter nudged down and up
+    batch = {
+        name: np.full(1 + 2 * len(parameters), value)
+        for name, value in nominal.items()
+    }
+    steps = []
+    for index, name in enumerate(parameters):
+        step = abs(nominal[name]) * relative_step
+        batch[name][1 + 2 * index] -= step
+        batch[name][2 + 2 * index] += step
+        steps.append(step)
+
+    time_step = grapher.total_time / (grapher.num_steps - 1)
+    with instrumentation.stage('sensitivity'), np.errstate(
+            over='ignore', invalid='ignore'):
+        altitude = batch_integrator.simulate(
+            grapher.thrust_values,
+            grapher.mass_values,
+            time_step,
+            grapher.num_steps,
+            batch['base_mass'],
+            batch['drag_coefficient'],
+            batch['diameter'],
+            start_height=batch['start_height'],
+            thrust_scale=batch['thrust_scale'])
+        apogees = np.nanmax(altitude, axis=0)
+
+    apogee = float(apogees[0])
+    sensitivities = {}
+    for index, (name, step) in enumerate(zip(parameters, steps)):
+        lower, upper = apogees[1 + 2 * index], apogees[2 + 2 * index]
+        derivative = float((upper - lower) / (2 * step))
+        sensitivities[name] = {
+            'value': nominal[name],
+            'step': step,
+            'derivative': derivative,
+            'elasticity': derivative * nominal[name] / apogee
+        }
+    return {'apogee': apogee, 'sensitivities': sensitivities}
+
+
+def write_table(result: Dict[str, Any],
+                filename: str,
+                delimiter: str = ' ') -> None:
+    """Writes the sensitivities to a csv file
+
+    Args:
+        result: Result of analyze
+        filename: Location of the file. Each row holds the name of a
+            parameter, its value, step, derivative and elasticity
+        delimiter: Delimiter between the columns
+    """
+    columns = ('value', 'step', 'derivative', 'elasticity')
+    with io.open(filename, 'w', newline='\n') as file:
+        writer = csv.writer(file, delimiter=delimiter)
+        for name, sensitivity in result['sensitivities'].items():
+            writer.writerow([name] + [sensitivity[column]
+                                      for column in columns])
+
+
+def from_action(grapher: graph_altitude.AltitudeGrapher,
+                action: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs a sensitivity_rocket action
+
+    Args:
+        grapher: Grapher with the engine and the rocket of the action
+        action: Dictionary that represents a sensitivity_rocket action
+
+    Returns:
+        the result of analyze
+    """
+    result = analyze(
+        grapher,
+        parameters=action.get('parameters', SENSITIVITY_PARAMETERS),
+        start_height=action.get('start_height', DEFAULT_START_HEIGHT),
+        relative_step=action.get('relative_step', DEFAULT_RELATIVE_STEP))
+    if 'filename' in action:
+        write_table(result, action['filename'], action.get('delimiter', ' '))
+    return result
@@ -0,0 +1,102 @@
+"""Unit test script for the sensitivity analysis"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+import sensitivity
+import test_fixtures
+from graph import graph_altitude
+
+
+class SensitivityTest(unittest.TestCase):
+    """Unittest case for the sensitivity of the apogee"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        engine_file = os.path.join(cls._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(engine_file)
+        cls.thrust_values, cls.mass_values = main.load_engine(engine_file)
+        cls.grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=cls.thrust_values,
+            mass_values=cls.mass_values,
+            total_time=20.0,
+            num_steps=2000,
+            diameter=0.1)
+        cls.result = sensitivity.analyze(cls.grapher)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def _apogee(self, **parameters):
+        parameters = dict(
+            dict(
+                base_mass=self.grapher.base_mass,
+                drag_constant=self.grapher.drag_coefficient,
+                diameter=self.grapher.diameter), **parameters)
+        trajectory = self.grapher.simulate(
+            self.grapher.total_time / (self.grapher.num_steps - 1),
+            self.grapher.num_steps,
+            use_cache=False,
+            **parameters)
+        return float(np.max(trajectory['altitude']))
+
+    def test_matches_separate_flights(self):
+        """Tests the batch against flights simulated one at a time."""
+        self.assertAlmostEqual(self.result['apogee'], self._apogee())
+        for name, keyword in [('base_mass', 'base_mass'),
+                              ('drag_coefficient', 'drag_constant'),
+                              ('diameter', 'diameter')]:
+            with self.subTest(parameter=name):
+                entry = self.result['sensitivities'][name]
+                lower = self._apogee(
+                    **{keyword: entry['value'] - entry['step']})
+                upper = self._apogee(
+                    **{keyword: entry['value'] + entry['step']})
+                self.assertAlmostEqual(
+                    entry['derivative'],
+                    (upper - lower) / (2 * entry['step']),
+                    places=6)
+
+    def test_elasticities(self):
+        """Tests the signs and the relation between drag parameters."""
+        sensitivities = self.result['sensitivities']
+        self.assertLess(sensitivities['base_mass']['elasticity'], 0.0)
+        self.assertLess(sensitivities['drag_coefficient']['elasticity'], 0.0)
+        self.assertGreater(sensitivities['thrust_scale']['elasticity'], 0.0)
+        # Thinner air at a higher pad means less drag
+        self.assertGreater(sensitivities['start_height']['derivative'], 0.0)
+        # The drag grows with the square of the diameter
+        self.assertAlmostEqual(
+            sensitivities['diameter']['elasticity'],
+            2 * sensitivities['drag_coefficient']['elasticity'],
+            places=3)
+
+    def test_action(self):
+        """Tests the table written by a sensitivity_rocket action."""
+        filename = os.path.join(self._directory.name, 'sensitivity.csv')
+        result = sensitivity.from_action(
+            self.grapher, {
+                'parameters': ['base_mass', 'thrust_scale'],
+                'filename': filename
+            })
+        self.assertEqual(
+            list(result['sensitivities']), ['base_mass', 'thrust_scale'])
+        with open(filename) as file:
+            rows = [line.split() for line in file]
+        self.assertEqual([row[0] for row in rows],
+                         ['base_mass', 'thrust_scale'])
+        self.assertAlmostEqual(
+            float(rows[1][3]),
+            result['sensitivities']['thrust_scale']['derivative'])
+        with self.assertRaises(ValueError):
+            sensitivity.analyze(self.grapher, parameters=['total_time'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+"""Long-running simulation server that keeps engines and tables warm
+
+Every run of main.py pays for starting the interpreter, importing numpy and
+matplotlib, loading the schema and parsing the engine files before doing any
+work. The server pays for that once. It listens on a local Unix socket (or a
+localhost TCP port) and runs the actions it receives on a pool of worker
+processes. The server parses every engine file once and shares it, along with
+the atmosphere table, with the workers through shared memory. Workers keep
+their trajectory cache between requests.
+
+Protocol: the client sends one JSON object per line and receives one JSON
+object per line in response.
+
+    {"actions": [...]}      runs the actions, responds with
+                            {"status": "ok", "results": [...]}
+    {"command": "ping"}     responds with {"status": "ok"}
+    {"command": "shutdown"} stops the server
+
+Failures respond with {"status": "error", "error": "<message>"}. Output is
+always written to files, so plot_rocket requires a 'filename'.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import json
+import os
+from typing import Any, Dict, List
+
+import main
+import result_cache
+import shared_tables
+
+# State of each worker process, set up once by _initialize_worker
+_cache: result_cache.ResultCache = None
+
+
+def _initialize_worker(cache_directory: str) -> None:
+    """Imports everything an action needs ahead of the first request
+
+    Args:
+        cache_directory: Directory of the result cache, or None to disable it
+    """
+    global _cache
+    if cache_directory is not None:
+        _cache = result_cache.ResultCache(cache_directory)
+
+    # Rendering is always done to files, so warm up the headless path
+    from matplotlib.backends import backend_agg
+    from matplotlib import figure
+
+
+def _run_action(action: Dict[str, Any],
+                tables: shared_tables.Description) -> Dict[str, Any]:
+    """Runs a single action within a worker process
+
+    Args:
+        action: Dictionary that represents an action
+        tables: Description of the tables shared by the server
+
+    Returns:
+        the result of main.parse_action
+    """
+    shared_tables.attach(tables)
+    return main.parse_action(action, cache=_cache)
+
+
+class SimulationServer(object):
+    """Accepts actions over a socket and runs them on a pool of workers
+
+    Attributes:
+        validator: Validator for incoming actions
+    """
+
+    def __init__(self,
+                 workers: int = None,
+                 cache_directory: str = result_cache.DEFAULT_DIRECTORY,
+                 schema: str = None):
+        """Starts the worker processes
+
+        Args:
+            workers: Number of worker processes. Defaults to the number of
+                processors
+            cache_directory: Directory of the result cache, or None to
+                disable it
+            schema: Optional path to a different schema for validation
+        """
+        self.validator = main.load_validator(
+            schema) if schema else main.load_validator()
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_initialize_worker,
+            initargs=(cache_directory, ))
+        self._tables = shared_tables.SharedTables()
+        self._server = None
+
+    async def serve(self,
+                    path: str = None,
+                    host: str = '127.0.0.1',
+                    port: int = None) -> None:
+        """Accepts connections until the server is shut down
+
+        Args:
+            path: Location of the Unix socket to listen on. If None, listens
+                on a TCP port instead
+            host: Interface to listen on for TCP
+            port: Port to listen on for TCP
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path=path)
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, host=host, port=port)
+
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+    def close(self) -> None:
+        """Stops the worker processes and frees the shared tables"""
+        self._executor.shutdown()
+        self._tables.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """Responds to every request sent over the connection
+
+        Args:
+            reader: Stream of requests, one JSON object per line
+            writer: Stream for the responses, one JSON object per line
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                request = {}
+                try:
+                    request = json.loads(line)
+                    response = await self.handle_request(request)
+                except Exception as err:
+                    # Validation errors carry a much shorter message than str()
+                    response = {
+                        'status': 'error',
+                        'error': getattr(err, 'message', str(err))
+                    }
+
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+
+                if request.get('command') == 'shutdown':
+                    self._server.close()
+                    break
+        finally:
+            writer.close()
+
+    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handles a single decoded request
+
+        Args:
+            request: Dictionary with either 'actions' or a 'command'
+
+        Returns:
+            the response to send back to the client
+
+        Raises:
+            ValueError: the request is malformed
+            jsonschema.exceptions.ValidationError: the actions are invalid
+            OSError: an engine file cannot be read
+        """
+        if 'command' in request:
+            if request['command'] not in ('ping', 'shutdown'):
+                raise ValueError('unknown command: ' + str(request['command']))
+            return {'status': 'ok'}
+
+        actions = request.get('actions')
+        if actions is None:
+            raise ValueError('request must contain \'actions\' or \'command\'')
+        self.validator.validate(actions)
+        for action in actions:
+            if action['action'] == 'plot_rocket' and 'filename' not in action:
+                raise ValueError('plot_rocket requires a \'filename\' when '
+                                 'running on the server')
+
+        return {'status': 'ok', 'results': await self.run_actions(actions)}
+
+    async def run_actions(self,
+                          actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Runs the actions concurrently on the worker processes
+
+        Args:
+            actions: List of validated actions
+
+        Returns:
+            the result of each action, in the same order
+        """
+        for action in actions:
+            self._tables.add_engine(action['engine_file'])
+        tables = self._tables.description
+
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(
+                self._executor, functools.partial(_run_action, action, tables))
+            for action in actions
+        ])
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    """Defines the argument parser for the server
+
+    Returns:
+        the argparser object
+    """
+    parser = argparse.ArgumentParser(
+        description='Serves rocket simulation actions over a local socket')
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument(
+        '--socket', type=str, help='path of the Unix socket to listen on')
+    address.add_argument(
+        '--port', type=int, help='localhost TCP port to listen on')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='number of worker processes, defaults to the number of CPUs')
+    parser.add_argument(
+        '-s', type=str, help='a JSON schema to validate actions against')
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=result_cache.DEFAULT_DIRECTORY,
+        help='directory used to cache simulated trajectories')
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='always recompute trajectories instead of reusing cached ones')
+    return parser
+
+
+def run() -> None:
+    """Starts the server with the command line arguments"""
+    args = create_argparser().parse_args()
+    server = SimulationServer(
+        workers=args.workers,
+        cache_directory=None if args.no_cache else args.cache_dir,
+        schema=args.s)
+    try:
+        asyncio.run(server.serve(path=args.socket, port=args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,84 @@
+"""Unit test script for the simulation server and client"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import client
+import server
+import test_fixtures
+
+
+class SimulationServerTest(unittest.TestCase):
+    """Runs a server on a temporary Unix socket and talks to it"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls.engine_file = os.path.join(cls._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(cls.engine_file)
+        cls.socket_path = os.path.join(cls._directory.name, 'server.sock')
+
+        cls.server = server.SimulationServer(workers=1, cache_directory=None)
+        cls.thread = threading.Thread(
+            target=asyncio.run, args=(cls.server.serve(cls.socket_path), ))
+        cls.thread.start()
+
+        deadline = time.monotonic() + 10
+        while not os.path.exists(cls.socket_path):
+            if time.monotonic() > deadline:
+                raise RuntimeError('server did not start')
+            time.sleep(0.01)
+
+    @classmethod
+    def tearDownClass(cls):
+        with client.SimulationClient(path=cls.socket_path) as connection:
+            connection.shutdown()
+        cls.thread.join(timeout=10)
+        cls.server.close()
+        cls._directory.cleanup()
+
+    def _action(self, **kwargs):
+        action = {
+            'engine_file': self.engine_file,
+            'diameter': 0.1,
+            'total_time': 20.0,
+            'num_steps': 100
+        }
+        action.update(kwargs)
+        return action
+
+    def test_save_rocket(self):
+        """Tests that save_rocket writes its file and reports it."""
+        filename = os.path.join(self._directory.name, 'save.csv')
+        with client.SimulationClient(path=self.socket_path) as connection:
+            results = connection.run_actions(
+                [self._action(action='save_rocket', filename=filename)] * 2)
+
+        self.assertEqual(results, [{
+            'action': 'save_rocket',
+            'filename': filename
+        }] * 2)
+        self.assertTrue(os.path.exists(filename))
+
+    def test_invalid_action(self):
+        """Tests that invalid actions are reported instead of run."""
+        with client.SimulationClient(path=self.socket_path) as connection:
+            with self.assertRaises(client.ServerError):
+                connection.run_actions([self._action(action='save_rocket')])
+
+            # The connection is still usable afterwards
+            connection.ping()
+
+    def test_plot_requires_filename(self):
+        """Tests that the server refuses to open a window."""
+        with client.SimulationClient(path=self.socket_path) as connection:
+            with self.assertRaises(client.ServerError):
+                connection.run_actions([self._action(action='plot_rocket')])
+
+
+if __name__ == '__main__':
+    unittest.main()
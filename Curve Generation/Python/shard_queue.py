@@ -0,0 +1,441 @@
+#!/usr/bin/env python
+"""Shares sweeps between workers on any number of machines through files
+
+A sweep that is too large for one machine is split into shards, each a task
+file with some of the points of the grid. Workers anywhere with access to the
+queue directory, usually on a shared file system, take shards one at a time,
+and a merge step collects the results into the usual trajectory stores. The
+queue is a directory with:
+
+    queue.json          the sweep_rocket actions and the shards of each
+    pending/<shard>.json    shards that no worker has claimed yet
+    claimed/<shard>.json    shards that a worker is simulating
+    results/<shard>/        trajectory store of every finished shard
+
+A worker claims a shard by renaming it from pending into claimed. Renames are
+atomic, so exactly one worker gets each shard, and the others move on to the
+next one. A shard's results are written to a temporary directory that is
+renamed into results once complete, so results never holds a partial shard.
+Nothing else is needed, no lock server and no database.
+
+Workers refresh the modification time of their claims as they go. Claims that
+haven't been refreshed for stale_after seconds are assumed to belong to a
+worker that died, and are put back into pending.
+
+Shards include the engine curves, so workers don't need the engine files.
+
+    $ python shard_queue.py split -f sweep.json /shared/queue
+    $ python shard_queue.py work /shared/queue      (on every machine)
+    $ python shard_queue.py merge /shared/queue
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import time
+import uuid
+from typing import Any, Dict, List
+
+import convergence
+import instrumentation
+import main
+import sweep
+import trajectory_store
+from graph import graph_altitude
+
+QUEUE_VERSION = 1
+QUEUE_FILENAME = 'queue.json'
+PENDING_DIRECTORY = 'pending'
+CLAIMED_DIRECTORY = 'claimed'
+RESULTS_DIRECTORY = 'results'
+
+DEFAULT_SHARD_SIZE = 256
+# (SECONDS)
+DEFAULT_STALE_AFTER = 600.0
+
+
+def split(actions: List[Dict[str, Any]],
+          directory: str,
+          shard_size: int = DEFAULT_SHARD_SIZE) -> int:
+    """Splits the grids of sweep_rocket actions into a new queue
+
+    Args:
+        actions: sweep_rocket actions, validated against the schema
+        directory: Location of the queue, which must not hold a queue yet
+        shard_size: Number of grid points per shard
+
+    Returns:
+        the number of shards
+
+    Raises:
+        ValueError: Raised if an action isn't a sweep_rocket action, or the
+            directory already holds a queue
+    """
+    for action in actions:
+        if action.get('action') != 'sweep_rocket':
+            raise ValueError('only sweep_rocket actions can be sharded')
+    if os.path.exists(os.path.join(directory, QUEUE_FILENAME)):
+        raise ValueError(directory + ' already holds a queue')
+
+    pending = os.path.join(directory, PENDING_DIRECTORY)
+    for name in (PENDING_DIRECTORY, CLAIMED_DIRECTORY, RESULTS_DIRECTORY):
+        os.makedirs(os.path.join(directory, name), exist_ok=True)
+
+    shards = 0
+    action_shards = []
+    resolved = []
+    for action in actions:
+        thrust_values, mass_values = main.load_engine(action['engine_file'])
+        # Every shard of an action shares the same grid
+        action, _ = convergence.resolve(action, thrust_values, mass_values)
+        grapher = _grapher(action, thrust_values, mass_values)
+        points = [
+            dict(parameters, total_time=grapher.total_time)
+            for parameters in sweep.parameter_grid(grapher, action['sweep'])
+        ]
+        for start in range(0, len(points), shard_size):
+            task = {
+                'action': action,
+                'thrust_values': thrust_values,
+                'mass_values': mass_values,
+                'points': points[start:start + shard_size]
+            }
+            _write_atomic(
+                os.path.join(pending, _shard_name(shards) + '.json'), task)
+            shards += 1
+        action_shards.append(shards)
+        resolved.append(action)
+
+    # Written last, so an interrupted split can't be mistaken for a queue
+    _write_atomic(
+        os.path.join(directory, QUEUE_FILENAME), {
+            'version': QUEUE_VERSION,
+            'shards': shards,
+            'actions': resolved,
+            # Index after the last shard of each action
+            'action_shards': action_shards
+        })
+    return shards
+
+
+def work(directory: str,
+         stale_after: float = DEFAULT_STALE_AFTER,
+         chunk_size: int = sweep.DEFAULT_CHUNK_SIZE) -> int:
+    """Claims and simulates shards until none are pending
+
+    Any number of workers can run at the same time, on any machine that can
+    reach the directory.
+
+    Args:
+        directory: Location of the queue
+        stale_after: (SECONDS) age after which claims of other workers are
+            put back into pending
+        chunk_size: Number of trajectories held in memory at a time
+
+    Returns:
+        the number of shards this worker finished
+    """
+    finished = 0
+    while True:
+        requeue_stale(directory, stale_after)
+        claim = _claim(directory)
+        if claim is None:
+            return finished
+        if _run_shard(directory, claim, chunk_size):
+            finished += 1
+
+
+def requeue_stale(directory: str,
+                  stale_after: float = DEFAULT_STALE_AFTER) -> int:
+    """Puts claims that haven't been refreshed back into pending
+
+    Args:
+        directory: Location of the queue
+        stale_after: (SECONDS) age after which a claim is stale
+
+    Returns:
+        the number of claims put back
+    """
+    claimed = os.path.join(directory, CLAIMED_DIRECTORY)
+    requeued = 0
+    for name in sorted(os.listdir(claimed)):
+        path = os.path.join(claimed, name)
+        try:
+            if time.time() - os.stat(path).st_mtime < stale_after:
+                continue
+            os.rename(path, os.path.join(directory, PENDING_DIRECTORY, name))
+            requeued += 1
+        except FileNotFoundError:
+            # Finished or requeued by another worker in the meantime
+            pass
+    return requeued
+
+
+def status(directory: str) -> Dict[str, int]:
+    """Counts the shards in each state
+
+    Args:
+        directory: Location of the queue
+
+    Returns:
+        the total number of 'shards', and how many are 'pending', 'claimed'
+            and 'finished'
+    """
+    with open(os.path.join(directory, QUEUE_FILENAME), 'r') as file:
+        shards = json.load(file)['shards']
+    return {
+        'shards': shards,
+        'pending': len(_shards_in(directory, PENDING_DIRECTORY)),
+        'claimed': len(_shards_in(directory, CLAIMED_DIRECTORY)),
+        'finished': len(_finished(directory))
+    }
+
+
+def merge(directory: str) -> List[Dict[str, Any]]:
+    """Appends the results of every shard to the stores of their actions
+
+    Each action's trajectories go to its result_directory in grid order, just
+    as if the action had run on its own. Trajectories that are already in a
+    store are skipped, so merging twice is harmless.
+
+    Args:
+        directory: Location of a queue whose shards are all finished
+
+    Returns:
+        the 'action' type, 'result_directory' and number of merged
+            'trajectories' of each action
+
+    Raises:
+        ValueError: Raised if any shard isn't finished, or a store was
+            written with different settings than the sweep of its action
+    """
+    with open(os.path.join(directory, QUEUE_FILENAME), 'r') as file:
+        queue = json.load(file)
+    finished = _finished(directory)
+    missing = [
+        _shard_name(shard) for shard in range(queue['shards'])
+        if _shard_name(shard) not in finished
+    ]
+    if missing:
+        raise ValueError('{} of {} shards are not finished: {}'.format(
+            len(missing), queue['shards'], ', '.join(missing[:10])))
+
+    results = []
+    first = 0
+    for action, last in zip(queue['actions'], queue['action_shards']):
+        merged = 0
+        store = None
+        try:
+            for shard in range(first, last):
+                source = trajectory_store.TrajectoryStore(
+                    os.path.join(directory, RESULTS_DIRECTORY,
+                                 _shard_name(shard)),
+                    read_only=True)
+                if store is None:
+                    store = trajectory_store.TrajectoryStore(
+                        action['result_directory'],
+                        num_steps=source.num_steps,
+                        dtype=source.dtype,
+                        settings=source.settings)
+                    done = {
+                        sweep.point_key(parameters)
+                        for parameters in store.parameters
+                    }
+                chunk = [(parameters, source[row])
+                         for row, parameters in enumerate(source.parameters)
+                         if sweep.point_key(parameters) not in done]
+                with instrumentation.stage('store_writing'):
+                    store.extend(chunk)
+                merged += len(chunk)
+                source.close()
+        finally:
+            if store is not None:
+                store.close()
+        results.append({
+            'action': 'sweep_rocket',
+            'result_directory': action['result_directory'],
+            'trajectories': merged
+        })
+        first = last
+    return results
+
+
+def _grapher(action: Dict[str, Any], thrust_values: List[List[float]],
+             mass_values: List[List[float]]) -> graph_altitude.AltitudeGrapher:
+    """Builds the grapher of an action the same way as main.parse_action"""
+    return graph_altitude.AltitudeGrapher(
+        thrust_values=[tuple(value) for value in thrust_values],
+        mass_values=[tuple(value) for value in mass_values],
+        **action)
+
+
+def _shard_name(shard: int) -> str:
+    """Name of a shard's files, which sort in the order of the shards"""
+    return '{:06d}'.format(shard)
+
+
+def _shards_in(directory: str, state: str) -> List[str]:
+    """Names of the shards in the pending or claimed directory"""
+    return sorted(
+        name[:-len('.json')]
+        for name in os.listdir(os.path.join(directory, state))
+        if name.endswith('.json'))
+
+
+def _finished(directory: str) -> set:
+    """Names of the shards with complete results"""
+    return {
+        name
+        for name in os.listdir(os.path.join(directory, RESULTS_DIRECTORY))
+        if not name.startswith('.')
+    }
+
+
+def _write_atomic(filename: str, value: Any) -> None:
+    """Writes JSON that other processes either see in full or not at all"""
+    temporary = '{}.{}.tmp'.format(filename, uuid.uuid4().hex)
+    with open(temporary, 'w') as file:
+        json.dump(value, file)
+    os.replace(temporary, filename)
+
+
+def _claim(directory: str) -> str:
+    """Claims the first pending shard
+
+    Returns:
+        the name of the claimed shard, or None if no shard is pending
+    """
+    finished = _finished(directory)
+    for name in _shards_in(directory, PENDING_DIRECTORY):
+        source = os.path.join(directory, PENDING_DIRECTORY, name + '.json')
+        if name in finished:
+            # A stale claim whose worker finished after all
+            try:
+                os.remove(source)
+            except FileNotFoundError:
+                pass
+            continue
+        destination = os.path.join(directory, CLAIMED_DIRECTORY,
+                                   name + '.json')
+        try:
+            os.rename(source, destination)
+        except FileNotFoundError:
+            # Another worker claimed it first
+            continue
+        # The rename keeps the modification time of the split, which may be
+        # long ago
+        os.utime(destination)
+        return name
+    return None
+
+
+def _run_shard(directory: str, name: str, chunk_size: int) -> bool:
+    """Simulates a claimed shard and publishes its results
+
+    Returns:
+        whether the results of this worker were published, rather than those
+            of another worker that ran the same shard after a stale claim
+    """
+    claim = os.path.join(directory, CLAIMED_DIRECTORY, name + '.json')
+    with open(claim, 'r') as file:
+        task = json.load(file)
+    grapher = _grapher(task['action'], task['thrust_values'],
+                       task['mass_values'])
+
+    results = os.path.join(directory, RESULTS_DIRECTORY)
+    temporary = os.path.join(results, '.{}.{}.{}'.format(
+        name, socket.gethostname(), uuid.uuid4().hex))
+    with sweep.open_store(grapher, temporary,
+                          task['action']['sweep']) as store:
+        points = task['points']
+        for start in range(0, len(points), chunk_size):
+            chunk = sweep.simulate_points(grapher,
+                                          points[start:start + chunk_size])
+            with instrumentation.stage('store_writing'):
+                store.extend(chunk)
+            try:
+                os.utime(claim)
+            except FileNotFoundError:
+                # Requeued as stale, whoever finishes first wins
+                pass
+    instrumentation.count('shards_simulated')
+
+    try:
+        os.rename(temporary, os.path.join(results, name))
+        published = True
+    except OSError:
+        # Another worker already published the shard
+        shutil.rmtree(temporary, ignore_errors=True)
+        published = False
+    try:
+        os.remove(claim)
+    except FileNotFoundError:
+        pass
+    return published
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    """Defines the argument parser for the queue commands
+
+    Returns:
+        the argparser object
+    """
+    parser = argparse.ArgumentParser(
+        description='Shares sweeps between machines through a directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = commands.add_parser(
+        'split', help='split the sweep_rocket actions of a file into shards')
+    split_parser.add_argument(
+        '-f',
+        type=argparse.FileType(),
+        required=True,
+        help='a JSON file of a list of sweep_rocket actions')
+    split_parser.add_argument(
+        '-s', type=str, help='a JSON schema to validate the actions against')
+    split_parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        help='number of grid points per shard')
+
+    work_parser = commands.add_parser(
+        'work', help='simulate shards until none are pending')
+    work_parser.add_argument(
+        '--stale-after',
+        type=float,
+        default=DEFAULT_STALE_AFTER,
+        help='seconds after which claims of other workers are taken over')
+
+    commands.add_parser('status', help='count the shards in each state')
+    commands.add_parser(
+        'merge', help='collect the results into the result directories')
+
+    for command in commands.choices.values():
+        command.add_argument('directory', type=str, help='queue directory')
+    return parser
+
+
+def run() -> None:
+    """Runs the queue command given on the command line"""
+    args = create_argparser().parse_args()
+    if args.command == 'split':
+        validator = main.load_validator(
+            args.s) if args.s else main.load_validator()
+        actions = json.load(args.f)
+        validator.validate(actions)
+        print('{} shards'.format(
+            split(actions, args.directory, shard_size=args.shard_size)))
+    elif args.command == 'work':
+        print('{} shards finished'.format(
+            work(args.directory, stale_after=args.stale_after)))
+    elif args.command == 'status':
+        print(json.dumps(status(args.directory)))
+    elif args.command == 'merge':
+        print(json.dumps(merge(args.directory)))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,141 @@
+"""Unit test script for the shard queue"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+import shard_queue
+import sweep
+import test_fixtures
+import trajectory_store
+from graph import graph_altitude
+
+
+class ShardQueueTest(unittest.TestCase):
+    """Unittest case for splitting, working on and merging shards"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.directory = self._directory.name
+        self.engine_file = os.path.join(self.directory, 'engine.rse')
+        test_fixtures.write_engine_file(self.engine_file)
+        self.queue = os.path.join(self.directory, 'queue')
+
+    def _action(self, result_directory, drag_coefficients):
+        return {
+            'action': 'sweep_rocket',
+            'engine_file': self.engine_file,
+            'diameter': 0.1,
+            'total_time': 10.0,
+            'num_steps': 200,
+            'sweep': {
+                'base_mass': [0.5, 1.0, 1.5],
+                'drag_coefficient': drag_coefficients
+            },
+            'result_directory': os.path.join(self.directory, result_directory)
+        }
+
+    def test_workers_and_merge(self):
+        """Tests that parallel workers reproduce an unsharded sweep."""
+        actions = [
+            self._action('first', [0.1, 0.3, 0.5, 0.7]),
+            self._action('second', [0.2])
+        ]
+        actions_file = os.path.join(self.directory, 'sweep.json')
+        with open(actions_file, 'w') as file:
+            json.dump(actions, file)
+
+        script = os.path.join(os.path.dirname(__file__), 'shard_queue.py')
+        subprocess.run([
+            sys.executable, script, 'split', '-f', actions_file,
+            '--shard-size', '2', self.queue
+        ], check=True, stdout=subprocess.DEVNULL)
+        self.assertEqual(
+            shard_queue.status(self.queue), {
+                'shards': 8,
+                'pending': 8,
+                'claimed': 0,
+                'finished': 0
+            })
+        with self.assertRaises(ValueError):
+            shard_queue.merge(self.queue)
+
+        workers = [
+            subprocess.Popen([sys.executable, script, 'work', self.queue],
+                             stdout=subprocess.PIPE,
+                             universal_newlines=True) for _ in range(3)
+        ]
+        finished = [int(worker.communicate()[0].split()[0]) for worker in workers]
+        self.assertEqual(sum(finished), 8)
+        self.assertEqual(shard_queue.status(self.queue)['finished'], 8)
+
+        results = shard_queue.merge(self.queue)
+        self.assertEqual([result['trajectories'] for result in results], [12, 3])
+        self.assertEqual(shard_queue.merge(self.queue)[0]['trajectories'], 0)
+
+        expected = os.path.join(self.directory, 'expected')
+        thrust_values, mass_values = main.load_engine(self.engine_file)
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values, mass_values=mass_values, **actions[0])
+        sweep.run(grapher, expected, actions[0]['sweep'])
+
+        with trajectory_store.TrajectoryStore(
+                actions[0]['result_directory'], read_only=True) as merged, \
+                trajectory_store.TrajectoryStore(expected, read_only=True) as store:
+            self.assertEqual(merged.parameters, store.parameters)
+            self.assertEqual(merged.settings, store.settings)
+            for index in range(len(store)):
+                for column in store.columns:
+                    np.testing.assert_array_equal(merged[index][column],
+                                                  store[index][column])
+
+    def test_stale_claims(self):
+        """Tests that claims of workers that died are taken over."""
+        shard_queue.split([self._action('result', [0.1, 0.3])],
+                          self.queue,
+                          shard_size=3)
+        self.assertEqual(shard_queue._claim(self.queue), '000000')
+        self.assertEqual(shard_queue.requeue_stale(self.queue, 60.0), 0)
+
+        # The worker stops refreshing its claim
+        claim = os.path.join(self.queue, shard_queue.CLAIMED_DIRECTORY,
+                             '000000.json')
+        os.utime(claim, (0, 0))
+        self.assertEqual(shard_queue.work(self.queue, stale_after=60.0), 2)
+        self.assertEqual(
+            shard_queue.status(self.queue), {
+                'shards': 2,
+                'pending': 0,
+                'claimed': 0,
+                'finished': 2
+            })
+        self.assertEqual(shard_queue.merge(self.queue)[0]['trajectories'], 6)
+
+        # A store of a different sweep isn't merged into
+        action = self._action('other', [0.1, 0.3])
+        thrust_values, mass_values = main.load_engine(self.engine_file)
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values,
+            mass_values=mass_values,
+            **dict(action, diameter=0.2))
+        sweep.run(grapher, action['result_directory'], action['sweep'])
+        with open(os.path.join(self.queue, shard_queue.QUEUE_FILENAME),
+                  'r') as file:
+            queue = json.load(file)
+        queue['actions'][0]['result_directory'] = action['result_directory']
+        with open(os.path.join(self.queue, shard_queue.QUEUE_FILENAME),
+                  'w') as file:
+            json.dump(queue, file)
+        with self.assertRaises(ValueError):
+            shard_queue.merge(self.queue)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+"""Shares engine curves and the atmosphere table between processes
+
+The process that owns a SharedTables parses every engine file once and copies
+it, along with the pressure table, into shared memory. It hands workers a
+small, picklable description of the tables. Workers convert each engine once,
+when first attached, and read the pressure table straight from shared memory,
+instead of re-parsing the engine files or receiving pickled copies of the
+curves with every task. Per-task startup therefore doesn't grow with the
+number of workers. The server and the worker pool of fit share their tables
+this way.
+
+Owner:
+
+    tables = SharedTables()
+    description = tables.add_engine('engine.rse')
+    ... send description to the workers along with the task ...
+    tables.close()
+
+Worker:
+
+    shared_tables.attach(description)
+    main.load_engine('engine.rse')  # served from shared memory
+
+Curves that don't come from an engine file are shared under a name instead,
+through add_curves and find_curves.
+"""
+
+import os
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import data_loader
+from calculate import density_calculator
+
+# Description of shared tables: the name of each block of shared memory and
+# the shape of the table in it
+Description = Dict[str, Any]
+# Thrust values as (SECONDS, NEWTONS) and mass values as (SECONDS, KILOGRAMS)
+Curves = Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]
+
+
+def engine_key(filename: str) -> str:
+    """Identifies the current contents of an engine file
+
+    Args:
+        filename: Location of the .rse file
+
+    Returns:
+        key that changes whenever the file does
+    """
+    status = os.stat(filename)
+    return '{}:{}:{}'.format(
+        os.path.abspath(filename), status.st_mtime_ns, status.st_size)
+
+
+class SharedTables(object):
+    """Owns the shared memory that holds the tables"""
+
+    def __init__(self):
+        """Shares the pressure table"""
+        self._blocks = {}
+        self._description = {'engines': {}, 'curves': {}}
+        # Key of the shared version of every engine file
+        self._engine_keys = {}
+
+        pressure = np.array(density_calculator.pressure_table, dtype=float)
+        self._description['atmosphere'] = self._share('atmosphere', pressure)
+
+    def _share(self, name: str, table: np.ndarray) -> Tuple[str, Tuple]:
+        """Copies a table of floats into a new block of shared memory"""
+        block = shared_memory.SharedMemory(create=True, size=table.nbytes)
+        np.ndarray(table.shape, dtype=float, buffer=block.buf)[:] = table
+        self._blocks[name] = block
+        return (block.name, table.shape)
+
+    def _unshare(self, name: str) -> None:
+        """Frees the shared memory of a table"""
+        block = self._blocks.pop(name)
+        block.close()
+        block.unlink()
+
+    def add_engine(self, filename: str) -> Description:
+        """Shares an engine, unless it's already shared
+
+        An older version of the same file is no longer shared.
+
+        Args:
+            filename: Location of the .rse file
+
+        Returns:
+            the description of all of the shared tables
+        """
+        key = engine_key(filename)
+        if key not in self._description['engines']:
+            data = data_loader.read_rock_sim(filename)
+            table = np.array([(x['t'], x['f'], x['m']) for x in data],
+                             dtype=float).reshape(-1, 3)
+            self._description['engines'][key] = self._share(key, table)
+
+            previous = self._engine_keys.get(os.path.abspath(filename))
+            if previous is not None:
+                del self._description['engines'][previous]
+                self._unshare(previous)
+            self._engine_keys[os.path.abspath(filename)] = key
+        return self.description
+
+    def add_curves(self, name: str,
+                   thrust_values: List[Tuple[float, float]],
+                   mass_values: List[Tuple[float, float]]) -> Description:
+        """Shares thrust and mass curves under a name, replacing older ones
+
+        Args:
+            name: Name to find the curves by, see find_curves
+            thrust_values: (SECONDS, NEWTONS) tuples of the thrust curve
+            mass_values: (SECONDS, KILOGRAMS) tuples of the fuel mass
+
+        Returns:
+            the description of all of the shared tables
+        """
+        if name in self._description['curves']:
+            del self._description['curves'][name]
+            self._unshare(name + ':thrust')
+            self._unshare(name + ':mass')
+
+        self._description['curves'][name] = tuple(
+            self._share(name + ':' + curve,
+                        np.array(values, dtype=float).reshape(-1, 2))
+            for curve, values in (('thrust', thrust_values),
+                                  ('mass', mass_values)))
+        return self.description
+
+    @property
+    def description(self) -> Description:
+        """Picklable description of the tables, see attach"""
+        return {
+            'engines': dict(self._description['engines']),
+            'curves': dict(self._description['curves']),
+            'atmosphere': self._description['atmosphere']
+        }
+
+    def close(self) -> None:
+        """Frees the shared memory. Workers must not use the tables anymore"""
+        for name in list(self._blocks):
+            self._unshare(name)
+        self._description = {'engines': {}, 'curves': {}, 'atmosphere': None}
+        self._engine_keys = {}
+
+
+# Tables attached by this process, by the name of their shared memory
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+# Curves of the shared engines and named curves, converted once
+_engines: Dict[str, Curves] = {}
+_curves: Dict[str, Curves] = {}
+
+
+def _view(name: str, shape: Tuple) -> np.ndarray:
+    """Attaches a block of shared memory as a read-only array"""
+    if name not in _attached:
+        block = shared_memory.SharedMemory(name=name)
+        table = np.ndarray(tuple(shape), dtype=float, buffer=block.buf)
+        table.flags.writeable = False
+        _attached[name] = (block, table)
+    return _attached[name][1]
+
+
+def _rows(name: str, shape: Tuple) -> List[List[float]]:
+    """Copies a table out of a block of shared memory"""
+    block = shared_memory.SharedMemory(name=name)
+    table = np.ndarray(tuple(shape), dtype=float, buffer=block.buf)
+    rows = table.tolist()
+    # The block can only be closed once nothing refers to its memory
+    del table
+    block.close()
+    return rows
+
+
+def attach(description: Description) -> None:
+    """Makes the described tables available to this process
+
+    Engines become available through find_engine (and so main.load_engine),
+    curves through find_curves, and the pressure table replaces the one of
+    every new DensityCalculator. Engines and curves are converted to lists
+    once, when first attached, and dropped once no longer described.
+
+    Args:
+        description: Description from SharedTables.description
+    """
+    engines = description['engines']
+    for key in [key for key in _engines if key not in engines]:
+        del _engines[key]
+    for key, (name, shape) in engines.items():
+        if key not in _engines:
+            rows = _rows(name, shape)
+            _engines[key] = ([(x[0], x[1]) for x in rows],
+                             [(x[0], x[2]) for x in rows])
+
+    curves = description.get('curves', {})
+    for name in [name for name in _curves if name not in curves]:
+        del _curves[name]
+    for name, (thrust, mass) in curves.items():
+        if name not in _curves:
+            _curves[name] = tuple([(x[0], x[1]) for x in _rows(*table)]
+                                  for table in (thrust, mass))
+
+    if description.get('atmosphere') is not None:
+        pressure = _view(*description['atmosphere'])
+        density_calculator.use_pressure_table(pressure[:, 0], pressure[:, 1])
+
+
+def find_engine(filename: str) -> Curves:
+    """Returns the shared curves of an engine file, if there are any
+
+    Args:
+        filename: Location of the .rse file
+
+    Returns:
+        thrust values as (SECONDS, NEWTONS) and mass values as (SECONDS,
+            KILOGRAMS) tuples, or None if the current file isn't shared
+    """
+    if not _engines:
+        return None
+    return _engines.get(engine_key(filename))
+
+
+def find_curves(name: str) -> Curves:
+    """Returns the curves shared under a name, see SharedTables.add_curves
+
+    Args:
+        name: Name the curves were shared under
+
+    Returns:
+        thrust values as (SECONDS, NEWTONS) and mass values as (SECONDS,
+            KILOGRAMS) tuples, or None if nothing is shared under the name
+    """
+    return _curves.get(name)
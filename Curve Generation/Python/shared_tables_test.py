@@ -0,0 +1,84 @@
+"""Unit test script for the shared engine and atmosphere tables"""
+
+import concurrent.futures
+import os
+import tempfile
+import unittest
+from multiprocessing import shared_memory
+
+import main
+import shared_tables
+import test_fixtures
+from calculate import density_calculator
+
+
+def _load_in_worker(description, filename):
+    """Attaches the tables and loads the engine within a worker process"""
+    shared_tables.attach(description)
+    parsed = shared_tables.find_engine(filename) is not None
+    return (parsed, main.load_engine(filename),
+            density_calculator.DensityCalculator()(500.0))
+
+
+class SharedTablesTest(unittest.TestCase):
+    """Unittest case for SharedTables"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.engine_file = os.path.join(self._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(self.engine_file)
+
+        self.tables = shared_tables.SharedTables()
+        self.addCleanup(self.tables.close)
+
+    def test_worker_uses_shared_engine(self):
+        """Tests that workers get the same curves without parsing them."""
+        self.tables.add_engine(self.engine_file)
+        description = self.tables.add_engine(self.engine_file)
+        self.assertEqual(len(description['engines']), 1)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+            shared, curves, density = pool.submit(
+                _load_in_worker, description, self.engine_file).result()
+
+        self.assertTrue(shared)
+        self.assertEqual(curves, main.load_engine(self.engine_file))
+        self.assertIsInstance(curves[0][0], tuple)
+        self.assertEqual(density,
+                         density_calculator.DensityCalculator()(500.0))
+
+    def test_changed_engine_is_shared_again(self):
+        """Tests that an edited engine file isn't served from the old table."""
+        previous = self.tables.add_engine(self.engine_file)
+        test_fixtures.write_engine_file(self.engine_file, num_points=20)
+        os.utime(self.engine_file, ns=(0, 0))
+
+        description = self.tables.add_engine(self.engine_file)
+        self.assertEqual(len(description['engines']), 1)
+        self.assertEqual(list(description['engines']),
+                         [shared_tables.engine_key(self.engine_file)])
+
+        # The table of the older version is freed
+        (name, _), = previous['engines'].values()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+    def test_curves(self):
+        """Tests that named curves reach workers and can be replaced."""
+        thrust_values = [(0.0, 10.0), (1.0, 20.0)]
+        mass_values = [(0.0, 0.5), (0.5, 0.25), (1.0, 0.0)]
+        self.tables.add_curves('fit', [(0.0, 1.0)], [(0.0, 1.0)])
+        description = self.tables.add_curves('fit', thrust_values,
+                                             mass_values)
+
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1,
+                initializer=shared_tables.attach,
+                initargs=(description, )) as pool:
+            curves = pool.submit(shared_tables.find_curves, 'fit').result()
+        self.assertEqual(curves, (thrust_values, mass_values))
+
+
+if __name__ == '__main__':
+    unittest.main()
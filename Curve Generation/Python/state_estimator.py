@@ -0,0 +1,138 @@
+"""Estimates the state of the rocket from telemetry as it comes in
+
+A Kalman filter over altitude, velocity and acceleration, with a constant
+acceleration model driven by random jerk. Altimeter and accelerometer samples
+are fused one at a time in constant time and memory, so unlike interpolating
+over all of the collected data, the cost of an update doesn't grow as the
+flight goes on. The estimate can seed the integrator directly, see
+AltitudeGrapher.estimator.
+
+https://en.wikipedia.org/wiki/Kalman_filter
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+import instrumentation
+
+ALTITUDE, VELOCITY, ACCELERATION = range(3)
+
+# Default standard deviations of the sensors and of the jerk, see
+# StateEstimator
+ALTITUDE_NOISE = 1.0
+ACCELERATION_NOISE = 1.0
+JERK_NOISE = 100.0
+
+
+class State(NamedTuple):
+    """Estimated state of the rocket at a point in time"""
+    time: float  # (SECONDS)
+    altitude: float  # (METERS)
+    velocity: float  # (METERS / SECONDS)
+    acceleration: float  # (METERS / SECONDS ^ 2)
+
+
+class StateEstimator(object):
+    """Fuses altitude and acceleration samples into a state estimate
+
+    Attributes:
+        altitude_noise: (METERS) standard deviation of the altimeter
+        acceleration_noise: (METERS / SECONDS ^ 2) standard deviation of the
+            accelerometer
+        jerk_noise: (METERS / SECONDS ^ 3 / sqrt(HERTZ)) how strongly the
+            acceleration is expected to change between samples. Higher values
+            follow thrust changes faster, lower values smooth more
+    """
+
+    def __init__(self,
+                 altitude_noise: float = ALTITUDE_NOISE,
+                 acceleration_noise: float = ACCELERATION_NOISE,
+                 jerk_noise: float = JERK_NOISE,
+                 start_time: float = 0.0,
+                 initial_altitude: float = 0.0):
+        """Initializes the estimator with the rocket at rest on the pad
+
+        Args:
+            altitude_noise: (METERS) standard deviation of the altimeter
+            acceleration_noise: (METERS / SECONDS ^ 2) standard deviation of
+                the accelerometer
+            jerk_noise: (METERS / SECONDS ^ 3 / sqrt(HERTZ)) spectral density
+                of the changes in acceleration
+            start_time: (SECONDS) time of the initial state
+            initial_altitude: (METERS) altitude of the pad
+        """
+        self.altitude_noise = altitude_noise
+        self.acceleration_noise = acceleration_noise
+        self.jerk_noise = jerk_noise
+
+        self._time = start_time
+        self._state = np.array([initial_altitude, 0.0, 0.0])
+        # The velocity is known, since the rocket is at rest
+        self._covariance = np.diag(
+            [altitude_noise**2, 0.0, acceleration_noise**2])
+
+    @property
+    def state(self) -> State:
+        """The current estimate"""
+        return State(self._time, *self._state.tolist())
+
+    @property
+    def covariance(self) -> np.ndarray:
+        """(3, 3) covariance of the altitude, velocity and acceleration"""
+        return self._covariance.copy()
+
+    def predict(self, time: float) -> None:
+        """Advances the estimate to the given time without a measurement
+
+        Args:
+            time: (SECONDS) must not be before the current estimate
+        """
+        dt = time - self._time
+        if dt <= 0:
+            return
+
+        transition = np.array([[1.0, dt, 0.5 * dt * dt], [0.0, 1.0, dt],
+                               [0.0, 0.0, 1.0]])
+        # Jerk as continuous white noise, integrated over the interval
+        noise = self.jerk_noise**2 * np.array(
+            [[dt**5 / 20, dt**4 / 8, dt**3 / 6], [dt**4 / 8, dt**3 / 3, dt**2 / 2],
+             [dt**3 / 6, dt**2 / 2, dt]])
+
+        self._state = transition @ self._state
+        self._covariance = transition @ self._covariance @ transition.T + noise
+        self._time = time
+
+    def _correct(self, component: int, measurement: float,
+                 variance: float) -> None:
+        """Fuses a measurement of a single component of the state"""
+        innovation = measurement - self._state[component]
+        gain = self._covariance[:, component] / (
+            self._covariance[component, component] + variance)
+        self._state = self._state + gain * innovation
+        self._covariance = self._covariance - np.outer(
+            gain, self._covariance[component])
+
+    def update(self,
+               time: float,
+               altitude: float = None,
+               acceleration: float = None) -> State:
+        """Fuses the samples recorded at the given time
+
+        Args:
+            time: (SECONDS) time of the samples, not before the previous ones
+            altitude: (METERS) altimeter sample, if there is one
+            acceleration: (METERS / SECONDS ^ 2) accelerometer sample, if
+                there is one
+
+        Returns:
+            the new estimate
+        """
+        instrumentation.count('estimator_updates')
+        self.predict(time)
+        if altitude is not None:
+            self._correct(ALTITUDE, altitude, self.altitude_noise**2)
+        if acceleration is not None:
+            self._correct(ACCELERATION, acceleration,
+                          self.acceleration_noise**2)
+        return self.state
@@ -0,0 +1,86 @@
+"""Unit test script for the state estimator"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+import state_estimator
+import test_fixtures
+from graph import graph_altitude
+
+
+class StateEstimatorTest(unittest.TestCase):
+    """Unittest case for StateEstimator"""
+
+    def test_tracks_noisy_flight(self):
+        """Tests that noisy samples converge on the true state."""
+        random = np.random.default_rng(0)
+        estimator = state_estimator.StateEstimator()
+        for time in np.arange(1, 301) * 0.01:
+            altitude = 0.5 * 20.0 * time**2
+            estimator.update(time, altitude + random.normal(0, 1.0),
+                             20.0 + random.normal(0, 1.0))
+
+        state = estimator.state
+        self.assertEqual(state.time, 3.0)
+        self.assertAlmostEqual(state.altitude, 90.0, delta=1.0)
+        self.assertAlmostEqual(state.velocity, 60.0, delta=1.0)
+        self.assertAlmostEqual(state.acceleration, 20.0, delta=1.0)
+
+    def test_altitude_only(self):
+        """Tests that the velocity is inferred from the altitude alone."""
+        estimator = state_estimator.StateEstimator()
+        for time in np.arange(1, 201) * 0.01:
+            estimator.update(time, altitude=15.0 * time)
+
+        self.assertAlmostEqual(estimator.state.velocity, 15.0, places=2)
+        self.assertAlmostEqual(estimator.state.acceleration, 0.0, places=2)
+
+    def test_predict(self):
+        """Tests that predicting widens the uncertainty."""
+        estimator = state_estimator.StateEstimator()
+        estimator.update(1.0, altitude=10.0, acceleration=0.0)
+        before = estimator.covariance
+        estimator.predict(2.0)
+        self.assertEqual(estimator.state.time, 2.0)
+        self.assertTrue(np.all(np.diag(estimator.covariance) > np.diag(before)))
+
+    def test_seeds_simulation(self):
+        """Tests that the grapher predicts from the estimate."""
+        with tempfile.TemporaryDirectory() as directory:
+            engine_file = os.path.join(directory, 'engine.rse')
+            test_fixtures.write_engine_file(engine_file)
+            thrust_values, mass_values = main.load_engine(engine_file)
+
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values,
+            mass_values=mass_values,
+            total_time=20.0,
+            num_steps=2001,
+            diameter=0.1)
+        time_step = 0.01
+        full = grapher.simulate(
+            time_step, 2001, base_mass=1.0, drag_constant=0.05, diameter=0.1)
+
+        # Feed the estimator the simulated flight up to 5 seconds
+        estimator = state_estimator.StateEstimator(
+            altitude_noise=0.01, acceleration_noise=100.0)
+        for index in range(1, 501):
+            estimator.update(index * time_step, full['altitude'][index])
+        grapher.estimator = estimator
+        self.assertEqual(grapher.current_time, 5.0)
+
+        prediction = grapher.simulate(
+            time_step, 1501, base_mass=1.0, drag_constant=0.05, diameter=0.1)
+        self.assertEqual(len(prediction['altitude']), 1501)
+        self.assertAlmostEqual(
+            prediction['altitude'][0], full['altitude'][500], delta=0.1)
+        np.testing.assert_allclose(
+            prediction['altitude'], full['altitude'][500:], rtol=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+"""Simulates a rocket over a grid of parameters into a trajectory store"""
+
+import itertools
+from typing import Any, Dict, List, Tuple
+
+import instrumentation
+import result_cache
+import trajectory_store
+from graph import graph_altitude
+
+# Rocket parameters that can be swept. Parameters that aren't swept keep the
+# grapher's value
+SWEEP_PARAMETERS = ('base_mass', 'diameter', 'drag_coefficient')
+
+DEFAULT_CHUNK_SIZE = 64
+
+
+def parameter_grid(grapher: graph_altitude.AltitudeGrapher,
+                   sweep: Dict[str, List[float]]) -> List[Dict[str, float]]:
+    """Lists every combination of the swept parameters
+
+    Args:
+        grapher: Grapher that provides the parameters that aren't swept
+        sweep: Values of each swept parameter, see SWEEP_PARAMETERS
+
+    Returns:
+        the complete parameters of each point in the grid
+
+    Raises:
+        ValueError: Raised if an unknown parameter is swept
+    """
+    for name in sweep:
+        if name not in SWEEP_PARAMETERS:
+            raise ValueError('cannot sweep ' + name)
+
+    values = [
+        sweep.get(name, [getattr(grapher, name)]) for name in SWEEP_PARAMETERS
+    ]
+    return [
+        dict(zip(SWEEP_PARAMETERS, point))
+        for point in itertools.product(*values)
+    ]
+
+
+def run(grapher: graph_altitude.AltitudeGrapher,
+        result_directory: str,
+        sweep: Dict[str, List[float]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Simulates every point of the grid that isn't in the store yet
+
+    Trajectories are appended to the store a chunk at a time, so at most
+    chunk_size of them are held in memory. Rerunning an interrupted sweep only
+    simulates the points that are missing. A store is only resumed with the
+    same settings, see settings.
+
+    Args:
+        grapher: Grapher with the engine and the parameters that aren't swept
+        result_directory: Location of the trajectory store
+        sweep: Values of each swept parameter, see SWEEP_PARAMETERS
+        chunk_size: Number of trajectories to append at a time
+
+    Returns:
+        the number of trajectories that were simulated
+
+    Raises:
+        ValueError: Raised if an unknown parameter is swept, or the store was
+            written with different settings
+    """
+    with open_store(grapher, result_directory, sweep) as store:
+        done = {point_key(parameters) for parameters in store.parameters}
+        points = [
+            dict(parameters, total_time=grapher.total_time)
+            for parameters in parameter_grid(grapher, sweep)
+        ]
+        points = [point for point in points if point_key(point) not in done]
+
+        for start in range(0, len(points), chunk_size):
+            chunk = simulate_points(grapher, points[start:start + chunk_size])
+            with instrumentation.stage('store_writing'):
+                store.extend(chunk)
+    return len(points)
+
+
+def settings(grapher: graph_altitude.AltitudeGrapher,
+             sweep: Dict[str, List[float]]) -> Dict[str, Any]:
+    """Returns the settings that the trajectories of a sweep depend on
+
+    These are everything besides the parameters of each point: a digest of the
+    engine, the precision, the backend, the simulated time and the values of
+    the parameters that aren't swept.
+
+    Args:
+        grapher: Grapher with the engine and the parameters that aren't swept
+        sweep: Values of each swept parameter, see SWEEP_PARAMETERS
+
+    Returns:
+        the settings, as stored with the trajectory store
+    """
+    return {
+        'engine':
+        result_cache.make_key(thrust_values=grapher.thrust_values,
+                              mass_values=grapher.mass_values),
+        'precision': grapher.precision,
+        'backend': grapher.backend,
+        'total_time': float(grapher.total_time),
+        'fixed': {
+            name: float(getattr(grapher, name))
+            for name in SWEEP_PARAMETERS if name not in sweep
+        }
+    }
+
+
+def open_store(grapher: graph_altitude.AltitudeGrapher, result_directory: str,
+               sweep: Dict[str, List[float]]
+               ) -> trajectory_store.TrajectoryStore:
+    """Opens or creates the trajectory store of a sweep
+
+    Args:
+        grapher: Grapher with the discretization of the sweep
+        result_directory: Location of the trajectory store
+        sweep: Values of each swept parameter, see SWEEP_PARAMETERS
+
+    Returns:
+        the store, which the caller must close
+
+    Raises:
+        ValueError: Raised if the store was written with different settings
+    """
+    return trajectory_store.TrajectoryStore(
+        result_directory,
+        num_steps=grapher.num_steps,
+        dtype=grapher.precision,
+        settings=settings(grapher, sweep))
+
+
+def simulate_points(grapher: graph_altitude.AltitudeGrapher,
+                    points: List[Dict[str, float]]
+                    ) -> List[Tuple[Dict[str, float], Dict[str, Any]]]:
+    """Simulates the rocket at each point of a grid
+
+    Args:
+        grapher: Grapher with the engine and the discretization
+        points: Complete parameters of each point, see parameter_grid
+
+    Returns:
+        (parameters, trajectory) of each point, ready for the store
+    """
+    time_step = grapher.total_time / (grapher.num_steps - 1)
+    return [(point,
+             grapher.simulate(
+                 time_step,
+                 num_steps=grapher.num_steps,
+                 base_mass=point['base_mass'],
+                 drag_constant=point['drag_coefficient'],
+                 diameter=point['diameter'],
+                 use_cache=False)) for point in points]
+
+
+def point_key(parameters: Dict[str, Any]) -> tuple:
+    """Hashable key of the parameters of a point"""
+    return tuple(sorted(parameters.items()))
@@ -0,0 +1,127 @@
+"""Unit test script for parameter sweeps"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+import sweep
+import test_fixtures
+import trajectory_store
+from graph import graph_altitude
+
+
+class SweepTest(unittest.TestCase):
+    """Unittest case for sweep.run and the sweep_rocket action"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.engine_file = os.path.join(self._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(self.engine_file)
+        self.result_directory = os.path.join(self._directory.name, 'sweep')
+        self.sweep = {'base_mass': [0.9, 1.0, 1.1], 'diameter': [0.1, 0.12]}
+
+        thrust_values, mass_values = main.load_engine(self.engine_file)
+        self.grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=thrust_values,
+            mass_values=mass_values,
+            diameter=0.1,
+            total_time=10.0,
+            num_steps=50)
+
+    def _stored_points(self):
+        with trajectory_store.TrajectoryStore(
+                self.result_directory, read_only=True) as store:
+            return [sweep.point_key(point) for point in store.parameters]
+
+    def test_resume(self):
+        """Tests that a rerun only simulates the points that are missing."""
+        chunks = []
+        simulate_points = sweep.simulate_points
+
+        def interrupted(grapher, points):
+            chunks.append(len(points))
+            if len(chunks) == 3:
+                raise KeyboardInterrupt
+            return simulate_points(grapher, points)
+
+        with mock.patch.object(sweep, 'simulate_points', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                sweep.run(
+                    self.grapher,
+                    self.result_directory,
+                    self.sweep,
+                    chunk_size=2)
+        self.assertEqual(chunks, [2, 2, 2])
+        self.assertEqual(len(self._stored_points()), 4)
+
+        self.assertEqual(
+            sweep.run(
+                self.grapher, self.result_directory, self.sweep,
+                chunk_size=2), 2)
+        self.assertEqual(
+            sweep.run(self.grapher, self.result_directory, self.sweep), 0)
+
+        points = self._stored_points()
+        self.assertEqual(len(points), 6)
+        self.assertEqual(len(set(points)), 6)
+
+    def test_resume_with_different_settings(self):
+        """Tests that a store is only resumed by the same sweep."""
+        sweep.run(self.grapher, self.result_directory, self.sweep)
+        thrust_values, mass_values = main.load_engine(self.engine_file)
+
+        parameters = dict(
+            thrust_values=thrust_values,
+            mass_values=mass_values,
+            diameter=0.1,
+            total_time=10.0,
+            num_steps=50)
+        changes = [{'precision': 'float32'}, {'total_time': 12.0},
+                   {'drag_coefficient': 0.6},
+                   {'mass_values': [(0.0, 0.2), (10.0, 0.0)]}]
+        for changed in changes:
+            with self.subTest(changed=changed):
+                grapher = graph_altitude.AltitudeGrapher(
+                    **dict(parameters, **changed))
+                with self.assertRaises(ValueError):
+                    sweep.run(grapher, self.result_directory, self.sweep)
+
+        # Sweeping one more parameter changes the parameters that are fixed
+        with self.assertRaises(ValueError):
+            sweep.run(self.grapher, self.result_directory,
+                      dict(self.sweep, drag_coefficient=[0.5]))
+        self.assertEqual(len(self._stored_points()), 6)
+
+    def test_action(self):
+        """Tests that sweep_rocket actions reach the sweep."""
+        action = {
+            'action': 'sweep_rocket',
+            'engine_file': self.engine_file,
+            'diameter': 0.1,
+            'total_time': 10.0,
+            'num_steps': 50,
+            'result_directory': self.result_directory,
+            'sweep': self.sweep,
+            'chunk_size': 4
+        }
+        with mock.patch.object(
+                sweep, 'simulate_points',
+                wraps=sweep.simulate_points) as simulate_points:
+            result = main.parse_action(action)
+
+        self.assertEqual(result['trajectories'], 6)
+        self.assertEqual(result['result_directory'], self.result_directory)
+        self.assertEqual(
+            [len(call[0][1]) for call in simulate_points.call_args_list],
+            [4, 2])
+        self.assertEqual(len(self._stored_points()), 6)
+
+        with self.assertRaises(ValueError):
+            main.parse_action(dict(action, sweep={'thrust': [1.0]}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Synthetic input files, so tests and benchmarks run without real data"""
+
+import io
+from typing import List, Tuple
+
+import numpy as np
+
+# Loosely modeled after a 1.8 second H motor
+BURN_TIME = 1.8
+PEAK_THRUST = 150.0
+PROPELLANT_MASS = 200.0
+
+
+def engine_curve(num_points: int = 50,
+                 burn_time: float = BURN_TIME,
+                 peak_thrust: float = PEAK_THRUST,
+                 propellant_mass: float = PROPELLANT_MASS
+                 ) -> List[Tuple[float, float, float]]:
+    """Generates a plausible thrust curve
+
+    Args:
+        num_points: Number of samples in the curve
+        burn_time: (SECONDS) time until the motor burns out
+        peak_thrust: (NEWTONS) maximum thrust of the motor
+        propellant_mass: (GRAMS) mass of the propellant before ignition
+
+    Returns:
+        list of (time, thrust, mass) tuples, in seconds, newtons and grams
+    """
+    time = np.linspace(0.0, burn_time, num=num_points)
+    # Quick ramp up followed by a slow regressive burn
+    thrust = peak_thrust * np.minimum(time / 0.05, 1.0) * (
+        1.0 - 0.4 * time / burn_time)
+    thrust[-1] = 0.0
+    burnt = np.concatenate(([0.0], np.cumsum(
+        (thrust[1:] + thrust[:-1]) * 0.5 * np.diff(time))))
+    mass = propellant_mass * (1.0 - burnt / burnt[-1])
+    return list(zip(time.tolist(), thrust.tolist(), mass.tolist()))
+
+
+def write_engine_file(filename: str, num_points: int = 50) -> None:
+    """Writes a RockSim engine file with a synthetic thrust curve
+
+    Args:
+        filename: Location of the .rse file to write
+        num_points: Number of samples in the thrust curve
+    """
+    with io.open(filename, 'w') as file:
+        file.write('<engine-database>\n  <engine-list>\n')
+        file.write('    <engine code="H150" mfg="Synthetic">\n')
+        file.write('      <comments>Generated for benchmarking</comments>\n')
+        file.write('      <data>\n')
+        for time, thrust, mass in engine_curve(num_points):
+            file.write('        <eng-data t="{!r}" f="{!r}" m="{!r}"/>\n'.format(
+                time, thrust, mass))
+        file.write('      </data>\n    </engine>\n  </engine-list>\n')
+        file.write('</engine-database>\n')
+
+
+def telemetry(num_rows: int, sample_rate: float = 100.0) -> np.ndarray:
+    """Generates telemetry of an idealized flight
+
+    Args:
+        num_rows: Number of samples
+        sample_rate: (HERTZ) samples per second
+
+    Returns:
+        array with columns for time (seconds), altitude (meters) and
+            acceleration (meters / seconds ^ 2)
+    """
+    time = np.arange(num_rows) / sample_rate
+    acceleration = np.where(time < BURN_TIME, 80.0, -9.80665)
+    velocity = np.concatenate(([0.0], np.cumsum(
+        acceleration[:-1] / sample_rate)))
+    altitude = np.concatenate(([0.0], np.cumsum(velocity[:-1] / sample_rate)))
+    return np.column_stack((time, np.maximum(altitude, 0.0), acceleration))
+
+
+def write_telemetry_file(filename: str,
+                         num_rows: int,
+                         sample_rate: float = 100.0,
+                         delimiter: str = ' ') -> None:
+    """Writes synthetic telemetry in the format produced by save_rocket
+
+    Args:
+        filename: Location of the file to write
+        num_rows: Number of samples
+        sample_rate: (HERTZ) samples per second
+        delimiter: Delimiter between the columns
+    """
+    np.savetxt(
+        filename,
+        telemetry(num_rows, sample_rate),
+        delimiter=delimiter,
+        fmt='%.17g')
@@ -0,0 +1,288 @@
+"""Stores large numbers of trajectories on disk instead of in memory
+
+A store is a directory with:
+
+    store.json                  the number of steps, columns, dtype and
+                                the settings the trajectories depend on
+    index.jsonl                 one line of parameters per trajectory
+    <column>-<segment>.npy      up to segment_size trajectories of one column
+
+Every column of every trajectory takes exactly num_steps values, padded with
+NaN at the end if the trajectory is shorter. The segments are memory-mapped, so
+appending or reading a trajectory only touches its own pages, and analysis can
+work through a column one segment at a time with bounded memory.
+
+A trajectory only becomes part of the store once its line is in the index,
+which is written after its values are flushed to disk. Whatever an interrupted
+writer left past the end of the index is overwritten by the next append.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+STORE_VERSION = 1
+METADATA_FILENAME = 'store.json'
+INDEX_FILENAME = 'index.jsonl'
+DEFAULT_COLUMNS = ('altitude', 'velocity')
+DEFAULT_SEGMENT_SIZE = 256
+
+
+class TrajectoryStore(object):
+    """Memory-mapped, append-only store of trajectories
+
+    Attributes:
+        directory: Location of the store
+        num_steps: Number of values stored for each column of a trajectory
+        columns: Names of the stored columns
+        dtype: Type of the stored values
+        segment_size: Number of trajectories per segment file
+        settings: Settings that every trajectory of the store was produced
+            with, besides its own parameters
+    """
+
+    def __init__(self,
+                 directory: str,
+                 num_steps: int = None,
+                 columns: Sequence[str] = DEFAULT_COLUMNS,
+                 dtype: str = 'float64',
+                 segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 settings: Dict[str, Any] = None,
+                 read_only: bool = False):
+        """Opens the store, creating it if it doesn't exist yet
+
+        Args:
+            directory: Location of the store
+            num_steps: Number of values per column. Required to create a
+                store, checked against the store otherwise
+            columns: Names of the columns of a new store
+            dtype: Type of the values of a new store
+            segment_size: Number of trajectories per segment of a new store
+            settings: Settings of a new store, which must be serializable to
+                JSON. Checked against the store otherwise
+            read_only: Whether to open an existing store without writing
+
+        Raises:
+            ValueError: Raised if the store doesn't exist and can't be created,
+                or if it was created with a different num_steps or settings
+        """
+        self.directory = directory
+        self._read_only = read_only
+        metadata_filename = os.path.join(directory, METADATA_FILENAME)
+
+        if os.path.exists(metadata_filename):
+            with open(metadata_filename, 'r') as file:
+                metadata = json.load(file)
+            if num_steps is not None and num_steps != metadata['num_steps']:
+                raise ValueError(
+                    'the store in {} has {} steps, not {}'.format(
+                        directory, metadata['num_steps'], num_steps))
+            if settings is not None:
+                stored = metadata.get('settings', {})
+                for key in sorted(set(stored) | set(settings)):
+                    if stored.get(key) != settings.get(key):
+                        raise ValueError(
+                            'the store in {} was written with a different {}'.
+                            format(directory, key))
+        elif read_only:
+            raise ValueError('there is no store in ' + directory)
+        elif num_steps is None:
+            raise ValueError('num_steps is required to create a store')
+        else:
+            metadata = {
+                'version': STORE_VERSION,
+                'num_steps': num_steps,
+                'columns': list(columns),
+                'dtype': np.dtype(dtype).name,
+                'segment_size': segment_size,
+                'settings': settings or {}
+            }
+            os.makedirs(directory, exist_ok=True)
+            with open(metadata_filename, 'w') as file:
+                json.dump(metadata, file, indent=2)
+
+        self.num_steps = metadata['num_steps']
+        self.columns = tuple(metadata['columns'])
+        self.dtype = np.dtype(metadata['dtype'])
+        self.segment_size = metadata['segment_size']
+        self.settings = metadata.get('settings', {})
+
+        self._index = []
+        index_filename = os.path.join(directory, INDEX_FILENAME)
+        if os.path.exists(index_filename):
+            with open(index_filename, 'r') as file:
+                for line in file:
+                    # A torn last line belongs to a trajectory that never
+                    # finished being written
+                    try:
+                        self._index.append(json.loads(line))
+                    except ValueError:
+                        break
+            if not read_only:
+                self._rewrite_index_if_torn(index_filename)
+        self._segments = {}
+
+    def _rewrite_index_if_torn(self, index_filename: str) -> None:
+        """Drops a partially written last line from the index file"""
+        with open(index_filename, 'r') as file:
+            if sum(1 for _ in file) == len(self._index):
+                return
+        with open(index_filename, 'w') as file:
+            for entry in self._index:
+                file.write(json.dumps(entry) + '\n')
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def parameters(self) -> List[Dict[str, Any]]:
+        """The parameters of every trajectory, in order of their index"""
+        return [entry['parameters'] for entry in self._index]
+
+    def _segment_filename(self, column: str, segment: int) -> str:
+        return os.path.join(self.directory,
+                            '{}-{:0>5}.npy'.format(column, segment))
+
+    def _segment(self, column: str, segment: int) -> np.memmap:
+        """Memory-maps a segment, creating it if it doesn't exist yet"""
+        key = (column, segment)
+        if key not in self._segments:
+            filename = self._segment_filename(column, segment)
+            if os.path.exists(filename):
+                self._segments[key] = np.load(
+                    filename, mmap_mode='r' if self._read_only else 'r+')
+            else:
+                array = np.lib.format.open_memmap(
+                    filename,
+                    mode='w+',
+                    dtype=self.dtype,
+                    shape=(self.segment_size, self.num_steps))
+                array[:] = np.nan
+                self._segments[key] = array
+        return self._segments[key]
+
+    def extend(self, trajectories: List[Tuple[Dict[str, Any],
+                                              Dict[str, np.ndarray]]]
+               ) -> None:
+        """Appends a chunk of trajectories
+
+        Args:
+            trajectories: (parameters, values) of each trajectory. The values
+                map column names to arrays of at most num_steps values;
+                parameters must be JSON serializable
+
+        Raises:
+            ValueError: Raised if the store is read only, or a trajectory
+                is missing a column or has too many steps
+        """
+        if self._read_only:
+            raise ValueError('the store is read only')
+
+        entries = []
+        touched = set()
+        for offset, (parameters, values) in enumerate(trajectories):
+            segment, row = divmod(len(self) + offset, self.segment_size)
+            lengths = {}
+            for column in self.columns:
+                array = np.asarray(values[column], dtype=self.dtype)
+                if len(array) > self.num_steps:
+                    raise ValueError('{} has {} steps, the store only {}'.
+                                     format(column, len(array),
+                                            self.num_steps))
+                destination = self._segment(column, segment)
+                destination[row, :len(array)] = array
+                destination[row, len(array):] = np.nan
+                lengths[column] = len(array)
+                touched.add((column, segment))
+            entries.append({'parameters': parameters, 'lengths': lengths})
+
+        for key in touched:
+            self._segments[key].flush()
+        with open(os.path.join(self.directory, INDEX_FILENAME), 'a') as file:
+            file.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+        self._index.extend(entries)
+
+    def append(self, parameters: Dict[str, Any],
+               values: Dict[str, np.ndarray]) -> int:
+        """Appends a single trajectory, see extend
+
+        Returns:
+            the index of the trajectory
+        """
+        self.extend([(parameters, values)])
+        return len(self) - 1
+
+    def __getitem__(self, index: int) -> Dict[str, np.ndarray]:
+        """Returns the values of a trajectory
+
+        The arrays are views into the memory-mapped segments, trimmed to the
+        length the trajectory was stored with.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('trajectory index out of range')
+        segment, row = divmod(index, self.segment_size)
+        lengths = self._index[index]['lengths']
+        return {
+            column: self._segment(column, segment)[row, :lengths[column]]
+            for column in self.columns
+        }
+
+    def chunks(self, column: str) -> Iterator[Tuple[int, np.ndarray]]:
+        """Iterates through a column one segment at a time
+
+        Args:
+            column: Name of the column
+
+        Yields:
+            the index of the first trajectory in the chunk and a
+                (trajectories, num_steps) view of their values, padded with NaN
+        """
+        for start in range(0, len(self), self.segment_size):
+            stop = min(start + self.segment_size, len(self))
+            segment = self._segment(column, start // self.segment_size)
+            yield start, segment[:stop - start]
+
+    def column(self, column: str, start: int = 0,
+               stop: int = None) -> np.ndarray:
+        """Returns a column for a range of trajectories
+
+        Ranges within a single segment are returned as a view, anything else
+        is copied into memory.
+
+        Args:
+            column: Name of the column
+            start: Index of the first trajectory
+            stop: Index after the last trajectory, defaults to the end
+
+        Returns:
+            (trajectories, num_steps) array, padded with NaN
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if stop <= start:
+            return np.empty((0, self.num_steps), dtype=self.dtype)
+        first, last = start // self.segment_size, (stop - 1) // self.segment_size
+        if first == last:
+            offset = first * self.segment_size
+            return self._segment(column, first)[start - offset:stop - offset]
+        return np.concatenate([
+            values[max(start - offset, 0):stop - offset]
+            for offset, values in self.chunks(column)
+            if offset < stop and offset + len(values) > start
+        ])
+
+    def close(self) -> None:
+        """Flushes and unmaps all of the segments"""
+        for array in self._segments.values():
+            if not self._read_only:
+                array.flush()
+        self._segments.clear()
+
+    def __enter__(self) -> 'TrajectoryStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,100 @@
+"""Unit test script for the trajectory store"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import trajectory_store
+
+
+class TrajectoryStoreTest(unittest.TestCase):
+    """Unittest case for TrajectoryStore"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.directory = os.path.join(self._directory.name, 'store')
+
+    def _fill(self, store, count):
+        store.extend([({
+            'base_mass': float(index)
+        }, {
+            'altitude': np.arange(10.0) + index,
+            'velocity': np.arange(8.0) * index
+        }) for index in range(count)])
+
+    def test_round_trip(self):
+        """Tests that trajectories read back as written, across segments."""
+        with trajectory_store.TrajectoryStore(
+                self.directory, num_steps=10, segment_size=4) as store:
+            self._fill(store, 10)
+
+        with trajectory_store.TrajectoryStore(
+                self.directory, read_only=True) as store:
+            self.assertEqual(len(store), 10)
+            self.assertEqual(store.parameters[7], {'base_mass': 7.0})
+            np.testing.assert_array_equal(store[7]['altitude'],
+                                          np.arange(10.0) + 7)
+            np.testing.assert_array_equal(store[-1]['velocity'],
+                                          np.arange(8.0) * 9)
+
+            # Short columns are padded with NaN
+            velocity = store.column('velocity', 2, 7)
+            self.assertEqual(velocity.shape, (5, 10))
+            np.testing.assert_array_equal(velocity[:, :8],
+                                          np.arange(8.0) * np.arange(2, 7)[:, None])
+            self.assertTrue(np.all(np.isnan(velocity[:, 8:])))
+
+            self.assertEqual([(start, len(values))
+                              for start, values in store.chunks('altitude')],
+                             [(0, 4), (4, 4), (8, 2)])
+
+    def test_torn_index(self):
+        """Tests that a partially written index line is discarded."""
+        with trajectory_store.TrajectoryStore(
+                self.directory, num_steps=10, segment_size=4) as store:
+            self._fill(store, 3)
+        with open(os.path.join(self.directory, 'index.jsonl'), 'a') as file:
+            file.write('{"parameters": {"base')
+
+        with trajectory_store.TrajectoryStore(self.directory) as store:
+            self.assertEqual(len(store), 3)
+            self._fill(store, 2)
+
+        with trajectory_store.TrajectoryStore(
+                self.directory, read_only=True) as store:
+            self.assertEqual(len(store), 5)
+            np.testing.assert_array_equal(store[4]['altitude'],
+                                          np.arange(10.0) + 1)
+
+    def test_num_steps_mismatch(self):
+        """Tests that a store can't be reopened with a different num_steps."""
+        trajectory_store.TrajectoryStore(self.directory, num_steps=10)
+        with self.assertRaises(ValueError):
+            trajectory_store.TrajectoryStore(self.directory, num_steps=20)
+
+    def test_settings_mismatch(self):
+        """Tests that a store can only be reopened with the same settings."""
+        settings = {'precision': 'float64', 'fixed': {'diameter': 0.1}}
+        trajectory_store.TrajectoryStore(
+            self.directory, num_steps=10, settings=settings)
+
+        store = trajectory_store.TrajectoryStore(
+            self.directory, num_steps=10, settings=dict(settings))
+        self.assertEqual(store.settings, settings)
+        for changed in ({'precision': 'float32'}, {'fixed': {}},
+                        {'backend': 'c'}):
+            with self.subTest(changed=changed):
+                with self.assertRaises(ValueError):
+                    trajectory_store.TrajectoryStore(
+                        self.directory,
+                        num_steps=10,
+                        settings=dict(settings, **changed))
+        # Readers don't need to know the settings
+        trajectory_store.TrajectoryStore(self.directory, read_only=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
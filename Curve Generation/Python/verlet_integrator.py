@@ -11,6 +11,17 @@ import operator
 from calculate import unary_linear_interpolator
 
 
+def moving_average_steps(time_step: float,
+                         time_cumulation: float = 100) -> int:
+    """Number of steps in the moving average of the velocity
+
+    Args:
+        time_step: (SECONDS) time between two steps
+        time_cumulation: (MILLISECONDS) amount of time to average over
+    """
+    return math.ceil(time_cumulation / (time_step * 1000))
+
+
 class SteppingVerletIntegrator(object):
     """Verlet integration using discrete samples.
 
@@ -36,7 +47,9 @@ class SteppingVerletIntegrator(object):
                  collected_data: Iterable[Dict[str, float]] = [],
                  time_cumulation: float = 100,
                  acceleration_error_constant: float = 10.0,
-                 start_time: float = 0.0):
+                 start_time: float = 0.0,
+                 dtype: np.dtype = None,
+                 initial_acceleration: float = 0.0):
         """Initializes the integrator with a timestep
 
         Args:
@@ -46,44 +59,116 @@ class SteppingVerletIntegrator(object):
                 solving for. Should return METERS / SECONDS ^ 2
             initial_value: (METERS) initial altitude
             initial_velocity: (METERS / SECONDS) initial velocity
+            initial_acceleration: (METERS / SECONDS ^ 2) acceleration at the
+                initial step, used to place the second step, for example
+                from a state_estimator.StateEstimator
             collected_data: List of dictionaries that contain 
             time_cumulation: (MILLISECONDS) amount of time used for the moving
                 average for the velocity
             acceleration_error_constant: A constant to use in acceleration
                 error computing when there's not enough data points, in
                 meters / seconds ^ 2
-            start_time: Starting time, usually at 0
+            start_time: (SECONDS) time of the first step, usually 0. The
+                acceleration is evaluated at start_time + index * time_step
+            dtype: Optional floating point type, such as np.float32 to match
+                the flight computer. The values are then stored in arrays of
+                that type instead of lists of Python floats, and the
+                acceleration should be calculated in the same type
         """
         self.acceleration = acceleration
-        self._timestep = time_step
-        self._start_time = start_time
-
-        self._previous_values = [None] * num_steps
-        self._previous_values[0] = initial_value
-        self._previous_values[1] = (
-            time_step * initial_velocity + initial_value)
+        self._dtype = np.dtype(dtype).type if dtype is not None else None
+        self._timestep = (self._dtype(time_step)
+                          if dtype is not None else time_step)
+        self._start_time = (self._dtype(start_time)
+                            if dtype is not None else start_time)
+        self._num_steps = num_steps
 
         self._initial_value = initial_value
         self._initial_velocity = initial_velocity
+        self._second_value = time_step * initial_velocity + initial_value
+        if initial_acceleration:
+            self._second_value += 0.5 * initial_acceleration * time_step**2
+
+        # Steps calculated so far of every array from create_storage
+        self._calculated = []
+        self._previous_values = self.create_storage()
+        self.store(self._previous_values, 0, initial_value)
+        self.store(self._previous_values, 1, self._second_value)
 
-        self._num_steps = num_steps
         self._max_collected_data_time: float = max(
             map(operator.itemgetter('time'), collected_data), default=0.0)
         self._collected_data = collected_data
         self.feedback = unary_linear_interpolator.UnaryLinearInterpolator(
             list(map(operator.itemgetter('time'), collected_data)),
-            list(map(operator.itemgetter('altitude'), collected_data)))
+            list(map(operator.itemgetter('altitude'), collected_data)),
+            dtype=dtype)
 
         self._last_index = self.fill_values(self._previous_values)
 
-        self.past_n_steps = math.ceil(time_cumulation / (time_step * 1000))
+        self.past_n_steps = moving_average_steps(time_step, time_cumulation)
         self._acceleration_error_constant = acceleration_error_constant
         self._velocity_storage = []
 
     @property
     def velocity_storage(self):
-        return np.array(self._velocity_storage)
-    
+        return np.array(self._velocity_storage, dtype=self._dtype)
+
+    def cast(self, value: float) -> float:
+        """Casts a Python number to the dtype, if one was given
+
+        Python numbers in arithmetic with NumPy scalars are promoted to double
+        precision before NumPy 2, so every constant of the float32 path is
+        cast first.
+        """
+        return self._dtype(value) if self._dtype is not None else value
+
+    def create_storage(self) -> List[float]:
+        """Creates the storage for the values of every step
+
+        Returns:
+            a list of None, or an array if a dtype was given. NaN is a valid
+                value once a flight diverges, so which steps of an array have
+                been calculated is tracked separately, see is_missing
+        """
+        if self._dtype is None:
+            return [None] * self.num_steps
+        storage = np.zeros(self.num_steps, dtype=self._dtype)
+        self._calculated.append((storage, np.zeros(self.num_steps,
+                                                   dtype=bool)))
+        return storage
+
+    def _calculated_steps(self, array: np.ndarray) -> np.ndarray:
+        """Mask of the calculated steps of an array from create_storage"""
+        for storage, calculated in self._calculated:
+            if storage is array:
+                return calculated
+        raise ValueError('the array was not created by create_storage')
+
+    def is_missing(self, array: List[float], index: int) -> bool:
+        """Whether a step hasn't been calculated yet
+
+        Args:
+            array: Storage from create_storage
+            index: Index of the step
+
+        Returns:
+            True if the step still needs to be calculated
+        """
+        if isinstance(array, list):
+            return array[index] is None
+        return not self._calculated_steps(array)[index]
+
+    def store(self, array: List[float], index: int, value: float) -> None:
+        """Records the value of a step
+
+        Args:
+            array: Storage from create_storage
+            index: Index of the step
+            value: Value of the step
+        """
+        array[index] = value
+        if not isinstance(array, list):
+            self._calculated_steps(array)[index] = True
 
     def fill_values(self, array: List[float]) -> int:
         """If present, uses any collected data to fill in the integrator
@@ -101,9 +186,9 @@ class SteppingVerletIntegrator(object):
         current_time = self.start_time
         index = 0
         while current_time < self._max_collected_data_time and index < len(array):
-            array[index] = self.feedback(current_time)
+            self.store(array, index, self.feedback(current_time))
             index += 1
-            current_time = index * self.time_step
+            current_time = self.cast(index) * self.time_step
 
         # subtract one since index - 1 is the actual last index that was
         # written to
@@ -190,7 +275,7 @@ class SteppingVerletIntegrator(object):
                 value at time (time_step * value)
             value: the calculated value to save
         """
-        self._previous_values[index] = value
+        self.store(self._previous_values, index, value)
 
     def __getitem__(self, index: int) -> float:
         """Retrieves the value at the specified index.
@@ -221,15 +306,15 @@ class SteppingVerletIntegrator(object):
         Returns:
             the floating point value at that location in the list
         """
-        if index == 0 or index == 1 or array[index] != None:
+        if index == 0 or index == 1 or not self.is_missing(array, index):
             return array[index]
 
         current_index = index
-        while (array[current_index - 1] == None
-               or array[current_index - 2] == None):
+        while (self.is_missing(array, current_index - 1)
+               or self.is_missing(array, current_index - 2)):
             current_index -= 1
 
-        while array[index] == None:
+        while self.is_missing(array, index):
             if current_index != index:
                 self.calculate_value(current_index, array)
             else:
@@ -249,12 +334,12 @@ class SteppingVerletIntegrator(object):
         Returns:
             float
         """
-        velocity_sum = 0.0
+        velocity_sum = self.cast(0.0)
         number_iterations = min(self.past_n_steps, index - 1)
         for i in range(number_iterations):
             velocity_sum += (array[index - 1 - i] - array[index - 2 - i])
 
-        return velocity_sum / (self.time_step * number_iterations)
+        return velocity_sum / (self.time_step * self.cast(number_iterations))
 
     def calculate_value(self,
                         index: int,
@@ -273,16 +358,16 @@ class SteppingVerletIntegrator(object):
 
         self._velocity_storage.insert(min(index, len(self._velocity_storage)), velocity)
         acceleration = self.acceleration(
-            time=self.time_step * (index - 1),
+            time=self.start_time + self.time_step * self.cast(index - 1),
             velocity=velocity,
             height=array[index - 1] + velocity * self.time_step)
 
-        acceleration += acceleration_error
+        acceleration += self.cast(acceleration_error)
 
-        value = (2 * array[index - 1] - array[index - 2] +
+        value = (self.cast(2) * array[index - 1] - array[index - 2] +
                  acceleration * self.time_step * self.time_step)
 
-        array[index] = value
+        self.store(array, index, value)
 
     def __iter__(self):
         """Returns an iterator for all of the values at each time step
@@ -313,12 +398,12 @@ class SteppingVerletIntegrator(object):
             two lists of values, representing two lines of accelerometer errors
         """
         acceleration_error = self.compute_accelerometer_error()
-        upper_error = [None] * self.num_steps
-        lower_error = [None] * self.num_steps
+        upper_error = self.create_storage()
+        lower_error = self.create_storage()
 
-        upper_error[0] = lower_error[0] = self.initial_value
-        upper_error[1] = lower_error[1] = (
-            self.time_step * self.initial_velocity + self.initial_value)
+        for error in (upper_error, lower_error):
+            self.store(error, 0, self.initial_value)
+            self.store(error, 1, self._second_value)
 
         index = self.fill_values(upper_error)
         self.fill_values(lower_error)
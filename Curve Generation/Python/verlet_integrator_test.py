@@ -0,0 +1,98 @@
+"""Unit test script for the stepping verlet integrator"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+import test_fixtures
+import verlet_integrator
+from graph import graph_altitude
+
+
+class SteppingVerletIntegratorTest(unittest.TestCase):
+    """Unittest case for SteppingVerletIntegrator"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        engine_file = os.path.join(self._directory.name, 'engine.rse')
+        test_fixtures.write_engine_file(engine_file)
+        self.thrust_values, self.mass_values = main.load_engine(engine_file)
+
+    def test_calculated_steps(self):
+        """Tests that a step calculated as NaN isn't calculated again."""
+        for dtype in (None, np.float32):
+            with self.subTest(dtype=dtype):
+                calls = []
+
+                def acceleration(**kwargs):
+                    calls.append(kwargs['time'])
+                    return np.nan
+
+                integrator = verlet_integrator.SteppingVerletIntegrator(
+                    0.1, acceleration, num_steps=10, dtype=dtype)
+                self.assertTrue(np.isnan(integrator[9]))
+                self.assertEqual(len(calls), 8)
+                self.assertTrue(np.isnan(integrator[5]))
+                self.assertEqual(len(calls), 8)
+
+    def test_single_precision(self):
+        """Tests that float32 flights are calculated in float32 throughout."""
+        grapher = graph_altitude.AltitudeGrapher(
+            thrust_values=self.thrust_values,
+            mass_values=self.mass_values,
+            total_time=10.0,
+            num_steps=200,
+            diameter=0.1,
+            precision='float32')
+        calculator = grapher.create_acceleration_calculator(
+            grapher.base_mass, grapher.drag_coefficient, grapher.diameter, [])
+        types = set()
+
+        def acceleration(**kwargs):
+            result = calculator(**kwargs)
+            types.update(type(value) for value in kwargs.values())
+            types.add(type(result))
+            return result
+
+        integrator = verlet_integrator.SteppingVerletIntegrator(
+            10.0 / 199, acceleration, num_steps=200, dtype=np.float32)
+        values = list(integrator)
+        self.assertEqual(types, {np.float32})
+        self.assertEqual({type(value) for value in values}, {np.float32})
+        self.assertEqual(
+            {type(velocity) for velocity in integrator.get_velocity_iter()},
+            {np.float32})
+        # Off the precomputed grid, with Python numbers for the state
+        self.assertIsInstance(calculator(time=0.5, velocity=1.0, height=2.0),
+                              np.float32)
+
+    def test_diverging_flight(self):
+        """Tests that a flight that diverges after landing is saved whole."""
+        for precision in ('float64', 'float32'):
+            with self.subTest(precision=precision):
+                grapher = graph_altitude.AltitudeGrapher(
+                    thrust_values=self.thrust_values,
+                    mass_values=self.mass_values,
+                    total_time=300.0,
+                    num_steps=3001,
+                    diameter=0.1,
+                    precision=precision)
+                filename = os.path.join(self._directory.name,
+                                        precision + '.csv')
+                with np.errstate(over='ignore', invalid='ignore'):
+                    trajectory = grapher.save(filename, use_cache=False)
+                altitude = trajectory['altitude']
+                self.assertEqual(len(altitude), 3001)
+                self.assertTrue(np.isnan(altitude[-1]))
+                self.assertGreater(np.nanmax(altitude), 0.0)
+                with open(filename) as file:
+                    rows = file.read().splitlines()
+                self.assertEqual(rows[-1].split()[-1], 'nan')
+
+
+if __name__ == '__main__':
+    unittest.main()